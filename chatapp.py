@@ -9,8 +9,8 @@ This program provides:
  - Peer–to–Peer communication (direct chat between peers)
 """
 
-# import threading
-# import json
+import threading
+import json
 import socket
 # import argparse
 
@@ -0,0 +1,539 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.aioproxy
+~~~~~~~~~~~~~~~~~
+
+This module implements the ``asyncio`` engine of the proxy. Client and upstream
+connections are asyncio streams served by one event loop, so a single process
+can hold tens of thousands of idle keep-alive clients without a thread each.
+
+Routing is shared with the threaded engine: the Host header is matched against
+the routing table compiled from ``parse_virtual_hosts`` and
+:func:`route_backend <daemon.proxy.route_backend>` applies the routing policy
+of the host. Cached responses come from the same :data:`PROXY_CACHE
+<daemon.proxycache.PROXY_CACHE>`. Upstream connections are kept alive
+in a per-loop pool and responses are streamed to the client as they arrive.
+
+Usage Example:
+--------------
+>>> run_proxy_async("0.0.0.0", 8080, routes)
+
+"""
+
+import asyncio
+import logging
+import socket
+import time
+
+from .httpreader import (HttpError, parse_head, parse_status, reframe_head,
+                         set_headers, MAX_HEADER_SIZE, MAX_BODY_SIZE,
+                         NO_BODY_STATUSES, RECV_BUFFER_SIZE)
+from .httpadapter import KEEPALIVE_TIMEOUT, KEEPALIVE_MAX_REQUESTS
+from .upstream import (POOL_MAX_IDLE, POOL_IDLE_EXPIRY, CONNECT_TIMEOUT,
+                       READ_TIMEOUT, IDEMPOTENT_METHODS, UPSTREAM_ERRORS, keeps_alive,
+                       record_response)
+from .prefork import create_listener
+from .proxy import (route_backend, request_header, client_keep_alive, not_found,
+                    bad_gateway, metrics_method, UPSTREAM_ATTEMPTS)
+from .health import HEALTH, HEALTH_CHECK_INTERVAL, start_health_checks
+from .balancer import STATS
+from .routing import compile_routes
+from .proxycache import PROXY_CACHE
+from .metrics import REGISTRY, CONNECTIONS
+
+logger = logging.getLogger(__name__)
+
+
+#: Largest read asked from an upstream reader: more than it ever buffers, so
+#: each read takes everything it holds.
+STREAM_READ_ALL = 1 << 30
+
+
+class UpstreamStream:
+    """
+    A stream pair to an upstream, read through a buffer of its own so the
+    bytes left after a response are known. Every read that has to wait for
+    the upstream may wait up to ``READ_TIMEOUT``.
+
+    :attrs reader (asyncio.StreamReader): the upstream reader.
+    :attrs writer (asyncio.StreamWriter): the upstream writer.
+    :attrs buffer (bytearray): bytes received and not consumed yet.
+    """
+
+    __attrs__ = [
+        "reader",
+        "writer",
+        "buffer",
+    ]
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.buffer = bytearray()
+
+    async def _fill(self):
+        """Moves what the reader holds into the buffer; False at EOF."""
+        data = await asyncio.wait_for(self.reader.read(STREAM_READ_ALL), READ_TIMEOUT)
+        self.buffer += data
+        return bool(data)
+
+    async def readuntil(self, separator, limit=MAX_HEADER_SIZE):
+        """
+        :rtype bytes: the bytes up to and including ``separator``.
+
+        :raises asyncio.IncompleteReadError: If the stream ends first.
+        :raises asyncio.LimitOverrunError: If more than ``limit`` bytes come first.
+        """
+        start = 0
+        while True:
+            index = self.buffer.find(separator, start)
+            if index >= 0:
+                end = index + len(separator)
+                data = bytes(self.buffer[:end])
+                del self.buffer[:end]
+                return data
+            if len(self.buffer) > limit:
+                raise asyncio.LimitOverrunError("Separator not found", len(self.buffer))
+            start = max(len(self.buffer) - len(separator) + 1, 0)
+            if not await self._fill():
+                raise asyncio.IncompleteReadError(bytes(self.buffer), None)
+
+    async def readline(self):
+        return await self.readuntil(b"\n")
+
+    async def read(self, n):
+        """
+        :rtype bytes: at most ``n`` bytes, empty at EOF.
+        """
+        if not self.buffer and not await self._fill():
+            return b""
+        data = bytes(self.buffer[:n])
+        del self.buffer[:n]
+        return data
+
+    def reusable(self):
+        """Whether the stream may carry another request: nothing left unread."""
+        return not self.buffer and not self.reader.at_eof()
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncUpstreamPool:
+    """
+    Idle keep-alive upstream connections of one event loop.
+
+    No lock is needed: every coroutine using the pool runs on the same loop.
+
+    :attrs max_idle (int): idle connections kept per upstream.
+    :attrs idle_expiry (float): seconds an idle connection stays reusable.
+    """
+
+    __attrs__ = [
+        "max_idle",
+        "idle_expiry",
+    ]
+
+    def __init__(self, max_idle=POOL_MAX_IDLE, idle_expiry=POOL_IDLE_EXPIRY):
+        self.max_idle = max_idle
+        self.idle_expiry = idle_expiry
+        #: (host, port) -> list of (UpstreamStream, released), most recent last
+        self._idle = {}
+
+    async def acquire(self, host, port):
+        """
+        Returns an idle stream to the upstream, or opens a new one.
+
+        :rtype tuple: (UpstreamStream, reused).
+        """
+        idle = self._idle.get((host, port))
+        now = time.monotonic()
+        while idle:
+            stream, released = idle.pop()
+            if now - released < self.idle_expiry and stream.reusable():
+                return stream, True
+            stream.close()
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, limit=MAX_HEADER_SIZE), CONNECT_TIMEOUT)
+        writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return UpstreamStream(reader, writer), False
+
+    def release(self, host, port, stream, reusable=True):
+        """
+        Pools a stream whose response was fully read, or closes it. A stream
+        with unread bytes or at its end is never pooled: the bytes would be
+        read as the next response.
+        """
+        idle = self._idle.setdefault((host, port), [])
+        if reusable and stream.reusable() and len(idle) < self.max_idle:
+            idle.append((stream, time.monotonic()))
+        else:
+            stream.close()
+
+
+async def read_exactly(reader, length):
+    """
+    Reads a request body from the client stream. Like the socket timeout of
+    the threaded engine, each read may wait up to ``KEEPALIVE_TIMEOUT``, so a
+    slow upload is served as long as it keeps sending.
+
+    :rtype bytes: the ``length`` bytes read.
+
+    :raises asyncio.TimeoutError: If the client sends nothing for too long.
+    :raises asyncio.IncompleteReadError: If the client closes before the end.
+    """
+    body = bytearray()
+    while len(body) < length:
+        data = await asyncio.wait_for(
+            reader.read(min(length - len(body), RECV_BUFFER_SIZE)), KEEPALIVE_TIMEOUT)
+        if not data:
+            raise asyncio.IncompleteReadError(bytes(body), length)
+        body += data
+    return bytes(body)
+
+
+async def read_line(reader):
+    """
+    Reads a chunk size or trailer line from the client stream.
+
+    :rtype bytes: the line, with its terminator.
+
+    :raises HttpError: If the line is longer than the stream limit.
+    :raises asyncio.TimeoutError: If the client sends nothing for too long.
+    """
+    try:
+        return await asyncio.wait_for(reader.readline(), KEEPALIVE_TIMEOUT)
+    except (ValueError, asyncio.LimitOverrunError):
+        raise HttpError(400, "Bad Request")
+
+
+async def read_chunked(reader, max_body_size):
+    """
+    Decodes a chunked body from a stream.
+
+    :rtype bytes: the decoded body.
+    """
+    body = bytearray()
+    while True:
+        line = await read_line(reader)
+        try:
+            size = int(line.split(b";", 1)[0].strip(), 16)
+        except ValueError:
+            raise HttpError(400, "Bad Request")
+        if size == 0:
+            # Skip optional trailers up to the final blank line
+            while (await read_line(reader)).strip():
+                pass
+            return bytes(body)
+        if len(body) + size > max_body_size:
+            raise HttpError(413, "Payload Too Large")
+        body += await read_exactly(reader, size + 2)
+        del body[-2:]
+
+
+async def read_request(reader):
+    """
+    Reads one complete request from the client stream. The keep-alive idle
+    timeout applies to the wait for its head; the body is read with a
+    timeout per read.
+
+    :rtype bytes: the normalized request, or None on EOF between requests.
+
+    :raises HttpError: If the request is malformed or too large.
+    :raises asyncio.TimeoutError: If the client stays idle or stalls.
+    """
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), KEEPALIVE_TIMEOUT)
+    except asyncio.IncompleteReadError as e:
+        if e.partial:
+            raise HttpError(400, "Bad Request")
+        return None
+    except asyncio.LimitOverrunError:
+        raise HttpError(431, "Request Header Fields Too Large")
+
+    content_length, chunked = parse_head(head[:-4])
+    if chunked:
+        body = await read_chunked(reader, MAX_BODY_SIZE)
+        return reframe_head(head[:-4], len(body)) + body
+    if content_length:
+        if content_length > MAX_BODY_SIZE:
+            raise HttpError(413, "Payload Too Large")
+        return head + await read_exactly(reader, content_length)
+    return head
+
+
+async def relay_body(reader, writer, length, chunked, capture=None):
+    """
+    Streams a response body from the upstream stream to the client stream.
+
+    :params reader (UpstreamStream): the upstream stream.
+
+    :params length (int): body length, None if framed by the end of the connection.
+    :params chunked (bool): the body uses chunked encoding and is relayed as-is.
+    :params capture (CacheCapture): also receives the relayed body, may be None.
+
+    :raises asyncio.TimeoutError: If the upstream sends nothing for
+                                  ``READ_TIMEOUT`` seconds.
+    """
+    write = writer.write
+    if capture is not None:
+        def write(data):
+            writer.write(data)
+            capture.write(data)
+
+    if chunked:
+        while True:
+            line = await reader.readline()
+            write(line)
+            try:
+                size = int(line.split(b";", 1)[0].strip(), 16)
+            except ValueError:
+                raise HttpError(502, "Bad Gateway")
+            if size == 0:
+                while True:
+                    line = await reader.readline()
+                    write(line)
+                    if not line.strip():
+                        break
+                await writer.drain()
+                return
+            remaining = size + 2
+            while remaining:
+                data = await reader.read(min(remaining, RECV_BUFFER_SIZE))
+                if not data:
+                    raise HttpError(502, "Bad Gateway")
+                remaining -= len(data)
+                write(data)
+                await writer.drain()
+
+    remaining = length
+    while remaining is None or remaining > 0:
+        size = RECV_BUFFER_SIZE if remaining is None else min(remaining, RECV_BUFFER_SIZE)
+        data = await reader.read(size)
+        if not data:
+            if remaining is None:
+                return
+            raise HttpError(502, "Bad Gateway")
+        if remaining is not None:
+            remaining -= len(data)
+        write(data)
+        # Bounded memory: wait for the client before reading further
+        await writer.drain()
+
+
+async def forward_request(pool, host, port, request, writer, keep_alive, append=(),
+                          capture=None):
+    """
+    Forwards a request over a pooled upstream stream and relays the response.
+
+    :params pool (AsyncUpstreamPool): the upstream pool of the loop.
+    :params request (bytes): the complete request.
+    :params writer (asyncio.StreamWriter): the client stream.
+    :params keep_alive (bool): whether the client connection may stay open.
+    :params append (iterable): (name, value) headers added to the response.
+    :params capture (CacheCapture): collects the response for the proxy
+                                    cache, None when it is not cacheable.
+
+    :rtype bool: whether the client connection may stay open afterwards, or
+                 None if the upstream could not be connected to and nothing
+                 was sent, so another upstream may be tried.
+    """
+    method = request.split(b" ", 1)[0]
+    request = set_headers(request, {"Connection": "keep-alive", "Keep-Alive": None})
+    upstream = "{}:{}".format(host, port)
+
+    while True:
+        try:
+            stream, reused = await pool.acquire(host, port)
+        except (OSError, asyncio.TimeoutError) as e:
+            logger.warning("Socket error: %s", e)
+            UPSTREAM_ERRORS.inc((upstream, 'connect'))
+            HEALTH.report_failure(upstream)
+            return None
+        started = time.monotonic()
+        try:
+            stream.writer.write(request)
+            await stream.writer.drain()
+            head = await stream.readuntil(b"\r\n\r\n")
+            break
+        except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError,
+                asyncio.TimeoutError) as e:
+            stream.close()
+            # Closed while idle in the pool: replay on another connection,
+            # unless the request must not be sent twice
+            stale = reused and method.decode('latin-1') in IDEMPOTENT_METHODS \
+                and isinstance(e, (OSError, asyncio.IncompleteReadError)) \
+                and not isinstance(e, asyncio.TimeoutError) \
+                and not getattr(e, 'partial', b'')
+            if stale:
+                continue
+            logger.warning("Socket error: %s", e)
+            UPSTREAM_ERRORS.inc((upstream, 'response'))
+            HEALTH.report_failure(upstream)
+            writer.write(bad_gateway(keep_alive))
+            return keep_alive
+
+    try:
+        status = parse_status(head)
+        length, chunked = parse_head(head[:-4])
+    except HttpError as e:
+        stream.close()
+        UPSTREAM_ERRORS.inc((upstream, 'response'))
+        HEALTH.report_failure(upstream)
+        writer.write(e.to_response())
+        return False
+    HEALTH.report_success(upstream)
+    latency = time.monotonic() - started
+    STATS.observe(upstream, latency)
+    record_response(upstream, head, latency)
+    if method == b"HEAD" or status < 200 or status in NO_BODY_STATUSES:
+        length, chunked = 0, False
+    if capture is not None and not capture.start(head):
+        capture = None
+    upstream_alive = keeps_alive(head)
+    if length is None and not chunked:
+        # The body ends with the upstream connection; so must the client's
+        keep_alive = upstream_alive = False
+
+    writer.write(set_headers(head, {
+        "Connection": "keep-alive" if keep_alive else "close",
+        "Keep-Alive": None,
+    }, append))
+    try:
+        await relay_body(stream, writer, length, chunked, capture)
+    except (OSError, ValueError, HttpError, asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError, asyncio.TimeoutError) as e:
+        logger.warning("[AsyncProxy] relay from %s:%s aborted: %r", host, port, e)
+        UPSTREAM_ERRORS.inc((upstream, 'aborted'))
+        stream.close()
+        return False
+    pool.release(host, port, stream, upstream_alive)
+    if capture is not None:
+        capture.finish()
+    return keep_alive
+
+
+async def handle_client(reader, writer, port, routes, pool):
+    """
+    Serves the requests of one client connection until it closes, stays idle
+    past the keep-alive timeout, or reaches the request cap.
+    """
+    addr = writer.get_extra_info('peername')
+    CONNECTIONS.inc()
+    try:
+        for served in range(1, KEEPALIVE_MAX_REQUESTS + 1):
+            try:
+                msg = await read_request(reader)
+            except asyncio.TimeoutError:
+                break
+            except asyncio.IncompleteReadError:
+                break
+            except HttpError as e:
+                writer.write(e.to_response())
+                break
+            if msg is None:
+                break
+
+            request = msg.decode('latin-1')
+            keep_alive = served < KEEPALIVE_MAX_REQUESTS and client_keep_alive(request)
+            method = metrics_method(request)
+            if method:
+                writer.write(REGISTRY.response(keep_alive, method))
+                await writer.drain()
+                if not keep_alive:
+                    break
+                continue
+            lookup_key, route = routes.lookup(request_header(request, 'host'), port)
+            capture = None
+            if route.cache:
+                entry = PROXY_CACHE.get(lookup_key, request)
+                if entry is not None:
+                    writer.write(entry.response(keep_alive, request.split(' ', 1)[0]))
+                    await writer.drain()
+                    if not keep_alive:
+                        break
+                    continue
+                capture = PROXY_CACHE.capture(lookup_key, request)
+
+            for attempt in range(UPSTREAM_ATTEMPTS):
+                host, upstream_port, append = route_backend(route, request, addr)
+                if not host:
+                    writer.write(not_found(keep_alive))
+                    break
+                upstream = "{}:{}".format(host, upstream_port)
+                STATS.begin(upstream)
+                try:
+                    result = await forward_request(pool, host, upstream_port, msg,
+                                                   writer, keep_alive, append, capture)
+                finally:
+                    STATS.end(upstream)
+                if result is not None:
+                    keep_alive = result
+                    break
+            else:
+                # Connection refused on every pick
+                writer.write(bad_gateway(keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    except OSError as e:
+        logger.debug("Socket error: %s", e)
+    finally:
+        CONNECTIONS.dec()
+        writer.close()
+
+
+async def serve(ip, port, routes, health_interval=HEALTH_CHECK_INTERVAL,
+                health_path=None, reuse_port=False):
+    """
+    Runs the asyncio proxy server until cancelled.
+
+    :params ip (str): IP address to bind the proxy server.
+    :params port (int): port number to listen on.
+    :params routes (dict): dictionary mapping hostnames and location.
+    :params health_interval (float): seconds between active health probes.
+    :params health_path (str): path probed with ``GET``, None for TCP probes.
+    :params reuse_port (bool): bind with ``SO_REUSEPORT``.
+    """
+    routes = compile_routes(routes)
+    pool = AsyncUpstreamPool()
+    listener = create_listener(ip, port, reuse_port)
+    # Probes block on sockets, so they keep running in their own thread
+    start_health_checks(routes, health_interval, health_path)
+    server = await asyncio.start_server(
+        lambda r, w: handle_client(r, w, port, routes, pool),
+        sock=listener, limit=MAX_HEADER_SIZE)
+    logger.info("[Proxy] asyncio engine listening on IP %s port %s", ip, port)
+    async with server:
+        await server.serve_forever()
+
+
+def run_proxy_async(ip, port, routes, health_interval=HEALTH_CHECK_INTERVAL,
+                    health_path=None, reuse_port=False):
+    """
+    Starts the asyncio engine of the proxy.
+
+    :params ip (str): IP address to bind the proxy server.
+    :params port (int): port number to listen on.
+    :params routes (dict): dictionary mapping hostnames and location.
+    :params health_interval (float): seconds between active health probes,
+                                     0 disables them.
+    :params health_path (str): path probed with ``GET``, None for TCP probes.
+    :params reuse_port (bool): bind with ``SO_REUSEPORT`` to share the port
+                               with sibling worker processes.
+    """
+    try:
+        asyncio.run(serve(ip, port, routes, health_interval, health_path, reuse_port))
+    except socket.error as e:
+        logger.error("Socket error: %s", e)
@@ -23,14 +23,18 @@ Requirements:
 --------------
 - socket: provide socket networking interface.
 - threading: Enables concurrent client handling via threads.
+- workerpool: bounded pool of worker threads for accepted connections.
+- prefork: listening sockets and the multi-process supervisor.
 - response: response utilities.
 - httpadapter: the class for handling HTTP requests.
 - CaseInsensitiveDict: provides dictionary for managing headers or routes.
+- eventloop: the non-blocking ``selectors`` serving mode.
 
 
 Notes:
 ------
-- The server create daemon threads for client handling.
+- The server hands clients to a bounded pool of daemon threads, or multiplexes every
+  client in one ``selectors`` loop when started in ``event`` mode.
 - The current implementation error handling is minimal, socket errors are printed to the console.
 - The actual request processing is delegated to the HttpAdapter class.
 
@@ -40,17 +44,31 @@ Usage Example:
 
 """
 
+import logging
+import os
 import socket
 import threading
 import argparse
 
 from .response import *
-from .httpadapter import HttpAdapter
+from .httpadapter import HttpAdapter, KEEPALIVE_TIMEOUT, KEEPALIVE_MAX_REQUESTS
+from .eventloop import run_event_loop
+from .workerpool import WorkerPool, POOL_SIZE, QUEUE_DEPTH
+from .prefork import create_listener, supervise
 from .dictionary import CaseInsensitiveDict
+from .router import compile_router
+from .contenttypes import CONTENT_TYPES, MIME_CONFIG
+from .filecache import FILE_CACHE
+from .compression import ENCODED_CACHE
+from .metrics import register_cache
 
+logger = logging.getLogger(__name__)
 
 
-def handle_client(ip, port, conn, addr, routes):
+
+def handle_client(ip, port, conn, addr, routes,
+                  keepalive_timeout=KEEPALIVE_TIMEOUT,
+                  max_requests=KEEPALIVE_MAX_REQUESTS):
     """
     Initializes an HttpAdapter instance and delegates the client handling logic to it.
 
@@ -59,57 +77,110 @@ def handle_client(ip, port, conn, addr, routes):
     :param conn (socket.socket): Client connection socket.
     :param addr (tuple): client address (IP, port).
     :param routes (dict): Dictionary of route handlers.
+    :param keepalive_timeout (float): Idle timeout of a persistent connection.
+    :param max_requests (int): Request cap of a persistent connection.
     """
-    daemon = HttpAdapter(ip, port, conn, addr, routes)
+    daemon = HttpAdapter(ip, port, conn, addr, routes,
+                         keepalive_timeout=keepalive_timeout,
+                         max_requests=max_requests)
 
     # Handle client
     daemon.handle_client(conn, addr, routes)
 
-def run_backend(ip, port, routes):
+def run_backend(ip, port, routes,
+                keepalive_timeout=KEEPALIVE_TIMEOUT,
+                max_requests=KEEPALIVE_MAX_REQUESTS,
+                pool_size=POOL_SIZE,
+                queue_depth=QUEUE_DEPTH,
+                reuse_port=False):
     """
     Starts the backend server, binds to the specified IP and port, and listens for incoming
-    connections. Each connection is handled in a separate thread. The backend accepts incoming
-    connections and spawns a thread for each client.
+    connections. Accepted connections are queued to a fixed pool of worker threads; when
+    the queue is full the connection is answered with 503 instead of spawning a thread.
 
 
     :param ip (str): IP address to bind the server.
     :param port (int): Port number to listen on.
     :param routes (dict): Dictionary of route handlers.
+    :param keepalive_timeout (float): Idle timeout of a persistent connection.
+    :param max_requests (int): Request cap of a persistent connection.
+    :param pool_size (int): Number of worker threads.
+    :param queue_depth (int): Accepted connections allowed to wait for a worker.
+    :param reuse_port (bool): Bind with ``SO_REUSEPORT`` to share the port
+                              with sibling worker processes.
     """
-    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-
     try:
-        server.bind((ip, port))
-        server.listen(50)
-        print("[Backend] Listening on port {}".format(port))
-        if routes != {}:
-            print("[Backend] route settings {}".format(routes))
+        server = create_listener(ip, port, reuse_port)
+        logger.info("[Backend] Listening on port %s", port)
+        if routes:
+            logger.info("[Backend] route settings %s", routes)
 
+        # Các worker thread cố định xử lý client lấy từ hàng đợi có giới hạn
+        pool = WorkerPool(handle_client, pool_size, queue_depth, name="backend")
         while True:
             conn, addr = server.accept()
-            #
-            #  TODO: implement the step of the client incomping connection
-            #        using multi-thread programming with the
-            #        provided handle_client routine
-            #
-            #########IMPLEMENT##########################################
-            # Tạo thread mới để xử lý client -> Luồng mới được tạo nhưng chưa chạy ngay lập tức.
-            client_thread = threading.Thread(target=handle_client, args=(ip, port, conn, addr, routes))
-            # chương trình chính (main thread) kết thúc, các daemon thread sẽ tự động dừng lại
-            client_thread.daemon = True
-            #Bắt đầu chạy luồng
-            client_thread.start()
-            ############################################################
+            pool.submit(conn, ip, port, conn, addr, routes,
+                        keepalive_timeout, max_requests)
     except socket.error as e:
-      print("Socket error: {}".format(e))
+      logger.error("Socket error: %s", e)
+
+#: Serving modes accepted by :func:`create_backend`.
+BACKEND_MODES = ('thread', 'event')
+
 
-def create_backend(ip, port, routes={}):
+def create_backend(ip, port, routes={},
+                   keepalive_timeout=KEEPALIVE_TIMEOUT,
+                   max_requests=KEEPALIVE_MAX_REQUESTS,
+                   mode='thread',
+                   pool_size=POOL_SIZE,
+                   queue_depth=QUEUE_DEPTH,
+                   workers=1,
+                   mime_config=None):
     """
     Entry point for creating and running the backend server.
 
     :param ip (str): IP address to bind the server.
     :param port (int): Port number to listen on.
     :param routes (dict, optional): Dictionary of route handlers. Defaults to empty dict.
+    :param keepalive_timeout (float, optional): Idle timeout of a persistent connection.
+    :param max_requests (int, optional): Request cap of a persistent connection.
+    :param mode (str, optional): ``thread`` to hand connections to a bounded
+                                 :class:`WorkerPool <daemon.workerpool.WorkerPool>`,
+                                 or ``event`` for the ``selectors`` loop.
+    :param pool_size (int, optional): Worker threads of the ``thread`` mode,
+                                      the most connections served at once.
+    :param queue_depth (int, optional): Accepted connections of the ``thread``
+                                        mode waiting for a free worker; more
+                                        are answered with 503.
+    :param workers (int, optional): Number of processes sharing the port;
+                                    more than one starts a supervisor that
+                                    forks and restarts them.
+    :param mime_config (str, optional): Content types and directories of the
+                                        static files, by default
+                                        ``config/mime.conf`` when present.
+
+    :raises ValueError: If the mode is unknown, or a route pattern is invalid.
+    :raises OSError: If the content types configuration cannot be read.
     """
 
-    run_backend(ip, port, routes)
\ No newline at end of file
+    # Compiled once, before any worker is started or forked
+    routes = compile_router(routes)
+    if mime_config or os.path.exists(MIME_CONFIG):
+        CONTENT_TYPES.load(mime_config or MIME_CONFIG)
+    register_cache('file', FILE_CACHE)
+    register_cache('encoded', ENCODED_CACHE)
+
+    if mode == 'thread':
+        target = run_backend
+        args = (ip, port, routes, keepalive_timeout, max_requests,
+                pool_size, queue_depth)
+    elif mode == 'event':
+        target = run_event_loop
+        args = (ip, port, routes, keepalive_timeout, max_requests)
+    else:
+        raise ValueError("Invalid backend mode: {}".format(mode))
+
+    if workers > 1:
+        supervise(workers, target, *args, reuse_port=True)
+    else:
+        target(*args)
\ No newline at end of file
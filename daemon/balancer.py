@@ -0,0 +1,247 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.balancer
+~~~~~~~~~~~~~~~~~
+
+This module tracks the load of every proxy upstream and implements the
+load-aware routing policies of ``dist_policy``:
+
+- ``least-conn``: the upstream with the fewest in-flight requests.
+- ``ewma``: power of two choices; two random upstreams are compared on their
+  exponentially weighted moving average response latency, scaled by their
+  in-flight requests, and the cheaper one is picked.
+- ``hash``: consistent hashing of the client address, a header or a cookie
+  on a ring of virtual nodes, so a key keeps reaching the same upstream and
+  adding or removing an upstream only moves the keys of its own arcs.
+
+Sticky sessions pin a client to the upstream named by a cookie the proxy
+sets on the first response, whatever the policy.
+
+Every policy honours the ``weight`` of the upstreams: a weight of 3 takes three
+times the share of a weight of 1. The weighted round-robin schedule itself is
+precomputed per route by :mod:`daemon.routing`.
+
+The latency is measured from sending the request to receiving the response
+header block, so a large body or a slow client does not count against the
+upstream.
+
+Usage Example:
+--------------
+>>> STATS.begin("10.0.0.2:9000")
+>>> STATS.observe("10.0.0.2:9000", 0.012)
+>>> STATS.end("10.0.0.2:9000")
+>>> pick_least_conn(route.upstreams)
+"""
+
+import bisect
+import functools
+import hashlib
+import random
+import threading
+
+#: Weight of the newest latency sample in the moving average.
+EWMA_ALPHA = 0.3
+#: Points on the hash ring per unit of upstream weight.
+HASH_VNODES = 160
+
+
+class UpstreamStats:
+    """
+    Load of one upstream.
+
+    :attrs inflight (int): requests sent and not yet completed.
+    :attrs ewma (float): moving average of the response latency, in seconds.
+    """
+
+    __attrs__ = [
+        "inflight",
+        "ewma",
+    ]
+
+    def __init__(self):
+        self.inflight = 0
+        self.ewma = 0.0
+
+
+class StatsRegistry:
+    """
+    Load of every upstream, keyed by its ``host:port`` string.
+    """
+
+    def __init__(self, alpha=EWMA_ALPHA):
+        self.alpha = alpha
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def get(self, upstream):
+        """
+        :params upstream (str): ``host:port`` of the upstream.
+
+        :rtype UpstreamStats: its statistics, created on first use.
+        """
+        stats = self._stats.get(upstream)
+        if stats is None:
+            with self._lock:
+                stats = self._stats.setdefault(upstream, UpstreamStats())
+        return stats
+
+    def begin(self, upstream):
+        """Counts a request sent to the upstream."""
+        stats = self.get(upstream)
+        with self._lock:
+            stats.inflight += 1
+
+    def end(self, upstream):
+        """Counts a request of the upstream as completed."""
+        stats = self.get(upstream)
+        with self._lock:
+            stats.inflight -= 1
+
+    def snapshot(self):
+        """
+        :rtype list: (upstream, inflight, ewma) of every upstream seen so far.
+        """
+        with self._lock:
+            return [(upstream, stats.inflight, stats.ewma)
+                    for upstream, stats in self._stats.items()]
+
+    def observe(self, upstream, latency):
+        """
+        Folds a latency sample into the moving average.
+
+        :params upstream (str): ``host:port`` of the upstream.
+        :params latency (float): seconds until the response head arrived.
+        """
+        stats = self.get(upstream)
+        with self._lock:
+            if stats.ewma:
+                stats.ewma += self.alpha * (latency - stats.ewma)
+            else:
+                stats.ewma = latency
+
+
+def pick_least_conn(upstreams, registry=None):
+    """
+    Picks the upstream with the fewest in-flight requests per unit of weight;
+    ties are broken at random so idle upstreams share the traffic.
+
+    :params upstreams (list): :class:`Upstream <daemon.routing.Upstream>` objects.
+
+    :rtype Upstream: the selected upstream.
+    """
+    registry = registry or STATS
+    loads = [(registry.get(u.key).inflight / u.weight, u) for u in upstreams]
+    least = min(load for load, u in loads)
+    return random.choice([u for load, u in loads if load == least])
+
+
+def pick_ewma(upstreams, registry=None):
+    """
+    Power of two choices on latency: compares two random upstreams on
+    ``ewma * (inflight + 1) / weight`` and picks the cheaper one.
+
+    :params upstreams (list): :class:`Upstream <daemon.routing.Upstream>` objects.
+
+    :rtype Upstream: the selected upstream.
+    """
+    registry = registry or STATS
+    if len(upstreams) == 1:
+        return upstreams[0]
+
+    def cost(upstream):
+        stats = registry.get(upstream.key)
+        return stats.ewma * (stats.inflight + 1) / upstream.weight
+
+    first, second = random.sample(upstreams, 2)
+    return first if cost(first) <= cost(second) else second
+
+
+def pick_random(upstreams):
+    """
+    Picks an upstream at random, in proportion to its weight.
+
+    :params upstreams (list): :class:`Upstream <daemon.routing.Upstream>` objects.
+
+    :rtype Upstream: the selected upstream.
+    """
+    return random.choices(upstreams, [u.weight for u in upstreams])[0]
+
+
+def hash_point(key):
+    """
+    :params key (str): a ring key.
+
+    :rtype int: its 64-bit position on the hash ring.
+    """
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+
+class HashRing:
+    """
+    Consistent-hash ring of the upstreams of one host.
+
+    Each upstream owns ``vnodes * weight`` points; a key belongs to the first
+    point at or after its own hash. Points of unavailable upstreams are
+    skipped, so an ejection only moves the keys that upstream owned.
+
+    :attrs upstreams (tuple): upstreams on the ring.
+    """
+
+    __attrs__ = [
+        "upstreams",
+    ]
+
+    def __init__(self, upstreams, vnodes=HASH_VNODES):
+        self.upstreams = tuple(upstreams)
+        points = []
+        for upstream in self.upstreams:
+            for replica in range(vnodes * upstream.weight):
+                points.append((hash_point("{}#{}".format(upstream.key, replica)), upstream))
+        points.sort(key=lambda point: point[0])
+        self._hashes = [point for point, upstream in points]
+        self._owners = [upstream for point, upstream in points]
+
+    def lookup(self, key, allowed=None):
+        """
+        :params key (str): the request key, e.g. the client address.
+        :params allowed (list): upstreams that may be returned, None for all.
+
+        :rtype Upstream: the upstream owning the key, None if none is allowed.
+        """
+        if not self._hashes:
+            return None
+        start = bisect.bisect_left(self._hashes, hash_point(key))
+        count = len(self._owners)
+        if allowed is None:
+            return self._owners[start % count]
+        allowed = set(allowed)
+        for step in range(count):
+            owner = self._owners[(start + step) % count]
+            if owner in allowed:
+                return owner
+        return None
+
+
+@functools.lru_cache(maxsize=1024)
+def sticky_id(upstream):
+    """
+    :params upstream (str): ``host:port`` of an upstream.
+
+    :rtype str: the opaque sticky cookie value naming the upstream.
+    """
+    return hashlib.md5(upstream.encode('utf-8')).hexdigest()[:16]
+
+
+#: Registry shared by every proxy worker thread.
+STATS = StatsRegistry()
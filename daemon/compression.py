@@ -0,0 +1,204 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.compression
+~~~~~~~~~~~~~~~~~
+
+This module negotiates the ``Content-Encoding`` of text responses from the
+``Accept-Encoding`` request header and compresses them with ``zlib``, as
+``gzip`` or ``deflate``.
+
+Only the types of :data:`COMPRESSIBLE_TYPES` of at least
+:data:`COMPRESS_MIN_SIZE` bytes are compressed: images and media are already
+compressed, and small bodies do not win back the framing overhead.
+
+Compressed files are kept in an :class:`EncodedCache <EncodedCache>`, keyed by
+path and coding and validated by the size and ``mtime`` of the file, so a page
+is compressed once per version and not per request. A precompressed
+``file.gz`` next to ``file`` is served as is for ``gzip`` when it is not older
+than the file.
+
+Usage Example:
+--------------
+>>> coding = negotiate(request.headers.get('accept-encoding'))
+>>> if coding and compressible('text/css', len(content)):
+...     body = ENCODED_CACHE.get(path, (len(content), mtime), coding, content)
+"""
+
+import os
+import threading
+import zlib
+from collections import OrderedDict
+
+#: Smallest body compressed, in bytes.
+COMPRESS_MIN_SIZE = 1024
+#: zlib compression level, a trade of CPU for size.
+COMPRESS_LEVEL = 6
+#: MIME types, or prefixes ending in ``/``, that are compressed.
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/javascript',
+    'application/json',
+    'application/xml',
+    'image/svg+xml',
+    'image/x-icon',
+)
+#: Codings supported, in order of preference.
+CODINGS = ('gzip', 'deflate')
+#: Bytes of compressed files kept in memory.
+ENCODED_CACHE_SIZE = 8 * 1024 * 1024
+
+
+def negotiate(accept_encoding):
+    """
+    Picks the coding of a response from the ``Accept-Encoding`` header.
+
+    :params accept_encoding (str): the header value, may be None.
+
+    :rtype str: ``gzip`` or ``deflate``; None to send the body as is.
+    """
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(','):
+        name, _, params = item.strip().partition(';')
+        name = name.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+    best, best_q = None, 0.0
+    for coding in CODINGS:
+        q = weights.get(coding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compressible(mime_type, size):
+    """
+    :params mime_type (str): the ``Content-Type`` of the body.
+    :params size (int): bytes of the body.
+
+    :rtype bool: True if the body is worth compressing.
+    """
+    if size < COMPRESS_MIN_SIZE or not mime_type:
+        return False
+    mime_type = mime_type.split(';', 1)[0].strip().lower()
+    for allowed in COMPRESSIBLE_TYPES:
+        if mime_type == allowed or (allowed.endswith('/') and mime_type.startswith(allowed)):
+            return True
+    return False
+
+
+def compress(data, coding):
+    """
+    :params data (bytes): the body.
+    :params coding (str): ``gzip`` or ``deflate``.
+
+    :rtype bytes: the encoded body.
+    """
+    # wbits 31 writes the gzip container, 15 the zlib one HTTP calls deflate
+    encoder = zlib.compressobj(COMPRESS_LEVEL, zlib.DEFLATED,
+                               31 if coding == 'gzip' else 15)
+    return encoder.compress(data) + encoder.flush()
+
+
+class EncodedCache:
+    """
+    Byte-bounded LRU cache of compressed files.
+
+    :attrs max_size (int): bytes of compressed content kept.
+    :attrs hits (int): bodies served already compressed.
+    :attrs misses (int): bodies compressed or read from a ``.gz`` file.
+    :attrs size (int): bytes of compressed content currently kept.
+    """
+
+    __attrs__ = [
+        "max_size",
+        "hits",
+        "misses",
+        "size",
+    ]
+
+    def __init__(self, max_size=ENCODED_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        #: (absolute path, coding) -> (version, encoded), least recent first
+        self._variants = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path, version, coding, content):
+        """
+        Returns a file compressed with a coding, compressing it only once per
+        version of the file.
+
+        :params path (str): path of the file.
+        :params version: anything that changes with the file, e.g. its size
+                         and ``mtime``.
+        :params coding (str): ``gzip`` or ``deflate``.
+        :params content (bytes): the file content.
+
+        :rtype bytes: the encoded content.
+        """
+        key = (os.path.abspath(path), coding)
+        with self._lock:
+            variant = self._variants.get(key)
+            if variant is not None and variant[0] == version:
+                self._variants.move_to_end(key)
+                self.hits += 1
+                return variant[1]
+
+        encoded = None
+        if coding == 'gzip':
+            encoded = self._precompressed(key[0])
+        if encoded is None:
+            encoded = compress(content, coding)
+
+        with self._lock:
+            self.misses += 1
+            old = self._variants.pop(key, None)
+            if old is not None:
+                self.size -= len(old[1])
+            if len(encoded) <= self.max_size:
+                self._variants[key] = (version, encoded)
+                self.size += len(encoded)
+            while self.size > self.max_size:
+                _, evicted = self._variants.popitem(last=False)
+                self.size -= len(evicted[1])
+        return encoded
+
+    def _precompressed(self, path):
+        """
+        :params path (str): absolute path of the file.
+
+        :rtype bytes: content of ``path.gz`` if it is not older than the file,
+                      else None.
+        """
+        try:
+            if os.stat(path + '.gz').st_mtime_ns < os.stat(path).st_mtime_ns:
+                return None
+            with open(path + '.gz', 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+
+#: Cache shared by every worker thread of the backend.
+ENCODED_CACHE = EncodedCache()
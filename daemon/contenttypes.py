@@ -0,0 +1,110 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.contenttypes
+~~~~~~~~~~~~~~~~~
+
+This module maps the extension of a requested file to its ``Content-Type`` and
+to the directory it is served from. The table is built once at startup from
+the pages and assets every deployment serves, then extended and overridden by
+``config/mime.conf``:
+
+.. code-block:: nginx
+
+    root "www/" {
+        text/html html htm;
+    }
+
+A lookup is a single dict access; an extension absent from the table is not
+served, so files such as sources or configuration next to the docroots are
+never exposed by their type.
+
+Usage Example:
+--------------
+>>> CONTENT_TYPES.load("config/mime.conf")
+>>> CONTENT_TYPES.lookup("/css/styles.css")
+('text/css', 'static/')
+"""
+
+import os
+import re
+
+#: Directory of the static assets.
+DEFAULT_DOCROOT = "static/"
+#: Configuration file read at startup when present.
+MIME_CONFIG = "config/mime.conf"
+#: (extension, content type, directory) served even without configuration.
+BUILTIN_TYPES = (
+    ('.html', 'text/html', 'www/'),
+    ('.htm', 'text/html', 'www/'),
+    ('.ico', 'image/x-icon', 'static/images/'),
+    ('.css', 'text/css', DEFAULT_DOCROOT),
+    ('.txt', 'text/plain', DEFAULT_DOCROOT),
+    ('.js', 'application/javascript', DEFAULT_DOCROOT),
+    ('.json', 'application/json', DEFAULT_DOCROOT),
+    ('.png', 'image/png', DEFAULT_DOCROOT),
+    ('.jpg', 'image/jpeg', DEFAULT_DOCROOT),
+    ('.jpeg', 'image/jpeg', DEFAULT_DOCROOT),
+    ('.gif', 'image/gif', DEFAULT_DOCROOT),
+    ('.svg', 'image/svg+xml', DEFAULT_DOCROOT),
+    ('.mp4', 'video/mp4', DEFAULT_DOCROOT),
+)
+
+
+class ContentTypes:
+    """
+    Extension to ``(content type, directory)`` table.
+
+    :attrs types (dict): lowercase extension with its dot -> (content type,
+                         directory).
+    """
+
+    __attrs__ = [
+        "types",
+    ]
+
+    def __init__(self):
+        self.types = {}
+        for extension, content_type, directory in BUILTIN_TYPES:
+            self.types[extension] = (content_type, directory)
+
+    def load(self, config_file):
+        """
+        Adds the ``root`` blocks of a configuration file to the table.
+
+        :params config_file (str): path of the file.
+
+        :raises OSError: If the file cannot be read.
+        """
+        with open(config_file, 'r') as f:
+            config_text = re.sub(r'#[^\n]*', '', f.read())
+
+        for directory, block in re.findall(r'root\s+"([^"]+)"\s*\{(.*?)\}', config_text, re.DOTALL):
+            if not directory.endswith('/'):
+                directory += '/'
+            for content_type, extensions in re.findall(r'([\w.+-]+/[\w.+-]+)\s+([^;]+);', block):
+                for extension in extensions.split():
+                    self.types['.' + extension.lstrip('.').lower()] = (content_type, directory)
+
+    def lookup(self, path):
+        """
+        :params path (str): the requested path.
+
+        :rtype tuple: (content type, directory) of the file, None if its
+                      extension is not served.
+        """
+        return self.types.get(os.path.splitext(path)[1].lower())
+
+
+#: Table shared by every worker of the backend.
+CONTENT_TYPES = ContentTypes()
@@ -0,0 +1,277 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.eventloop
+~~~~~~~~~~~~~~~~~
+
+This module provides the non-blocking serving mode of the backend. All client
+connections are multiplexed by a single ``selectors`` loop (epoll on Linux),
+requests are framed incrementally with :class:`HttpParser <HttpParser>` and
+answered by an :class:`HttpAdapter <HttpAdapter>`, so the number of clients
+is no longer bounded by the number of threads.
+
+Notes:
+------
+- Route handlers run inline on the loop thread; a slow handler delays every
+  other connection, so handlers should not block.
+- Persistent connections follow the same keep-alive rules as the threaded mode.
+
+Usage Example:
+--------------
+>>> run_event_loop("127.0.0.1", 9000, routes={})
+
+"""
+
+import errno
+import logging
+import selectors
+import socket
+import time
+
+from .request import Request
+from .response import Response
+from .httpadapter import HttpAdapter, KEEPALIVE_TIMEOUT, KEEPALIVE_MAX_REQUESTS
+from .httpreader import HttpParser, HttpError, RECV_BUFFER_SIZE
+from .prefork import create_listener
+from .metrics import CONNECTIONS
+
+logger = logging.getLogger(__name__)
+
+#: Seconds between two sweeps of idle connections.
+SWEEP_INTERVAL = 1.0
+#: Pending output above which a connection stops parsing pipelined requests.
+MAX_PENDING_OUTPUT = 1024 * 1024
+#: ``accept()`` errors meaning no descriptor or memory is left; accepting
+#: pauses until the next sweep instead of spinning on the listener.
+ACCEPT_EXHAUSTED = (errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM)
+
+
+class Connection:
+    """
+    State of one client connection served by the event loop.
+
+    :attrs sock (socket.socket): non-blocking client socket.
+    :attrs adapter (HttpAdapter): adapter building the responses.
+    :attrs parser (HttpParser): incremental request framing.
+    :attrs outbuf (bytearray): response bytes not yet written.
+    :attrs sending (FileBody): file sent with ``sendfile`` once ``outbuf``
+                               is flushed, None when there is none.
+    :attrs served (int): number of requests answered.
+    :attrs closing (bool): close once ``outbuf`` is flushed.
+    :attrs last_active (float): monotonic time of the last I/O.
+    :attrs events (int): selector events currently registered.
+    """
+
+    __attrs__ = [
+        "sock",
+        "adapter",
+        "parser",
+        "outbuf",
+        "sending",
+        "served",
+        "closing",
+        "last_active",
+        "events",
+    ]
+
+    def __init__(self, sock, adapter):
+        self.sock = sock
+        self.adapter = adapter
+        self.parser = HttpParser(adapter.max_header_size, adapter.max_body_size)
+        self.outbuf = bytearray()
+        self.sending = None
+        self.served = 0
+        self.closing = False
+        self.last_active = time.monotonic()
+        self.events = selectors.EVENT_READ
+
+
+def process_requests(conn, routes):
+    """
+    Answers every complete request buffered on the connection.
+
+    Parsing stops when the connection is about to close, too much output is
+    pending or a file is being sent, leaving later pipelined requests buffered
+    for the next round.
+
+    :param conn (Connection): the client connection.
+    :param routes (dict): Dictionary of route handlers.
+    """
+    adapter = conn.adapter
+    while not conn.closing and conn.sending is None \
+            and len(conn.outbuf) < MAX_PENDING_OUTPUT:
+        try:
+            msg = conn.parser.next_message()
+        except HttpError as e:
+            conn.outbuf += e.to_response()
+            conn.closing = True
+            return
+        if msg is None:
+            return
+        conn.served += 1
+
+        # Fresh request/response handlers for every message
+        adapter.request = Request()
+        adapter.response = Response()
+        response, keep_alive = adapter.handle_request(
+            msg.decode('utf-8', errors='replace'), routes, conn.served)
+        conn.outbuf += response
+        # Sent with sendfile after the header, before any later response
+        conn.sending = adapter.response.file_body
+        if not keep_alive or conn.served >= adapter.max_requests:
+            conn.closing = True
+
+
+def run_event_loop(ip, port, routes,
+                   keepalive_timeout=KEEPALIVE_TIMEOUT,
+                   max_requests=KEEPALIVE_MAX_REQUESTS,
+                   reuse_port=False):
+    """
+    Starts the backend in event-loop mode, binds to the specified IP and port,
+    and multiplexes every client connection in one ``selectors`` loop.
+
+    :param ip (str): IP address to bind the server.
+    :param port (int): Port number to listen on.
+    :param routes (dict): Dictionary of route handlers.
+    :param keepalive_timeout (float): Idle timeout of a persistent connection.
+    :param max_requests (int): Request cap of a persistent connection.
+    :param reuse_port (bool): Bind with ``SO_REUSEPORT`` to share the port
+                              with sibling worker processes.
+    """
+    sel = selectors.DefaultSelector()
+    server = None
+
+    # The loop is single threaded, so one receive buffer serves every client
+    buf = bytearray(RECV_BUFFER_SIZE)
+    view = memoryview(buf)
+
+    def close(conn):
+        sel.unregister(conn.sock)
+        CONNECTIONS.dec()
+        conn.sock.close()
+        if conn.sending is not None:
+            conn.sending.close()
+
+    def watch(conn, events):
+        # Skip the system call when the interest set does not change
+        if conn.events != events:
+            sel.modify(conn.sock, events, conn)
+            conn.events = events
+
+    def flush(conn):
+        """Writes pending output; returns False once the connection is closed."""
+        try:
+            while conn.outbuf:
+                sent = conn.sock.send(conn.outbuf)
+                del conn.outbuf[:sent]
+            if conn.sending is not None and conn.sending.send_some(conn.sock):
+                conn.sending = None
+        except BlockingIOError:
+            pass
+        except socket.error:
+            close(conn)
+            return False
+        conn.last_active = time.monotonic()
+
+        if conn.outbuf or conn.sending is not None:
+            watch(conn, selectors.EVENT_READ | selectors.EVENT_WRITE)
+            return True
+        if conn.closing:
+            close(conn)
+            return False
+        watch(conn, selectors.EVENT_READ)
+        return True
+
+    def on_readable(conn):
+        try:
+            n = conn.sock.recv_into(buf)
+        except BlockingIOError:
+            return
+        except socket.error:
+            close(conn)
+            return
+        if n == 0:
+            close(conn)
+            return
+        conn.last_active = time.monotonic()
+        conn.parser.feed(view[:n])
+        process_requests(conn, routes)
+        flush(conn)
+
+    def on_writable(conn):
+        if flush(conn) and not conn.outbuf and conn.sending is None:
+            # Output drained: answer pipelined requests held back meanwhile
+            process_requests(conn, routes)
+            flush(conn)
+
+    try:
+        server = create_listener(ip, port, reuse_port)
+        server.setblocking(False)
+        sel.register(server, selectors.EVENT_READ, None)
+        logger.info("[Backend] Event loop listening on port %s", port)
+        if routes:
+            logger.info("[Backend] route settings %s", routes)
+
+        last_sweep = time.monotonic()
+        accepting = True
+        while True:
+            for key, mask in sel.select(timeout=SWEEP_INTERVAL):
+                if key.data is None:
+                    # Accept every pending connection
+                    while True:
+                        try:
+                            sock, addr = server.accept()
+                        except BlockingIOError:
+                            break
+                        except OSError as e:
+                            # A connection reset before it was accepted, or
+                            # descriptors ran out: the listener stays open
+                            logger.warning("[Backend] accept failed: %s", e)
+                            if e.errno in ACCEPT_EXHAUSTED:
+                                sel.unregister(server)
+                                accepting = False
+                            break
+                        sock.setblocking(False)
+                        adapter = HttpAdapter(ip, port, sock, addr, routes,
+                                              keepalive_timeout=keepalive_timeout,
+                                              max_requests=max_requests)
+                        sel.register(sock, selectors.EVENT_READ, Connection(sock, adapter))
+                        CONNECTIONS.inc()
+                    continue
+
+                conn = key.data
+                if mask & selectors.EVENT_WRITE:
+                    on_writable(conn)
+                    if conn.sock.fileno() < 0:
+                        continue
+                if mask & selectors.EVENT_READ:
+                    on_readable(conn)
+
+            # Drop idle persistent connections
+            now = time.monotonic()
+            if now - last_sweep >= SWEEP_INTERVAL:
+                last_sweep = now
+                if not accepting:
+                    sel.register(server, selectors.EVENT_READ, None)
+                    accepting = True
+                for key in list(sel.get_map().values()):
+                    conn = key.data
+                    if conn is not None and not conn.outbuf and conn.sending is None \
+                            and now - conn.last_active > keepalive_timeout:
+                        close(conn)
+    except socket.error as e:
+        logger.error("Socket error: %s", e)
+    finally:
+        sel.close()
+        if server is not None:
+            server.close()
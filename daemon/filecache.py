@@ -0,0 +1,283 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.filecache
+~~~~~~~~~~~~~~~~~
+
+This module keeps the static files served by the backend in memory. A
+:class:`FileCache <FileCache>` maps the absolute path of a file to its content
+and is bounded by its total size in bytes, evicting the least recently used
+files.
+
+An entry stays valid while the ``mtime`` and size of its file are unchanged.
+The file is stat'ed again at most once per ``check_interval`` seconds, so a hot
+page costs neither a read nor a system call on most requests, and an edited
+file is picked up within that interval.
+
+Files larger than ``max_entry`` are not read at all: :meth:`FileCache.load`
+returns them as a :class:`FileBody <FileBody>`, an open file the server sends
+after the response header with ``sendfile``, straight from the page cache.
+
+Usage Example:
+--------------
+>>> content, mtime = FILE_CACHE.read("www/index.html")
+>>> body, mtime = FILE_CACHE.load("static/videos/intro.mp4")
+>>> body.send(conn)
+"""
+
+import os
+import socket
+import threading
+import time
+from collections import OrderedDict
+
+#: Bytes of file content kept in memory.
+FILE_CACHE_SIZE = 32 * 1024 * 1024
+#: Largest file kept in memory; bigger files are sent with sendfile.
+FILE_CACHE_MAX_ENTRY = 1024 * 1024
+#: Seconds during which a cached file is served without checking it again.
+FILE_CHECK_INTERVAL = 1.0
+
+
+class CachedFile:
+    """
+    Content of one file and the stat it was read with.
+
+    :attrs content (bytes): the file content.
+    :attrs mtime (int): modification time in nanoseconds.
+    :attrs checked (float): monotonic time of the last validation.
+    """
+
+    __attrs__ = [
+        "content",
+        "mtime",
+        "checked",
+    ]
+
+    def __init__(self, content, mtime, checked):
+        self.content = content
+        self.mtime = mtime
+        self.checked = checked
+
+
+class FileBody:
+    """
+    Part of an open file, sent after the response header with ``sendfile``.
+
+    :attrs file (file): the file, opened in binary mode.
+    :attrs size (int): bytes of the body, its ``Content-Length``.
+    :attrs offset (int): position of the next byte to send.
+    :attrs remaining (int): bytes left to send.
+    :attrs mtime (int): modification time of the file in nanoseconds.
+    """
+
+    __attrs__ = [
+        "file",
+        "size",
+        "offset",
+        "remaining",
+        "mtime",
+    ]
+
+    def __init__(self, file, size, offset=0, mtime=0):
+        self.file = file
+        self.size = size
+        self.offset = offset
+        self.remaining = size
+        self.mtime = mtime
+
+    def narrow(self, start, length):
+        """
+        Restricts the body to a byte range of the file, for a ``206`` response.
+
+        :params start (int): offset of the first byte of the range.
+        :params length (int): bytes of the range.
+        """
+        self.offset = start
+        self.size = self.remaining = length
+
+    def send(self, sock):
+        """
+        Sends the whole body on a blocking socket, then closes the file.
+
+        :params sock (socket.socket): the client connection.
+        """
+        try:
+            sock.sendfile(self.file, self.offset, self.remaining)
+        finally:
+            self.close()
+
+    def send_some(self, sock):
+        """
+        Sends as much as a non-blocking socket accepts.
+
+        :params sock (socket.socket): the client connection.
+
+        :rtype bool: True once the body is fully sent and the file closed.
+
+        :raises socket.error: If the connection fails; the file is closed.
+        """
+        try:
+            while self.remaining:
+                sent = os.sendfile(sock.fileno(), self.file.fileno(),
+                                   self.offset, self.remaining)
+                if sent == 0:
+                    # The file shrank under us: the response cannot be completed
+                    raise socket.error("file truncated while sending")
+                self.offset += sent
+                self.remaining -= sent
+        except BlockingIOError:
+            return False
+        except OSError:
+            self.close()
+            raise
+        self.close()
+        return True
+
+    def read(self):
+        """
+        :rtype bytes: the body read into memory, for callers without sendfile.
+        """
+        try:
+            self.file.seek(self.offset)
+            return self.file.read(self.remaining)
+        finally:
+            self.close()
+
+    def close(self):
+        self.file.close()
+
+
+class FileCache:
+    """
+    Byte-bounded LRU cache of file contents.
+
+    :attrs max_size (int): bytes of content kept.
+    :attrs max_entry (int): largest file kept.
+    :attrs check_interval (float): seconds between two validations of a file.
+    :attrs hits (int): reads served from memory.
+    :attrs misses (int): reads that went to the disk.
+    :attrs size (int): bytes of content currently kept.
+    """
+
+    __attrs__ = [
+        "max_size",
+        "max_entry",
+        "check_interval",
+        "hits",
+        "misses",
+        "size",
+    ]
+
+    def __init__(self, max_size=FILE_CACHE_SIZE, max_entry=FILE_CACHE_MAX_ENTRY,
+                 check_interval=FILE_CHECK_INTERVAL):
+        self.max_size = max_size
+        self.max_entry = max_entry
+        self.check_interval = check_interval
+        self.hits = 0
+        self.misses = 0
+        self.size = 0
+        #: absolute path -> CachedFile, least recent first
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+
+    def read(self, path):
+        """
+        Returns the content of a file, from memory when it is unchanged.
+
+        :params path (str): path of the file.
+
+        :rtype tuple: (the file content, its modification time in nanoseconds).
+
+        :raises OSError: If the file cannot be stat'ed or read, e.g.
+                         FileNotFoundError.
+        """
+        content, mtime = self.load(path)
+        if isinstance(content, FileBody):
+            content = content.read()
+        return content, mtime
+
+    def load(self, path):
+        """
+        Returns the content of a file, or the open file when it is too large
+        to be kept in memory, with the modification time it was read at.
+
+        :params path (str): path of the file.
+
+        :rtype tuple: (bytes or FileBody, mtime in nanoseconds): the content,
+                      or the file to send with ``sendfile``.
+
+        :raises OSError: If the file cannot be stat'ed or read, e.g.
+                         FileNotFoundError.
+        """
+        key = os.path.abspath(path)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._files.get(key)
+            if entry is not None and now - entry.checked < self.check_interval:
+                self._files.move_to_end(key)
+                self.hits += 1
+                return entry.content, entry.mtime
+
+        st = os.stat(key)
+        if st.st_size > self.max_entry:
+            if entry is not None:
+                self._discard(key)
+            f = open(key, 'rb')
+            # Sized after opening: a concurrent rewrite must not overrun it
+            fst = os.fstat(f.fileno())
+            return FileBody(f, fst.st_size, 0, fst.st_mtime_ns), fst.st_mtime_ns
+        if entry is not None and entry.mtime == st.st_mtime_ns \
+                and len(entry.content) == st.st_size:
+            entry.checked = now
+            self._touch(key)
+            return entry.content, entry.mtime
+
+        with open(key, 'rb') as f:
+            mtime = os.fstat(f.fileno()).st_mtime_ns
+            content = f.read()
+        # Grown past the entry limit since the stat: served, not kept
+        cacheable = len(content) <= self.max_entry
+        self._store(key, CachedFile(content, mtime, now) if cacheable else None)
+        return content, mtime
+
+    def _touch(self, key):
+        with self._lock:
+            if key in self._files:
+                self._files.move_to_end(key)
+            self.hits += 1
+
+    def _discard(self, key):
+        with self._lock:
+            old = self._files.pop(key, None)
+            if old is not None:
+                self.size -= len(old.content)
+
+    def _store(self, key, entry):
+        """Counts a miss and caches what it read, unless ``entry`` is None."""
+        with self._lock:
+            self.misses += 1
+            if entry is None:
+                return
+            old = self._files.pop(key, None)
+            if old is not None:
+                self.size -= len(old.content)
+            self._files[key] = entry
+            self.size += len(entry.content)
+            while self.size > self.max_size:
+                path, evicted = self._files.popitem(last=False)
+                self.size -= len(evicted.content)
+
+
+#: Cache shared by every worker thread of the backend.
+FILE_CACHE = FileCache()
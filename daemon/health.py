@@ -0,0 +1,248 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.health
+~~~~~~~~~~~~~~~~~
+
+This module tracks the health of the proxy upstreams. Two sources feed the
+:class:`HealthRegistry <HealthRegistry>`:
+
+- passive: every forwarded request reports whether the upstream could be
+  connected to and answered; after ``max_fails`` consecutive failures the
+  upstream is ejected for ``fail_timeout`` seconds.
+- active: a :class:`HealthChecker <HealthChecker>` thread probes every upstream
+  periodically (TCP connect, or ``GET`` of a health path) and re-admits an
+  ejected upstream as soon as a probe succeeds.
+
+Routing policies only pick healthy upstreams; an ejected upstream whose
+``fail_timeout`` expired gets trial requests again. Upstreams marked ``backup``
+only receive traffic while every primary upstream of the host is ejected.
+
+Usage Example:
+--------------
+>>> HEALTH.is_healthy("10.0.0.2:9000")
+False
+>>> HEALTH.healthy(route.primaries, route.backups)
+"""
+
+import logging
+import socket
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+#: Consecutive failures that eject an upstream.
+MAX_FAILS = 3
+#: Seconds an ejected upstream is skipped before it gets trial requests.
+FAIL_TIMEOUT = 10.0
+#: Seconds between two active probes of every upstream, 0 disables them.
+HEALTH_CHECK_INTERVAL = 5.0
+#: Seconds allowed to an active probe.
+HEALTH_CHECK_TIMEOUT = 2.0
+
+
+class UpstreamHealth:
+    """
+    Health state of one upstream.
+
+    :attrs fails (int): consecutive failures.
+    :attrs down_until (float): monotonic time until which it is ejected.
+    :attrs max_fails (int): failures that eject it, None for the registry default.
+    """
+
+    __attrs__ = [
+        "fails",
+        "down_until",
+        "max_fails",
+    ]
+
+    def __init__(self, max_fails=None):
+        self.fails = 0
+        self.down_until = 0.0
+        self.max_fails = max_fails
+
+
+class HealthRegistry:
+    """
+    Health of every upstream, keyed by its ``host:port`` string.
+
+    :attrs max_fails (int): consecutive failures that eject an upstream.
+    :attrs fail_timeout (float): seconds an ejected upstream is skipped.
+    """
+
+    __attrs__ = [
+        "max_fails",
+        "fail_timeout",
+    ]
+
+    def __init__(self, max_fails=MAX_FAILS, fail_timeout=FAIL_TIMEOUT):
+        self.max_fails = max_fails
+        self.fail_timeout = fail_timeout
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def _get(self, upstream):
+        state = self._state.get(upstream)
+        if state is None:
+            state = self._state.setdefault(upstream, UpstreamHealth())
+        return state
+
+    def configure(self, upstream, max_fails=None):
+        """
+        Overrides the failure threshold of one upstream.
+
+        :params upstream (str): ``host:port`` of the upstream.
+        :params max_fails (int): consecutive failures that eject it, None for
+                                 the registry default.
+        """
+        with self._lock:
+            self._get(upstream).max_fails = max_fails
+
+    def is_healthy(self, upstream):
+        """
+        :params upstream (str): ``host:port`` of the upstream.
+
+        :rtype bool: False while the upstream is ejected.
+        """
+        state = self._state.get(upstream)
+        return state is None or state.down_until <= time.monotonic()
+
+    def healthy(self, upstreams, backups=()):
+        """
+        Filters the healthy upstreams of a list.
+
+        When every upstream is ejected the healthy backups are returned
+        instead; when those are ejected too the whole list is returned, so a
+        wrong verdict can never take a host completely offline.
+
+        :params upstreams (list): :class:`Upstream <daemon.routing.Upstream>` objects.
+        :params backups (list): upstreams used only as a fallback.
+
+        :rtype list: the healthy subset, in the same order.
+        """
+        now = time.monotonic()
+        state = self._state
+        alive = [u for u in upstreams
+                 if u.key not in state or state[u.key].down_until <= now]
+        if not alive and backups:
+            alive = [u for u in backups
+                     if u.key not in state or state[u.key].down_until <= now]
+        return alive or list(upstreams)
+
+    def report_success(self, upstream):
+        """Records a successful request or probe, re-admitting the upstream."""
+        state = self._state.get(upstream)
+        if state is not None and (state.fails or state.down_until):
+            with self._lock:
+                if state.down_until:
+                    logger.info("[Health] upstream %s is back", upstream)
+                state.fails = 0
+                state.down_until = 0.0
+
+    def report_failure(self, upstream):
+        """Records a failed request or probe, ejecting after ``max_fails``."""
+        with self._lock:
+            state = self._get(upstream)
+            state.fails += 1
+            if state.fails >= (state.max_fails or self.max_fails):
+                if not state.down_until:
+                    logger.warning("[Health] upstream %s ejected after %s failures",
+                                   upstream, state.fails)
+                state.down_until = time.monotonic() + self.fail_timeout
+
+
+def probe(upstream, path=None, timeout=HEALTH_CHECK_TIMEOUT):
+    """
+    Actively checks one upstream.
+
+    :params upstream (str): ``host:port`` of the upstream.
+    :params path (str): health path requested with ``GET``; None only checks
+                        that a TCP connection can be established.
+    :params timeout (float): seconds allowed to the probe.
+
+    :rtype bool: True if the upstream answered (any status below 500 for HTTP).
+    """
+    host, port = upstream.rsplit(":", 1)
+    try:
+        with socket.create_connection((host, int(port)), timeout=timeout) as sock:
+            if path is None:
+                return True
+            sock.sendall((
+                "GET {} HTTP/1.1\r\n"
+                "Host: {}\r\n"
+                "Connection: close\r\n"
+                "\r\n"
+            ).format(path, upstream).encode('latin-1'))
+            status_line = sock.recv(64).split(b"\r\n", 1)[0]
+            return int(status_line.split(b" ", 2)[1]) < 500
+    except (socket.error, ValueError, IndexError):
+        return False
+
+
+class HealthChecker:
+    """
+    Background thread probing every upstream at a fixed interval.
+
+    :attrs upstreams (list): ``host:port`` strings to probe.
+    :attrs interval (float): seconds between two rounds of probes.
+    :attrs path (str): health path, None for TCP probes.
+    """
+
+    __attrs__ = [
+        "upstreams",
+        "interval",
+        "path",
+    ]
+
+    def __init__(self, upstreams, interval=HEALTH_CHECK_INTERVAL, path=None, registry=None):
+        self.upstreams = upstreams
+        self.interval = interval
+        self.path = path
+        self.registry = registry or HEALTH
+
+    def start(self):
+        """Starts the probing thread (a daemon, it stops with the process)."""
+        thread = threading.Thread(target=self._run, name="health-checker")
+        thread.daemon = True
+        thread.start()
+
+    def _run(self):
+        while True:
+            for upstream in self.upstreams:
+                if probe(upstream, self.path):
+                    self.registry.report_success(upstream)
+                else:
+                    self.registry.report_failure(upstream)
+            time.sleep(self.interval)
+
+
+def start_health_checks(routes, interval=HEALTH_CHECK_INTERVAL, path=None):
+    """
+    Applies the per-upstream ``max_fails`` of the routes and starts active
+    probes of every upstream.
+
+    :params routes (RoutingTable): the compiled proxy routes.
+    :params interval (float): seconds between two rounds, 0 disables probing.
+    :params path (str): health path, None for TCP probes.
+    """
+    upstreams = routes.upstreams()
+    for upstream in upstreams:
+        if upstream.max_fails:
+            HEALTH.configure(upstream.key, upstream.max_fails)
+    if interval > 0:
+        HealthChecker([u.key for u in upstreams], interval, path).start()
+
+
+#: Registry shared by every proxy worker thread.
+HEALTH = HealthRegistry()
@@ -0,0 +1,155 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.hooks
+~~~~~~~~~~~~~~~~~
+
+This module calls the route handlers of a :class:`WeApRous
+<daemon.weaprous.WeApRous>` app and turns what they return into a response body.
+
+A handler receives its arguments by name, from the parsed request:
+
+- ``headers``: the request headers, lowercase names.
+- ``body``: the request body, a str.
+- ``cookies``, ``params``: the request cookies and the path parameters.
+- ``request``: the :class:`Request <daemon.request.Request>` itself.
+- any path parameter of the route, e.g. ``id`` for ``/users/<int:id>``.
+
+Any other parameter receives the request, unless it has a default value: then
+it keeps its default. The signature of a handler is inspected once and
+remembered.
+
+A handler may return:
+
+- a dict or a list, sent as ``application/json``;
+- bytes, sent as ``application/octet-stream``;
+- a str, sent as ``text/html``;
+- None, answered with ``204 No Content``;
+- a ``(status, headers, body)`` tuple, whose body is any of the above.
+
+Usage Example:
+--------------
+>>> result = call_hook(request.hook, request)
+>>> status, headers, content_type, body = serialize(result)
+"""
+
+import functools
+import inspect
+import json
+
+
+class _Encoder(json.JSONEncoder):
+    def default(self, o):
+        if isinstance(o, (set, frozenset)):
+            return list(o)
+        return json.JSONEncoder.default(self, o)
+
+
+#: Encoder shared by every response: compact, UTF-8, sets sent as lists.
+JSON_ENCODER = _Encoder(ensure_ascii=False, separators=(',', ':'))
+
+#: Content types of the bodies handlers return.
+JSON_TYPE = 'application/json'
+TEXT_TYPE = 'text/html; charset=utf-8'
+BINARY_TYPE = 'application/octet-stream'
+
+
+@functools.lru_cache(maxsize=1024)
+def hook_parameters(hook):
+    """
+    :params hook (function): a route handler.
+
+    :rtype tuple: (names of its parameters without a default, names of those
+                  with one, whether it takes ``**kwargs``).
+    """
+    try:
+        signature = inspect.signature(hook)
+    except (TypeError, ValueError):
+        return (), (), True
+    required = []
+    optional = []
+    var_keyword = False
+    for parameter in signature.parameters.values():
+        if parameter.kind == parameter.VAR_KEYWORD:
+            var_keyword = True
+        elif parameter.kind in (parameter.POSITIONAL_OR_KEYWORD, parameter.KEYWORD_ONLY):
+            if parameter.default is parameter.empty:
+                required.append(parameter.name)
+            else:
+                optional.append(parameter.name)
+    return tuple(required), tuple(optional), var_keyword
+
+
+def call_hook(hook, request):
+    """
+    Calls a route handler with the arguments it names.
+
+    :params hook (function): the route handler.
+    :params request (Request): the parsed request.
+
+    :rtype object: what the handler returned.
+    """
+    values = {
+        'headers': request.headers,
+        'body': request.body,
+        'cookies': request.cookies,
+        'params': request.params,
+        'request': request,
+    }
+    values.update(request.params)
+    required, optional, var_keyword = hook_parameters(hook)
+    if var_keyword:
+        return hook(**values)
+    arguments = {name: values.get(name, request) for name in required}
+    arguments.update((name, values[name]) for name in optional if name in values)
+    return hook(**arguments)
+
+
+def encode_body(body):
+    """
+    :params body: a handler result without status or headers.
+
+    :rtype tuple: (content type, bytes) of the response body.
+
+    :raises TypeError: If the body cannot be serialized.
+    """
+    if isinstance(body, (dict, list)):
+        return JSON_TYPE, JSON_ENCODER.encode(body).encode('utf-8')
+    if isinstance(body, (bytes, bytearray)):
+        return BINARY_TYPE, bytes(body)
+    if isinstance(body, str):
+        return TEXT_TYPE, body.encode('utf-8')
+    raise TypeError("Cannot serialize a {} returned by a route".format(type(body).__name__))
+
+
+def serialize(result):
+    """
+    Turns a handler result into the parts of a response.
+
+    :params result: what the handler returned.
+
+    :rtype tuple: (status code, headers dict, content type, body bytes); the
+                  content type is None for an empty body.
+
+    :raises TypeError: If the result cannot be serialized.
+    """
+    status, headers = 200, {}
+    if isinstance(result, tuple):
+        if len(result) != 3:
+            raise TypeError("A route must return (status, headers, body), not a {}-tuple".format(len(result)))
+        status, headers, result = result
+        headers = dict(headers or {})
+    if result is None:
+        return (204 if status == 200 else status), headers, None, b""
+    content_type, body = encode_body(result)
+    return status, headers, content_type, body
@@ -18,15 +18,46 @@ This module provides a http adapter object to manage and persist
 http settings (headers, bodies). The adapter supports both
 raw URL paths and RESTful route definitions, and integrates with
 Request and Response objects to handle client-server communication.
+
+Every request is counted per route and status in :data:`REQUESTS`, and the
+time taken to build its response is recorded in :data:`LATENCY`. The route is
+the pattern of the app route, the path of a built-in page, or ``static``, so
+the number of series does not grow with the requested paths.
 """
 
+import logging
+import socket
+import time
 import urllib
 from .request import Request
 from .response import Response
 from .dictionary import CaseInsensitiveDict
+from .httpreader import HttpReader, HttpError, MAX_HEADER_SIZE, MAX_BODY_SIZE
+from .filecache import FILE_CACHE
+from .compression import ENCODED_CACHE, compressible, negotiate
+from .hooks import call_hook
+from .metrics import REGISTRY, CONNECTIONS, CONTENT_TYPE as METRICS_TYPE
 import os
 from urllib.parse import parse_qs, unquote_plus
 
+logger = logging.getLogger(__name__)
+
+#: Seconds an idle persistent connection waits for its next request.
+KEEPALIVE_TIMEOUT = 5
+#: Maximum number of requests answered over one persistent connection.
+KEEPALIVE_MAX_REQUESTS = 100
+#: Paths answered by the adapter itself, counted under their own route.
+BUILTIN_PAGES = ('/login', '/', '/index.html')
+
+#: Requests answered, by route and status code.
+REQUESTS = REGISTRY.counter('weaprous_http_requests_total',
+                            'Requests answered, by route and status code.',
+                            ('route', 'status'))
+#: Time spent building a response, by route.
+LATENCY = REGISTRY.histogram('weaprous_http_request_duration_seconds',
+                             'Time spent building a response, by route.',
+                             ('route',))
+
 class HttpAdapter:
     """
     A mutable :class:`HTTP adapter <HTTP adapter>` for managing client connections
@@ -45,6 +76,10 @@ class HttpAdapter:
         routes (dict): Mapping of route paths to handler functions.
         request (Request): Request object for parsing incoming data.
         response (Response): Response object for building and sending replies.
+        keepalive_timeout (float): Idle timeout of a persistent connection.
+        max_requests (int): Request cap of a persistent connection.
+        max_header_size (int): Limit of a request header block.
+        max_body_size (int): Limit of a request body.
     """
 
     __attrs__ = [
@@ -55,9 +90,17 @@ class HttpAdapter:
         "routes",
         "request",
         "response",
+        "keepalive_timeout",
+        "max_requests",
+        "max_header_size",
+        "max_body_size",
     ]
 
-    def __init__(self, ip, port, conn, connaddr, routes):
+    def __init__(self, ip, port, conn, connaddr, routes,
+                 keepalive_timeout=KEEPALIVE_TIMEOUT,
+                 max_requests=KEEPALIVE_MAX_REQUESTS,
+                 max_header_size=MAX_HEADER_SIZE,
+                 max_body_size=MAX_BODY_SIZE):
         """
         Initialize a new HttpAdapter instance.
 
@@ -66,6 +109,10 @@ class HttpAdapter:
         :param conn (socket): Active socket connection.
         :param connaddr (tuple): Address of the connected client.
         :param routes (dict): Mapping of route paths to handler functions.
+        :param keepalive_timeout (float): Seconds an idle connection is kept open.
+        :param max_requests (int): Requests served before the connection is closed.
+        :param max_header_size (int): Largest accepted request header block.
+        :param max_body_size (int): Largest accepted request body.
         """
 
         #: IP address.
@@ -82,14 +129,23 @@ class HttpAdapter:
         self.request = Request()
         #: Response
         self.response = Response()
+        #: Idle timeout of a persistent connection
+        self.keepalive_timeout = keepalive_timeout
+        #: Request cap of a persistent connection
+        self.max_requests = max_requests
+        #: Request size limits
+        self.max_header_size = max_header_size
+        self.max_body_size = max_body_size
 
     def handle_client(self, conn, addr, routes):
         """
         Handle an incoming client connection.
 
-        This method reads the request from the socket, prepares the request object,
-        invokes the appropriate route handler if available, builds the response,
-        and sends it back to the client.
+        The connection is persistent: requests are read and answered in a loop
+        until the client asks to close, the idle timeout expires, or the
+        per-connection request cap is reached. Each request is prepared,
+        dispatched to the appropriate route handler if available, and its
+        response is sent back to the client.
 
         :param conn (socket): The client socket connection.
         :param addr (tuple): The client's address.
@@ -97,38 +153,198 @@ class HttpAdapter:
         """
 
         # Connection handler.
-        self.conn = conn        
+        self.conn = conn
         # Connection address.
         self.connaddr = addr
+
+        # Idle keep-alive connections are dropped after the timeout
+        conn.settimeout(self.keepalive_timeout)
+        reader = HttpReader(conn, self.max_header_size, self.max_body_size)
+        served = 0
+        CONNECTIONS.inc()
+        try:
+            while served < self.max_requests:
+                try:
+                    msg = reader.read_message()
+                except socket.timeout:
+                    break
+                except HttpError as e:
+                    conn.sendall(e.to_response())
+                    break
+                if msg is None:
+                    break
+                served += 1
+
+                # Fresh request/response handlers for every message
+                self.request = Request()
+                self.response = Response()
+
+                response, keep_alive = self.handle_request(
+                    msg.decode('utf-8', errors='replace'), routes, served)
+                body = self.response.file_body
+                try:
+                    conn.sendall(response)
+                    if body is not None:
+                        # Large files go from the page cache to the socket
+                        body.send(conn)
+                finally:
+                    if body is not None:
+                        body.close()
+                if not keep_alive:
+                    break
+        except socket.error as e:
+            logger.debug("[HttpAdapter] Socket error: %s", e)
+        finally:
+            CONNECTIONS.dec()
+            conn.close()
+
+    def should_keep_alive(self, req, served):
+        """
+        Decide whether the connection stays open after answering ``req``.
+
+        HTTP/1.1 connections are persistent unless the client sends
+        ``Connection: close``; HTTP/1.0 clients must opt in with
+        ``Connection: keep-alive``. The request cap always wins.
+
+        :param req (Request): The prepared request.
+        :param served (int): Number of requests served on this connection.
+
+        :rtype bool: True if the connection should be kept open.
+        """
+        if served >= self.max_requests:
+            return False
+        connection = req.headers.get('connection', '').lower()
+        if 'close' in connection:
+            return False
+        if req.version == 'HTTP/1.1':
+            return True
+        return 'keep-alive' in connection
+
+    def connection_headers(self, keep_alive, served):
+        """
+        Build the ``Connection`` (and ``Keep-Alive``) header lines.
+
+        :param keep_alive (bool): Whether the connection stays open.
+        :param served (int): Number of requests served on this connection.
+
+        :rtype str: Header lines terminated by CRLF.
+        """
+        if not keep_alive:
+            return "Connection: close\r\n"
+        return (
+            "Connection: keep-alive\r\n"
+            "Keep-Alive: timeout={}, max={}\r\n"
+        ).format(self.keepalive_timeout, self.max_requests - served)
+
+    def build_page(self, status, page, fallback, keep_alive, served, extra_headers=""):
+        """
+        Build a complete HTML response for one of the pages under ``www/``,
+        compressed when the client accepts it.
+
+        :param status (str): Status code and reason, e.g. ``"200 OK"``.
+        :param page (str): File name inside ``www/``.
+        :param fallback (bytes): Body used when the page cannot be read.
+        :param keep_alive (bool): Whether the connection stays open.
+        :param served (int): Number of requests served on this connection.
+        :param extra_headers (str): Additional CRLF-terminated header lines.
+
+        :rtype bytes: Encoded response header and body.
+        """
+        path = os.path.join('www', page)
+        try:
+            body, mtime = FILE_CACHE.read(path)
+            version = (len(body), mtime)
+        except OSError:
+            body, version = fallback, None
+        if version and compressible('text/html', len(body)):
+            extra_headers += "Vary: Accept-Encoding\r\n"
+            coding = negotiate(self.request.headers.get('accept-encoding'))
+            if coding:
+                body = ENCODED_CACHE.get(path, version, coding, body)
+                extra_headers += "Content-Encoding: {}\r\n".format(coding)
+        hdr = (
+            "HTTP/1.1 {}\r\n"
+            "Content-Type: text/html\r\n"
+            "Content-Length: {}\r\n"
+            "{}{}"
+            "\r\n"
+        ).format(status, len(body), extra_headers,
+                 self.connection_headers(keep_alive, served))
+        return hdr.encode('utf-8') + body
+
+    def handle_request(self, msg, routes, served=1):
+        """
+        Prepare one request, build its response and record it in
+        :data:`REQUESTS` and :data:`LATENCY`.
+
+        :param msg (str): The raw HTTP request message.
+        :param routes (dict): The route mapping for dispatching requests.
+        :param served (int): Number of requests served on this connection,
+                             including this one.
+
+        :rtype tuple: (bytes, bool) the encoded response and whether the
+                      connection should be kept open afterwards.
+        """
+        started = time.monotonic()
+        response, keep_alive = self.dispatch_request(msg, routes, served)
+        route = self.route_label(self.request)
+        # Every response starts with "HTTP/1.1 NNN"
+        REQUESTS.inc((route, response[9:12].decode('latin-1')))
+        LATENCY.observe(time.monotonic() - started, (route,))
+        return response, keep_alive
+
+    def route_label(self, req):
+        """
+        :param req (Request): The prepared request.
+
+        :rtype str: The route a request is counted under.
+        """
+        if req.hook is not None:
+            return getattr(req.hook, '_route_path', req.hook.__name__)
+        if req.method is None:
+            return 'invalid'
+        path = req.path.split('?', 1)[0]
+        if path in BUILTIN_PAGES or REGISTRY.serves(path):
+            return path
+        return 'static'
+
+    def dispatch_request(self, msg, routes, served=1):
+        """
+        Prepare one request and build its response.
+
+        :param msg (str): The raw HTTP request message.
+        :param routes (dict): The route mapping for dispatching requests.
+        :param served (int): Number of requests served on this connection,
+                             including this one.
+
+        :rtype tuple: (bytes, bool) the encoded response and whether the
+                      connection should be kept open afterwards.
+        """
         # Request handler
         req = self.request
         # Response handler
         resp = self.response
 
-        # Handle the request
-        msg = conn.recv(1024).decode()
         req.prepare(msg, routes)
-        # ===== TASK 1A: LOGIN AUTHENTICATION =====
-        # Login page
-        if req.method == 'GET' and req.path == '/login':
-            login_path = os.path.join(os.getcwd(), 'www', 'login.html')
-            try:
-                with open(login_path, 'rb') as f:
-                    body = f.read()
-            except Exception:
-                body = b"<h1>Login</h1>"
-            hdr = (
-                "HTTP/1.1 200 OK\r\n"
-                "Content-Type: text/html\r\n"
-                f"Content-Length: {len(body)}\r\n"
+        if req.method is None:
+            return (
+                "HTTP/1.1 400 Bad Request\r\n"
+                "Content-Type: text/plain\r\n"
+                "Content-Length: 15\r\n"
                 "Connection: close\r\n"
                 "\r\n"
-            ).encode('utf-8')
-            conn.sendall(hdr + body)
-            conn.close()
-            return
+                "400 Bad Request"
+            ).encode('utf-8'), False
+
+        keep_alive = self.should_keep_alive(req, served)
+
+        # ===== TASK 1A: LOGIN AUTHENTICATION =====
+        # Login page, unless the app routes its own
+        if req.method == 'GET' and req.path == '/login' and not req.hook:
+            return self.build_page("200 OK", 'login.html', b"<h1>Login</h1>",
+                                   keep_alive, served), keep_alive
         # Login submission
-        if req.method == "POST" and req.path == "/login":
+        if req.method == "POST" and req.path == "/login" and not req.hook:
             # parse form encoded body (username=...&password=...)
             """
                 POST /login as per assignment:
@@ -147,43 +363,17 @@ class HttpAdapter:
             if username == "admin" and password == "password":
                 # Valid credentials
                 # Successful login: set cookie and redirect to index
-                try:
-                    index_path = os.path.join(os.getcwd(), 'www', 'index.html')
-                    with open(index_path, 'rb') as f:
-                        body = f.read()
-                except Exception:
-                    body = b"<html><body><h1>Welcome</h1></body></html>"
-
-                hdr = (
-                    "HTTP/1.1 200 OK\r\n"
-                    "Content-Type: text/html\r\n"
-                    f"Content-Length: {len(body)}\r\n"
-                    "Set-Cookie: auth=true; Path=/\r\n"
-                    "Connection: close\r\n"
-                    "\r\n"
-                ).encode('utf-8')
-                conn.sendall(hdr + body)
-                conn.close()
-                return
+                return self.build_page(
+                    "200 OK", 'index.html',
+                    b"<html><body><h1>Welcome</h1></body></html>",
+                    keep_alive, served,
+                    extra_headers="Set-Cookie: auth=true; Path=/\r\n"), keep_alive
             else:
                 # Invalid credentials -> 401 Unauthorized
-                try:
-                    ua_path = os.path.join(os.getcwd(), 'www', 'unAuthorized.html')
-                    with open(ua_path, 'rb') as f:
-                        body = f.read()
-                except Exception:
-                    body = b"<html><body><h1>401 Unauthorized</h1></body></html>"
-
-                hdr = (
-                    "HTTP/1.1 401 Unauthorized\r\n"
-                    "Content-Type: text/html\r\n"
-                    f"Content-Length: {len(body)}\r\n"
-                    "Connection: close\r\n"
-                    "\r\n"
-                ).encode('utf-8')
-                conn.sendall(hdr + body)
-                conn.close()
-                return         
+                return self.build_page(
+                    "401 Unauthorized", 'unAuthorized.html',
+                    b"<html><body><h1>401 Unauthorized</h1></body></html>",
+                    keep_alive, served), keep_alive
         # ===== TASK 1B: COOKIE-BASED ACCESS CONTROL =====
         # Protect both '/' and '/index.html' (Request may normalize '/' -> '/index.html')
         if req.method == "GET" and req.path in ("/", "/index.html"):
@@ -192,56 +382,58 @@ class HttpAdapter:
             if auth_cookie == "true":
                 # Có cookie hợp lệ
                 # Successful access to index page
-                try:
-                    index_path = os.path.join(os.getcwd(), 'www', 'index.html')
-                    with open(index_path, 'rb') as f:
-                        body = f.read()
-                except Exception:
-                    body = b"<html><body><h1>Welcome back! You are logged in.</h1></body></html>"
-                hdr = (
-                    "HTTP/1.1 200 OK\r\n"
-                    "Content-Type: text/html\r\n"
-                    f"Content-Length: {len(body)}\r\n"
-                    "Connection: close\r\n"
-                    "\r\n"
-                ).encode('utf-8')
-                conn.sendall(hdr + body)
-                conn.close()
-                return
+                return self.build_page(
+                    "200 OK", 'index.html',
+                    b"<html><body><h1>Welcome back! You are logged in.</h1></body></html>",
+                    keep_alive, served), keep_alive
             else:
                 # Không có hoặc sai cookie
                 # 401 Unauthorized page
-               try:
-                   ua_path = os.path.join(os.getcwd(), 'www', 'unAuthorized.html')
-                   with open(ua_path, 'rb') as f:
-                       body = f.read()
-               except Exception:
-                   body = b"<html><body><h1>401 Unauthorized</h1></body></html>"
-
-               hdr = (
-                   "HTTP/1.1 401 Unauthorized\r\n"
-                   "Content-Type: text/html\r\n"
-                   f"Content-Length: {len(body)}\r\n"
-                   "Connection: close\r\n"
-                   "\r\n"
-               ).encode('utf-8')
-               conn.sendall(hdr + body)
-               conn.close()
-               return
+                return self.build_page(
+                    "401 Unauthorized", 'unAuthorized.html',
+                    b"<html><body><h1>401 Unauthorized</h1></body></html>",
+                    keep_alive, served), keep_alive
+        # The path is routed, but not for this method
+        if req.hook is None and req.allowed:
+            return (
+                "HTTP/1.1 405 Method Not Allowed\r\n"
+                "Allow: {}\r\n"
+                "Content-Type: text/plain\r\n"
+                "Content-Length: 22\r\n"
+                "{}"
+                "\r\n"
+                "405 Method Not Allowed"
+            ).format(', '.join(req.allowed),
+                     self.connection_headers(keep_alive, served)).encode('utf-8'), keep_alive
+
+        resp.keep_alive = keep_alive
+        resp.keepalive_timeout = self.keepalive_timeout
+        resp.keepalive_remaining = self.max_requests - served
+
+        # Metrics, unless the app routes the path itself
+        if req.hook is None and req.method in ('GET', 'HEAD') and REGISTRY.serves(req.path):
+            return resp.build_hook_response(req, (
+                200, {'Content-Type': METRICS_TYPE, 'Cache-Control': 'no-store'},
+                REGISTRY.render())), keep_alive
+
         # Handle request hook
         if req.hook:
-            print("[HttpAdapter] hook in route-path METHOD {} PATH {}".format(req.hook._route_path,req.hook._route_methods))
-            req.hook(headers = "bksysnet",body = "get in touch")
-            #
-            # TODO: handle for App hook here
-            #
+            logger.debug("[HttpAdapter] hook in route-path METHOD %s PATH %s", req.method, req.path)
+            try:
+                return resp.build_hook_response(req, call_hook(req.hook, req)), keep_alive
+            except Exception as e:
+                logger.exception("[HttpAdapter] route %s %s failed: %r", req.method, req.path, e)
+                return (
+                    "HTTP/1.1 500 Internal Server Error\r\n"
+                    "Content-Type: text/plain\r\n"
+                    "Content-Length: 25\r\n"
+                    "{}"
+                    "\r\n"
+                    "500 Internal Server Error"
+                ).format(self.connection_headers(keep_alive, served)).encode('utf-8'), keep_alive
 
         # Build response
-        response = resp.build_response(req)
-
-        #print(response)
-        conn.sendall(response)
-        conn.close()
+        return resp.build_response(req), keep_alive
 
     @property
     def extract_cookies(self, req, resp):
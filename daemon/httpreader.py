@@ -0,0 +1,455 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.httpreader
+~~~~~~~~~~~~~~~~~
+
+This module provides the request framing used by both the backend and the proxy.
+A :class:`HttpParser <HttpParser>` accumulates raw bytes and cuts complete HTTP
+messages out of them: it reads the header block up to ``\\r\\n\\r\\n``, then
+exactly ``Content-Length`` bytes of body, or decodes a ``Transfer-Encoding:
+chunked`` body. A :class:`HttpReader <HttpReader>` drives the parser from a
+blocking socket through a reusable ``bytearray`` and ``recv_into``.
+
+Complete messages are returned normalized: a chunked body is de-chunked and
+its header block rewritten with a ``Content-Length``, so callers can treat
+every message the same way. In response mode the parser also knows the bodies
+framed by the end of the connection, and the statuses that carry no body.
+
+Usage Example:
+--------------
+>>> reader = HttpReader(conn)
+>>> msg = reader.read_message()   # bytes of one request, None on EOF
+"""
+
+#: Largest accepted header block (request line + headers), in bytes.
+MAX_HEADER_SIZE = 64 * 1024
+#: Largest accepted message body, in bytes.
+MAX_BODY_SIZE = 10 * 1024 * 1024
+#: Size of the reusable receive buffer, in bytes.
+RECV_BUFFER_SIZE = 64 * 1024
+
+
+class HttpError(Exception):
+    """
+    Raised when a message cannot be framed.
+
+    :attrs status_code (int): HTTP status code to answer with.
+    :attrs reason (str): textual reason of the status code.
+    """
+
+    def __init__(self, status_code, reason):
+        super().__init__("{} {}".format(status_code, reason))
+        self.status_code = status_code
+        self.reason = reason
+
+    def to_response(self):
+        """
+        Builds a minimal response describing the error.
+
+        :rtype bytes: encoded HTTP response closing the connection.
+        """
+        body = "{} {}".format(self.status_code, self.reason)
+        return (
+            "HTTP/1.1 {}\r\n"
+            "Content-Type: text/plain\r\n"
+            "Content-Length: {}\r\n"
+            "Connection: close\r\n"
+            "\r\n"
+            "{}"
+        ).format(body, len(body), body).encode('utf-8')
+
+
+#: Response statuses that never carry a body.
+NO_BODY_STATUSES = (204, 304)
+
+
+def parse_status(head):
+    """
+    Extracts the status code of a response header block.
+
+    :params head (bytes): header block starting with the status line.
+
+    :rtype int: the status code.
+    """
+    try:
+        return int(head.split(b" ", 2)[1])
+    except (IndexError, ValueError):
+        raise HttpError(502, "Bad Gateway")
+
+
+def set_headers(message, headers, append=()):
+    """
+    Replaces, adds or removes headers of a complete message.
+
+    :params message (bytes): header block and body.
+    :params headers (dict): header name to new value, None removes it.
+    :params append (iterable): (name, value) pairs added after the existing
+                               headers of the same name, e.g. ``Set-Cookie``.
+
+    :rtype bytes: the rewritten message.
+    """
+    end = message.find(b"\r\n\r\n")
+    if end < 0:
+        return message
+    names = tuple(name.lower().encode('latin-1') + b":" for name in headers)
+    lines = [line for line in message[:end].split(b"\r\n")
+             if not line.lower().startswith(names)]
+    for name, value in headers.items():
+        if value is not None:
+            lines.append("{}: {}".format(name, value).encode('latin-1'))
+    for name, value in append:
+        lines.append("{}: {}".format(name, value).encode('latin-1'))
+    return b"\r\n".join(lines) + message[end:]
+
+
+def parse_head(head):
+    """
+    Parses the framing related headers of a header block.
+
+    :params head (bytes): header block without the terminating blank line.
+
+    :rtype tuple: (content_length, chunked) where content_length is None when
+                  absent.
+    """
+    content_length = None
+    chunked = False
+    for line in head.split(b"\r\n")[1:]:
+        name, sep, value = line.partition(b":")
+        if not sep:
+            continue
+        name = name.strip().lower()
+        if name == b"content-length":
+            try:
+                content_length = int(value.strip())
+            except ValueError:
+                raise HttpError(400, "Bad Request")
+            if content_length < 0:
+                raise HttpError(400, "Bad Request")
+        elif name == b"transfer-encoding":
+            chunked = b"chunked" in value.lower()
+    return content_length, chunked
+
+
+def reframe_head(head, length):
+    """
+    Rewrites a header block to announce a fixed ``Content-Length``.
+
+    Drops ``Transfer-Encoding`` and any previous ``Content-Length``.
+
+    :params head (bytes): header block without the terminating blank line.
+    :params length (int): body length to announce.
+
+    :rtype bytes: the new header block, including the terminating blank line.
+    """
+    lines = [line for line in head.split(b"\r\n")
+             if not line.lower().startswith((b"transfer-encoding:", b"content-length:"))]
+    lines.append(b"Content-Length: " + str(length).encode())
+    return b"\r\n".join(lines) + b"\r\n\r\n"
+
+
+class HttpParser:
+    """
+    Incremental framing of HTTP messages over a byte buffer.
+
+    Bytes are appended with :meth:`feed`; :meth:`next_message` returns the next
+    complete message or ``None`` when more bytes are needed. The parser never
+    touches a socket, so it serves blocking readers and event loops alike.
+
+    :attrs buffer (bytearray): bytes received but not yet consumed.
+    :attrs max_header_size (int): limit of the header block.
+    :attrs max_body_size (int): limit of the message body.
+    :attrs response (bool): frame responses instead of requests.
+    :attrs request_method (str): method of the request being answered, in
+                                 response mode (``HEAD`` answers carry no body).
+    :attrs until_eof (bool): the current response body ends with the connection.
+    """
+
+    __attrs__ = [
+        "buffer",
+        "max_header_size",
+        "max_body_size",
+        "response",
+        "request_method",
+        "until_eof",
+    ]
+
+    def __init__(self, max_header_size=MAX_HEADER_SIZE, max_body_size=MAX_BODY_SIZE,
+                 response=False):
+        self.buffer = bytearray()
+        self.max_header_size = max_header_size
+        self.max_body_size = max_body_size
+        self.response = response
+        self.request_method = 'GET'
+        self.until_eof = False
+        # Framing of the message currently being received
+        self._head_end = -1
+        self._content_length = None
+        self._chunked = False
+
+    def feed(self, data):
+        """
+        Appends received bytes to the buffer.
+
+        :params data (bytes-like): received bytes.
+        """
+        self.buffer += data
+
+    def _reset(self):
+        self._head_end = -1
+        self._content_length = None
+        self._chunked = False
+        self.until_eof = False
+
+    def _read_head(self):
+        """Locates the header block and records its framing headers."""
+        end = self.buffer.find(b"\r\n\r\n")
+        if end < 0:
+            if len(self.buffer) > self.max_header_size:
+                raise HttpError(431, "Request Header Fields Too Large")
+            return False
+        if end > self.max_header_size:
+            raise HttpError(431, "Request Header Fields Too Large")
+        head = bytes(self.buffer[:end])
+        self._content_length, self._chunked = parse_head(head)
+        if self.response:
+            status = parse_status(head)
+            if self.request_method == 'HEAD' or status < 200 or status in NO_BODY_STATUSES:
+                self._content_length, self._chunked = 0, False
+            elif self._content_length is None and not self._chunked:
+                self.until_eof = True
+        if self._content_length is not None and self._content_length > self.max_body_size:
+            raise HttpError(413, "Payload Too Large")
+        self._head_end = end + 4
+        return True
+
+    def _read_chunked(self):
+        """
+        Decodes a chunked body starting after the header block.
+
+        :rtype tuple: (body, consumed) or None if the body is incomplete.
+        """
+        buf = self.buffer
+        pos = self._head_end
+        body = bytearray()
+        while True:
+            line_end = buf.find(b"\r\n", pos)
+            if line_end < 0:
+                return None
+            size_field = bytes(buf[pos:line_end]).split(b";", 1)[0].strip()
+            try:
+                size = int(size_field, 16)
+            except ValueError:
+                raise HttpError(400, "Bad Request")
+            pos = line_end + 2
+            if size == 0:
+                # Skip optional trailers up to the final blank line
+                while True:
+                    line_end = buf.find(b"\r\n", pos)
+                    if line_end < 0:
+                        return None
+                    if line_end == pos:
+                        return bytes(body), line_end + 2
+                    pos = line_end + 2
+            if len(body) + size > self.max_body_size:
+                raise HttpError(413, "Payload Too Large")
+            if len(buf) < pos + size + 2:
+                return None
+            body += buf[pos:pos + size]
+            pos += size + 2
+
+    def next_head(self):
+        """
+        Cuts the header block of the next message out of the buffer and leaves
+        its body to the caller, for messages relayed without being buffered.
+
+        :rtype tuple: (head, content_length, chunked), or None if the header
+                      block is incomplete. ``head`` includes the terminating
+                      blank line; ``content_length`` is None for a body framed
+                      by the end of the connection.
+        """
+        if self._head_end < 0 and not self._read_head():
+            return None
+        head = bytes(self.buffer[:self._head_end])
+        length = None if self.until_eof else (self._content_length or 0)
+        chunked = self._chunked
+        del self.buffer[:self._head_end]
+        self._reset()
+        return head, length, chunked
+
+    def next_message(self):
+        """
+        Cuts the next complete message out of the buffer.
+
+        :rtype bytes: the normalized message, or None if incomplete.
+        """
+        if self._head_end < 0 and not self._read_head():
+            return None
+
+        head_end = self._head_end
+        if self.until_eof:
+            if len(self.buffer) - head_end > self.max_body_size:
+                raise HttpError(413, "Payload Too Large")
+            return None
+        if self._chunked:
+            decoded = self._read_chunked()
+            if decoded is None:
+                return None
+            body, consumed = decoded
+            message = reframe_head(bytes(self.buffer[:head_end - 4]), len(body)) + body
+        else:
+            consumed = head_end + (self._content_length or 0)
+            if len(self.buffer) < consumed:
+                return None
+            message = bytes(self.buffer[:consumed])
+
+        del self.buffer[:consumed]
+        self._reset()
+        return message
+
+    def finish(self):
+        """
+        Completes a response framed by the end of the connection.
+
+        :rtype bytes: the normalized message, or None if nothing is pending.
+
+        :raises HttpError: If the connection closed in the middle of a message.
+        """
+        if not self.buffer:
+            return None
+        if self._head_end < 0 and not self._read_head():
+            raise HttpError(502, "Bad Gateway")
+        if not self.until_eof:
+            message = self.next_message()
+            if message is None:
+                raise HttpError(502, "Bad Gateway")
+            return message
+        head_end = self._head_end
+        body = bytes(self.buffer[head_end:])
+        message = reframe_head(bytes(self.buffer[:head_end - 4]), len(body)) + body
+        self.buffer.clear()
+        self._reset()
+        return message
+
+
+class HttpReader:
+    """
+    Blocking reader of HTTP messages from a socket.
+
+    Data is received into one reusable buffer with ``recv_into`` and fed to an
+    :class:`HttpParser <HttpParser>`; bytes following a message stay buffered
+    for the next call, so pipelined requests are not lost.
+
+    :attrs sock (socket.socket): the connection to read from.
+    :attrs parser (HttpParser): the framing state of the connection.
+    :attrs eof (bool): the peer closed the connection.
+    """
+
+    __attrs__ = [
+        "sock",
+        "parser",
+        "eof",
+    ]
+
+    def __init__(self, sock, max_header_size=MAX_HEADER_SIZE,
+                 max_body_size=MAX_BODY_SIZE, buffer_size=RECV_BUFFER_SIZE,
+                 response=False):
+        """
+        :params sock (socket.socket): the connection to read from.
+        :params max_header_size (int): limit of the header block.
+        :params max_body_size (int): limit of the message body.
+        :params buffer_size (int): size of the reusable receive buffer.
+        :params response (bool): read responses instead of requests.
+        """
+        self.sock = sock
+        self.parser = HttpParser(max_header_size, max_body_size, response)
+        self.eof = False
+        self._buf = bytearray(buffer_size)
+        self._view = memoryview(self._buf)
+
+    def read_message(self):
+        """
+        Reads one complete HTTP message.
+
+        :rtype bytes: the normalized message, or None when the peer closed the
+                      connection between messages.
+
+        :raises HttpError: If the message is malformed, too large, or the
+                           peer closed the connection in the middle of it.
+        """
+        parser = self.parser
+        while True:
+            message = parser.next_message()
+            if message is not None:
+                return message
+            n = self.sock.recv_into(self._buf)
+            if n == 0:
+                self.eof = True
+                if parser.response:
+                    return parser.finish()
+                if parser.buffer:
+                    raise HttpError(400, "Bad Request")
+                return None
+            parser.feed(self._view[:n])
+
+    def read_head(self):
+        """
+        Reads the header block of one message, leaving its body unread.
+
+        :rtype tuple: (head, content_length, chunked) as returned by
+                      :meth:`HttpParser.next_head`, or None on EOF.
+
+        :raises HttpError: If the peer closed the connection in the middle of
+                           the header block.
+        """
+        parser = self.parser
+        while True:
+            head = parser.next_head()
+            if head is not None:
+                return head
+            n = self.sock.recv_into(self._buf)
+            if n == 0:
+                self.eof = True
+                if parser.buffer:
+                    raise HttpError(502 if parser.response else 400,
+                                    "Bad Gateway" if parser.response else "Bad Request")
+                return None
+            parser.feed(self._view[:n])
+
+    def read_some(self):
+        """
+        Returns the next bytes of a body being relayed.
+
+        Bytes already buffered by the parser come first; afterwards the data is
+        a view on the reusable receive buffer, valid until the next call.
+
+        :rtype memoryview: received bytes, empty on EOF.
+        """
+        parser = self.parser
+        if parser.buffer:
+            data = memoryview(bytes(parser.buffer))
+            parser.buffer.clear()
+            return data
+        n = self.sock.recv_into(self._buf)
+        if n == 0:
+            self.eof = True
+        return self._view[:n]
+
+    def unread(self, data):
+        """
+        Pushes back bytes received past the end of the current message.
+
+        :params data (bytes-like): the surplus bytes.
+        """
+        if len(data):
+            self.parser.buffer[:0] = data
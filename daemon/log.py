@@ -0,0 +1,149 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.log
+~~~~~~~~~~~~~~~~~
+
+This module configures the :mod:`logging` of the ``daemon`` package. Every
+module logs to its own ``logging.getLogger(__name__)``; per-request messages
+are logged at ``DEBUG`` with lazy ``%s`` arguments, so below the configured
+level they cost one level check and are never formatted.
+
+Enabled records are not written by the worker threads. A ``QueueHandler``
+puts them on a bounded queue, and a ``QueueListener`` thread lays them out
+with ``LOG_FORMAT`` and writes them. The message itself is still merged with
+its arguments in the logging thread, by ``QueueHandler.prepare``, so
+arguments changed after the call cannot change the record. When the writer
+falls behind, the queue fills up and new records are dropped and counted
+rather than blocking the workers; the count is exported as the
+``weaprous_log_dropped_total`` metric.
+
+Forked worker processes get a fresh queue and writer thread of their own.
+
+Usage Example:
+--------------
+>>> configure_logging("debug")
+>>> logger = logging.getLogger(__name__)
+>>> logger.debug("[Request] %s path %s", method, path)
+"""
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+from .metrics import REGISTRY
+
+#: Records waiting for the writer thread before new ones are dropped.
+LOG_QUEUE_SIZE = 10000
+#: Level names accepted by the ``--log-level`` option of the entry points.
+LOG_LEVELS = ('debug', 'info', 'warning', 'error', 'critical')
+#: Layout of a written record.
+LOG_FORMAT = "%(asctime)s %(levelname)s %(message)s"
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that never blocks: records arriving on a full queue are
+    dropped.
+
+    :attrs dropped (int): records dropped so far.
+    """
+
+    __attrs__ = [
+        "dropped",
+    ]
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+#: (handler, listener) installed by :func:`configure_logging`.
+_installed = None
+
+
+def _start(handler, output, queue_size):
+    """Points the handler at a new queue drained by a new writer thread."""
+    handler.queue = queue.Queue(queue_size)
+    listener = logging.handlers.QueueListener(handler.queue, output)
+    listener.start()
+    return listener
+
+
+def configure_logging(level='info', queue_size=LOG_QUEUE_SIZE, stream=None):
+    """
+    Sends the records of the ``daemon`` package, from ``level`` up, to a
+    stream through a background writer thread. Calling it again replaces the
+    previous configuration.
+
+    :params level (str): lowest level written, one of :data:`LOG_LEVELS`.
+    :params queue_size (int): records buffered before new ones are dropped.
+    :params stream (file): where records are written, stdout by default.
+
+    :rtype DroppingQueueHandler: the handler, whose ``dropped`` counts lost
+                                 records.
+    """
+    global _installed
+    root = logging.getLogger('daemon')
+    if _installed is not None:
+        handler, listener = _installed
+        root.removeHandler(handler)
+        listener.stop()
+
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler = DroppingQueueHandler(None)
+    listener = _start(handler, output, queue_size)
+    _installed = (handler, listener)
+
+    root.addHandler(handler)
+    root.setLevel(getattr(logging, level.upper()))
+    # Written once by our thread, not again by the root logger
+    root.propagate = False
+    return handler
+
+
+def _after_fork():
+    """Restarts the writer in a forked child: threads do not survive a fork."""
+    global _installed
+    if _installed is not None:
+        handler, listener = _installed
+        output = listener.handlers[0]
+        _installed = (handler, _start(handler, output, handler.queue.maxsize))
+
+
+def _flush():
+    """Writes the records still queued when the process exits."""
+    if _installed is not None:
+        _installed[1].stop()
+
+
+def _dropped():
+    return _installed[0].dropped if _installed is not None else 0
+
+
+REGISTRY.function('weaprous_log_dropped_total', 'Log records dropped on a full queue.',
+                  _dropped, kind='counter')
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+atexit.register(_flush)
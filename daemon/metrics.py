@@ -0,0 +1,361 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.metrics
+~~~~~~~~~~~~~~~~~
+
+This module collects the counters, gauges and latency histograms of the
+backend and the proxy, and renders them in the Prometheus text format served
+at :attr:`REGISTRY.path <MetricsRegistry.path>` (``/metrics`` by default).
+
+Updates take no lock: every thread counts into a shard of its own, a dict
+keyed by the label values, and a scrape adds the shards up. A thread takes the
+lock of a metric only the first time it updates it. Histograms have fixed
+buckets, so an observation is one bisection and two additions.
+
+Values the server already keeps, such as cache hits or queue depths, are read
+at scrape time by a function registered with :meth:`MetricsRegistry.function`.
+
+Usage Example:
+--------------
+>>> REQUESTS = REGISTRY.counter('weaprous_http_requests_total',
+...                             'Requests answered.', ('route', 'status'))
+>>> REQUESTS.inc(('/users/<int:id>', '200'))
+>>> REGISTRY.render()
+b'# HELP weaprous_http_requests_total Requests answered.\\n...'
+"""
+
+import bisect
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+#: Path the metrics are served at, unless configured otherwise.
+METRICS_PATH = "/metrics"
+#: Content type of the Prometheus text format.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+#: Upper bounds, in seconds, of the latency histogram buckets.
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=''):
+    pairs = ['{}="{}"'.format(name, _escape(value)) for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if value == float('inf'):
+            return '+Inf'
+        return repr(value)
+    return str(value)
+
+
+class Metric:
+    """
+    A metric family whose values are sharded per thread.
+
+    :attrs name (str): metric name.
+    :attrs help (str): one-line description.
+    :attrs labels (tuple): label names; values are passed in the same order.
+    """
+
+    __attrs__ = [
+        "name",
+        "help",
+        "labels",
+    ]
+
+    kind = 'untyped'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        #: thread ident -> {label values: value}; a thread reusing the ident
+        #: of a finished one carries on with its shard
+        self._shards = {}
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        """The shard of the calling thread, created on first use."""
+        ident = threading.get_ident()
+        shard = self._shards.get(ident)
+        if shard is None:
+            with self._lock:
+                shard = self._shards.setdefault(ident, {})
+        return shard
+
+    def collect(self):
+        """
+        :rtype dict: label values -> value, summed over the shards.
+        """
+        with self._lock:
+            shards = list(self._shards.values())
+        totals = {}
+        for shard in shards:
+            # dict.copy() is atomic, the owner thread may be updating it
+            for key, value in shard.copy().items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def samples(self):
+        """
+        :rtype list: (name suffix, label text, value) lines of the family.
+        """
+        return [('', _format_labels(self.labels, key), value)
+                for key, value in sorted(self.collect().items())]
+
+
+class Counter(Metric):
+    """A value that only goes up."""
+
+    kind = 'counter'
+
+    def inc(self, labels=(), value=1):
+        """
+        :params labels (tuple): label values, in the order of :attr:`labels`.
+        :params value (int): amount added.
+        """
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + value
+
+
+class Gauge(Counter):
+    """A value that goes up and down, e.g. open connections."""
+
+    kind = 'gauge'
+
+    def dec(self, labels=(), value=1):
+        """
+        :params labels (tuple): label values, in the order of :attr:`labels`.
+        :params value (int): amount subtracted.
+        """
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) - value
+
+
+class Histogram(Metric):
+    """
+    Distribution of observed values over fixed buckets.
+
+    :attrs buckets (tuple): increasing upper bounds of the buckets.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, labels=()):
+        """
+        :params value (float): the observation, e.g. a latency in seconds.
+        :params labels (tuple): label values, in the order of :attr:`labels`.
+        """
+        shard = self._shard()
+        row = shard.get(labels)
+        if row is None:
+            # One count per bucket, one for +Inf, then the sum
+            row = shard[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        row[bisect.bisect_left(self.buckets, value)] += 1
+        row[-1] += value
+
+    def collect(self):
+        """
+        :rtype dict: label values -> per-bucket counts followed by the sum.
+        """
+        with self._lock:
+            shards = list(self._shards.values())
+        totals = {}
+        for shard in shards:
+            for key, row in shard.copy().items():
+                total = totals.get(key)
+                if total is None:
+                    totals[key] = list(row)
+                else:
+                    for i, value in enumerate(row):
+                        total[i] += value
+        return totals
+
+    def samples(self):
+        lines = []
+        bounds = [_format_value(float(bound)) for bound in self.buckets] + ['+Inf']
+        for key, row in sorted(self.collect().items()):
+            cumulative = 0
+            for bound, count in zip(bounds, row):
+                cumulative += count
+                lines.append(('_bucket', _format_labels(self.labels, key, 'le="{}"'.format(bound)),
+                              cumulative))
+            labels = _format_labels(self.labels, key)
+            lines.append(('_sum', labels, row[-1]))
+            lines.append(('_count', labels, cumulative))
+        return lines
+
+
+class FunctionMetric(Metric):
+    """
+    A metric read at scrape time from a function returning either a number
+    or (label values, value) pairs.
+    """
+
+    def __init__(self, name, help, function, labels=(), kind='gauge'):
+        super().__init__(name, help, labels)
+        self.function = function
+        self.kind = kind
+
+    def collect(self):
+        value = self.function()
+        if isinstance(value, (int, float)):
+            return {(): value}
+        return dict(value)
+
+
+class MetricsRegistry:
+    """
+    The metrics of a process.
+
+    :attrs path (str): request path serving :meth:`render`, None to disable.
+    :attrs metrics (dict): metric name -> :class:`Metric`.
+    """
+
+    __attrs__ = [
+        "path",
+        "metrics",
+    ]
+
+    def __init__(self, path=METRICS_PATH):
+        self.path = path
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        """
+        Adds a metric; registering a name again returns the first metric.
+
+        :params metric (Metric): the metric.
+
+        :rtype Metric: the registered metric of that name.
+
+        :raises ValueError: If the name is registered with another type.
+        """
+        with self._lock:
+            existing = self.metrics.setdefault(metric.name, metric)
+        if type(existing) is not type(metric) or existing.kind != metric.kind:
+            raise ValueError("Metric {} is already a {}".format(metric.name, existing.kind))
+        return existing
+
+    def counter(self, name, help, labels=()):
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self.register(Gauge(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def function(self, name, help, function, labels=(), kind='gauge'):
+        return self.register(FunctionMetric(name, help, function, labels, kind))
+
+    def serves(self, path):
+        """
+        :params path (str): a request path, may carry a query string.
+
+        :rtype bool: whether the path is the metrics path.
+        """
+        return bool(self.path) and path.split('?', 1)[0] == self.path
+
+    def render(self):
+        """
+        :rtype bytes: every metric in the Prometheus text format.
+        """
+        lines = []
+        with self._lock:
+            metrics = sorted(self.metrics.values(), key=lambda metric: metric.name)
+        for metric in metrics:
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                logger.exception("[Metrics] collecting %s failed: %r", metric.name, e)
+                continue
+            lines.append("# HELP {} {}".format(metric.name, metric.help))
+            lines.append("# TYPE {} {}".format(metric.name, metric.kind))
+            for suffix, labels, value in samples:
+                lines.append("{}{}{} {}".format(metric.name, suffix, labels, _format_value(value)))
+        return ("\n".join(lines) + "\n").encode('utf-8')
+
+    def response(self, keep_alive=False, method='GET'):
+        """
+        Builds a complete response carrying :meth:`render`.
+
+        :params keep_alive (bool): whether the client connection stays open.
+        :params method (str): request method, ``HEAD`` gets no body.
+
+        :rtype bytes: encoded response.
+        """
+        body = self.render()
+        head = (
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Type: {}\r\n"
+            "Content-Length: {}\r\n"
+            "Cache-Control: no-store\r\n"
+            "Connection: {}\r\n"
+            "\r\n"
+        ).format(CONTENT_TYPE, len(body), "keep-alive" if keep_alive else "close")
+        return head.encode('utf-8') + (b"" if method == 'HEAD' else body)
+
+
+#: Metrics of the process, shared by every worker.
+REGISTRY = MetricsRegistry()
+
+#: Open client connections.
+CONNECTIONS = REGISTRY.gauge('weaprous_connections_active',
+                             'Client connections currently open.')
+#: Threads of the process, read at scrape time.
+THREADS = REGISTRY.function('weaprous_threads', 'Threads running in the process.',
+                            threading.active_count)
+
+#: name -> cache with ``hits``, ``misses`` and ``size`` counters, see
+#: :func:`register_cache`.
+CACHES = {}
+
+
+def register_cache(name, cache):
+    """
+    Exports the counters of a cache, labelled with its name. Called by the
+    process that uses the cache, so the other one does not report zeros.
+
+    :params name (str): label of the cache, e.g. ``file``.
+    :params cache: object with ``hits``, ``misses`` and ``size`` attributes.
+    """
+    CACHES[name] = cache
+
+
+def _cache_values(attribute):
+    return lambda: [((name,), getattr(cache, attribute)) for name, cache in list(CACHES.items())]
+
+
+REGISTRY.function('weaprous_cache_hits_total', 'Lookups answered from a cache.',
+                  _cache_values('hits'), ('cache',), kind='counter')
+REGISTRY.function('weaprous_cache_misses_total', 'Lookups a cache could not answer.',
+                  _cache_values('misses'), ('cache',), kind='counter')
+REGISTRY.function('weaprous_cache_size_bytes', 'Bytes held by a cache.',
+                  _cache_values('size'), ('cache',))
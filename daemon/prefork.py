@@ -0,0 +1,137 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.prefork
+~~~~~~~~~~~~~~~~~
+
+This module provides the multi-process serving mode shared by the backend and
+the proxy. A supervisor forks N worker processes; each worker binds the same
+port with ``SO_REUSEPORT`` so the kernel spreads incoming connections across
+them, and every worker has its own interpreter and GIL. Workers that die are
+forked again by the supervisor.
+
+Requirements:
+--------------
+- os.fork: POSIX only.
+- socket.SO_REUSEPORT: Linux 3.9+, BSD, macOS.
+
+Usage Example:
+--------------
+>>> supervise(4, run_backend, "0.0.0.0", 9000, {}, reuse_port=True)
+
+"""
+
+import logging
+import os
+import signal
+import socket
+import time
+
+logger = logging.getLogger(__name__)
+
+#: Backlog of the listening sockets.
+LISTEN_BACKLOG = 50
+#: A worker exiting sooner than this after its start delays its restart.
+MIN_WORKER_LIFETIME = 1.0
+
+
+def create_listener(ip, port, reuse_port=False, backlog=LISTEN_BACKLOG):
+    """
+    Creates a TCP socket bound to the address and listening.
+
+    :param ip (str): IP address to bind.
+    :param port (int): Port number to listen on.
+    :param reuse_port (bool): Set ``SO_REUSEPORT`` so several processes can
+                              bind the same port.
+    :param backlog (int): Listen backlog.
+
+    :rtype socket.socket: the listening socket.
+    """
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    try:
+        if reuse_port:
+            server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        server.bind((ip, port))
+        server.listen(backlog)
+    except socket.error:
+        server.close()
+        raise
+    return server
+
+
+def supervise(workers, target, *args, **kwargs):
+    """
+    Forks ``workers`` processes running ``target(*args, **kwargs)`` and keeps
+    them alive until the supervisor is interrupted or terminated.
+
+    :param workers (int): Number of worker processes.
+    :param target (callable): Serving function run by each worker; it must
+                              bind its port with ``SO_REUSEPORT``.
+
+    :raises ValueError: If the platform cannot fork or share a port.
+    """
+    if not hasattr(os, 'fork') or not hasattr(socket, 'SO_REUSEPORT'):
+        raise ValueError("Multiple workers need os.fork and SO_REUSEPORT")
+
+    children = {}
+
+    def spawn(index):
+        pid = os.fork()
+        if pid == 0:
+            # Worker process: serve until killed, never return to the caller
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            code = 0
+            try:
+                target(*args, **kwargs)
+            except KeyboardInterrupt:
+                pass
+            except BaseException as e:
+                logger.error("[Supervisor] worker %s failed: %s", index, e)
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = (index, time.monotonic())
+        logger.info("[Supervisor] started worker %s pid %s", index, pid)
+
+    def terminate(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, terminate)
+    try:
+        for index in range(workers):
+            spawn(index)
+
+        while True:
+            pid, status = os.wait()
+            if pid not in children:
+                continue
+            index, started = children.pop(pid)
+            logger.warning("[Supervisor] worker %s pid %s exited with status %s",
+                           index, pid, status)
+            # A worker crashing at start (e.g. bind error) must not fork-loop
+            if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                time.sleep(MIN_WORKER_LIFETIME)
+            spawn(index)
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except OSError:
+                pass
+        for pid in list(children):
+            try:
+                os.waitpid(pid, 0)
+            except OSError:
+                pass
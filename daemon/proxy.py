@@ -22,18 +22,40 @@ Requirement:
 -----------------
 - socket: provides socket networking interface.
 - threading: enables concurrent client handling via threads.
+- workerpool: bounded pool of worker threads for accepted connections.
+- prefork: listening sockets and the multi-process supervisor.
 - response: customized :class: `Response <Response>` utilities.
 - httpadapter: :class: `HttpAdapter <HttpAdapter >` adapter for HTTP request processing.
 - dictionary: :class: `CaseInsensitiveDict <CaseInsensitiveDict>` for managing headers and cookies.
+- httpreader: :class: `HttpReader <HttpReader>` for framing incoming requests.
+- upstream: pooled keep-alive connections to the backends.
+- health: active and passive health checks of the backends.
+- balancer: in-flight and latency statistics for load-aware policies.
+- routing: the routing table compiled from the virtual hosts.
+- proxycache: in-memory cache of upstream responses.
 
 """
+import logging
 import socket
 import threading
 from .response import *
 from .httpadapter import HttpAdapter
 from .dictionary import CaseInsensitiveDict
-import random
-_RR_INDEX = {}
+from .httpreader import HttpReader, HttpError
+from .httpadapter import KEEPALIVE_TIMEOUT, KEEPALIVE_MAX_REQUESTS
+from .upstream import UPSTREAM_POOL, UPSTREAM_ERRORS, UpstreamConnectError
+from .health import HEALTH, HEALTH_CHECK_INTERVAL, start_health_checks
+from .balancer import STATS, pick_least_conn, pick_ewma, pick_random, sticky_id
+from .routing import compile_routes
+from .proxycache import PROXY_CACHE
+from .workerpool import WorkerPool, POOL_SIZE, QUEUE_DEPTH
+from .metrics import REGISTRY, CONNECTIONS, register_cache
+from .prefork import create_listener, supervise
+
+logger = logging.getLogger(__name__)
+
+#: Backends tried for one request when connecting fails.
+UPSTREAM_ATTEMPTS = 2
 
 #: A dictionary mapping hostnames to backend IP and port tuples.
 #: Used to determine routing targets for incoming requests.
@@ -45,97 +67,229 @@ PROXY_PASS = {
 
 
 
-def forward_request(host, port, request):
+def set_connection_header(request, value):
     """
-    Forwards an HTTP request to a backend server and retrieves the response.
+    Replaces (or adds) the ``Connection`` header of a raw HTTP request.
+
+    :params request (str): incoming HTTP request.
+    :params value (str): new value of the ``Connection`` header.
+
+    :rtype str: the request with the rewritten header.
+    """
+
+    head, sep, body = request.partition('\r\n\r\n')
+    lines = [line for line in head.split('\r\n')
+             if not line.lower().startswith(('connection:', 'keep-alive:'))]
+    lines.append('Connection: {}'.format(value))
+    return '\r\n'.join(lines) + '\r\n\r\n' + body
+
+
+def error_response(status, keep_alive=False):
+    """
+    Builds a plain text error response of the proxy.
+
+    :params status (str): status code and reason, e.g. ``"404 Not Found"``.
+    :params keep_alive (bool): whether the client connection stays open.
+
+    :rtype bytes: encoded error response.
+    """
+
+    return (
+        "HTTP/1.1 {}\r\n"
+        "Content-Type: text/plain\r\n"
+        "Content-Length: {}\r\n"
+        "Connection: {}\r\n"
+        "\r\n"
+        "{}"
+    ).format(status, len(status), "keep-alive" if keep_alive else "close",
+             status).encode('utf-8')
+
+
+def not_found(keep_alive=False):
+    """
+    Builds the 404 Not Found response of unknown hosts.
+
+    :params keep_alive (bool): whether the client connection stays open.
+
+    :rtype bytes: encoded 404 response.
+    """
+
+    return error_response("404 Not Found", keep_alive)
+
+
+def bad_gateway(keep_alive=False):
+    """
+    Builds the 502 Bad Gateway response of failed upstreams.
+
+    :params keep_alive (bool): whether the client connection stays open.
+
+    :rtype bytes: encoded 502 response.
+    """
+
+    return error_response("502 Bad Gateway", keep_alive)
+
+
+def forward_request(host, port, request, conn, keep_alive=False, append=(),
+                    capture=None):
+    """
+    Forwards an HTTP request to a backend server and streams the response
+    back to the client.
+
+    The request travels over a pooled keep-alive connection of
+    :data:`UPSTREAM_POOL <UPSTREAM_POOL>`; the response is framed by its
+    ``Content-Length`` or chunked encoding and relayed to the client as it
+    arrives, without being held in memory.
 
     :params host (str): IP address of the backend server.
     :params port (int): port number of the backend server.
     :params request (str): incoming HTTP request.
-
-    :rtype bytes: Raw HTTP response from the backend server. If the connection
-                  fails, returns a 404 Not Found response.
+    :params conn (socket.socket): client connection socket.
+    :params keep_alive (bool): whether the client connection may stay open.
+    :params append (iterable): (name, value) headers added to the response.
+    :params capture (CacheCapture): collects the response for the proxy
+                                    cache, None when it is not cacheable.
+
+    :rtype bool: whether the client connection may stay open afterwards, or
+                 None if the backend could not be connected to and nothing was
+                 sent, so another backend may be tried. If the backend fails
+                 after receiving the request, a 502 Bad Gateway is sent.
     """
 
-    backend = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    method = request.split(' ', 1)[0]
+    request = set_connection_header(request, 'keep-alive')
+    upstream = "{}:{}".format(host, port)
 
+    STATS.begin(upstream)
     try:
-        backend.connect((host, port))
-        backend.sendall(request.encode())
-        response = b""
-        while True:
-            chunk = backend.recv(4096)
-            if not chunk:
-                break
-            response += chunk
-        return response
-    except socket.error as e:
-      print("Socket error: {}".format(e))
-      return (
-            "HTTP/1.1 404 Not Found\r\n"
-            "Content-Type: text/plain\r\n"
-            "Content-Length: 13\r\n"
-            "Connection: close\r\n"
-            "\r\n"
-            "404 Not Found"
-        ).encode('utf-8')
+        keep_alive = UPSTREAM_POOL.relay(host, port, request.encode('latin-1'), conn,
+                                         method, keep_alive, append, capture)
+    except UpstreamConnectError as e:
+        logger.warning("Socket error: %s", e)
+        UPSTREAM_ERRORS.inc((upstream, 'connect'))
+        HEALTH.report_failure(upstream)
+        return None
+    except (socket.error, HttpError) as e:
+      logger.warning("Socket error: %s", e)
+      UPSTREAM_ERRORS.inc((upstream, 'response'))
+      HEALTH.report_failure(upstream)
+      conn.sendall(bad_gateway(keep_alive))
+      return keep_alive
+    finally:
+        STATS.end(upstream)
+    HEALTH.report_success(upstream)
+    return keep_alive
+
+
+def client_keep_alive(request):
+    """
+    Tells whether the client connection stays open after answering ``request``.
+
+    :params request (str): incoming HTTP request.
+
+    :rtype bool: True for HTTP/1.1 unless ``Connection: close`` was sent, or
+                 for HTTP/1.0 with ``Connection: keep-alive``.
+    """
+
+    head = request.split('\r\n\r\n', 1)[0].lower()
+    lines = head.split('\r\n')
+    connection = ''
+    for line in lines[1:]:
+        if line.startswith('connection:'):
+            connection = line
+            break
+    if 'close' in connection:
+        return False
+    return lines[0].endswith('http/1.1') or 'keep-alive' in connection
+
+
+def request_header(request, name):
+    """
+    :params request (str): incoming HTTP request.
+    :params name (str): lowercase header name.
+
+    :rtype str: value of the first such header, None if absent.
+    """
+
+    prefix = name + ':'
+    for line in request.split('\r\n\r\n', 1)[0].split('\r\n')[1:]:
+        if line.lower().startswith(prefix):
+            return line[len(prefix):].strip()
+    return None
+
+
+def request_cookie(request, name):
+    """
+    :params request (str): incoming HTTP request.
+    :params name (str): cookie name.
+
+    :rtype str: value of the cookie, None if absent.
+    """
+
+    cookies = request_header(request, 'cookie')
+    if cookies:
+        for pair in cookies.split(';'):
+            key, sep, value = pair.strip().partition('=')
+            if sep and key == name:
+                return value
+    return None
+
+
+def routing_key(request, addr, hash_key):
+    """
+    Extracts the key hashed by the ``hash`` policy.
+
+    :params request (str): incoming HTTP request.
+    :params addr (tuple): client address (IP, port).
+    :params hash_key (str): ``$remote_addr``, ``$http_<header>`` or
+                            ``$cookie_<name>``; the client IP is used when
+                            the header or cookie is missing.
+
+    :rtype str: the key.
+    """
+
+    value = None
+    if hash_key.startswith('$http_'):
+        value = request_header(request, hash_key[6:].replace('_', '-').lower())
+    elif hash_key.startswith('$cookie_'):
+        value = request_cookie(request, hash_key[8:])
+    return value or (addr[0] if addr else '')
 
 
-def resolve_routing_policy(hostname, routes):
+def resolve_routing_policy(route, request='', addr=None):
     """
     Handles an routing policy to return the matching proxy_pass.
     It determines the target backend to forward the request to.
 
-    :params host (str): IP address of the request target server.
-    :params port (int): port number of the request target server.
-    :params routes (dict): dictionary mapping hostnames and location.
-    """
+    :params route (Route): the compiled route of the requested host.
+    :params request (str): incoming HTTP request, for sticky and hash policies.
+    :params addr (tuple): client address (IP, port).
 
-    print(hostname)
-    proxy_map, policy = routes.get(hostname,('127.0.0.1:9000','round-robin'))
-    print(proxy_map)
-    print(policy)
-
-    proxy_host = ''
-    proxy_port = '9000'
-    if isinstance(proxy_map, list):
-        if len(proxy_map) == 0:
-            print("[Proxy] Emtpy resolved routing of hostname {}".format(hostname))
-            print("Empty proxy_map result")
-            # TODO: implement the error handling for non mapped host
-            #       the policy is design by team, but it can be 
-            #       basic default host in your self-defined system
-            # Use a dummy host to raise an invalid connection
-            proxy_host = '127.0.0.1'
-            proxy_port = '9000'
-        elif len(proxy_map) == 1:
-            # proxy_map is a single entry list
-            # Example: ["10.0.19.29:9000"]
-            # => proxy_host = "10.0.19.29"
-            # => proxy_port = "9000"
-            proxy_host, proxy_port = proxy_map[0].split(":", 2)
-            
-        elif len(proxy_map) >= 2:
-            print("[Proxy] resolve route of hostname {} with policy {}".format(hostname, policy))
-            if policy == 'round-robin':
-                global _RR_INDEX
-                index = _RR_INDEX.get(hostname, 0)
-                proxy_host, proxy_port = proxy_map[index].split(":", 2)
-                index = (index + 1) % len(proxy_map)
-                _RR_INDEX[hostname] = index
-            elif policy == 'random':
-                selected = random.choice(proxy_map)
-                proxy_host, proxy_port = selected.split(":", 2)
-            else:
-                print("[Proxy] Unknown policy {}, using default host".format(policy))
-                # Out-of-handle mapped host
-                proxy_host = '127.0.0.1' 
-                proxy_port = '9000'
-    else:
-        print("[Proxy] resolve route of hostname {} is a singulair to".format(hostname))
-        proxy_host, proxy_port = proxy_map.split(":", 2)
+    :rtype Upstream: the selected backend.
+    """
 
-    return proxy_host, proxy_port
+    if len(route.upstreams) == 1:
+        return route.upstreams[0]
+
+    # Ejected upstreams are skipped by every policy; backups only take over
+    # once every primary is ejected
+    candidates = HEALTH.healthy(route.primaries, route.backups)
+    if route.sticky:
+        pinned = route.sticky_upstream(request_cookie(request, route.sticky))
+        if pinned in candidates:
+            return pinned
+
+    policy = route.policy
+    if policy == 'round-robin':
+        return route.next_round_robin(candidates)
+    elif policy == 'random':
+        return pick_random(candidates)
+    elif policy == 'least-conn':
+        return pick_least_conn(candidates)
+    elif policy == 'ewma':
+        return pick_ewma(candidates)
+    # hash, the only other policy a route compiles with
+    key = routing_key(request, addr, route.hash_key)
+    return route.ring.lookup(key, candidates) or candidates[0]
 
 def handle_client(ip, port, conn, addr, routes):
     """
@@ -147,110 +301,208 @@ def handle_client(ip, port, conn, addr, routes):
     condition,it forwards the request to the appropriate backend.
 
     The handler sends the backend response back to the client or
-    returns 404 if the hostname is unreachable or is not recognized.
+    returns 404 if the hostname is not recognized, or 502 if its backend
+    fails.
+    The client connection is persistent: requests are answered in a loop
+    until the client asks to close or stays idle past the timeout.
 
     :params ip (str): IP address of the proxy server.
     :params port (int): port number of the proxy server.
     :params conn (socket.socket): client connection socket.
     :params addr (tuple): client address (IP, port).
-    :params routes (dict): dictionary mapping hostnames and location.
+    :params routes (RoutingTable): the compiled proxy routes.
     """
 
-    request = conn.recv(1024).decode()
+    # Idle keep-alive clients are dropped after the timeout
+    conn.settimeout(KEEPALIVE_TIMEOUT)
+    reader = HttpReader(conn)
+    CONNECTIONS.inc()
+    try:
+        for served in range(1, KEEPALIVE_MAX_REQUESTS + 1):
+            try:
+                msg = reader.read_message()
+            except socket.timeout:
+                break
+            except HttpError as e:
+                conn.sendall(e.to_response())
+                break
+            if msg is None:
+                break
+            # latin-1 maps every byte to one character, so the forwarded request
+            # round-trips to the exact bytes received from the client.
+            request = msg.decode('latin-1')
 
-    # Extract Host header (keep original value, we'll test variants)
-    host_header = None
-    for line in request.splitlines():
-        if line.lower().startswith('host:'):
-            host_header = line.split(':', 1)[1].strip()
-            break
+            keep_alive = served < KEEPALIVE_MAX_REQUESTS and client_keep_alive(request)
+            keep_alive = handle_request(port, conn, addr, request, routes, keep_alive)
+            if not keep_alive:
+                break
+    except socket.error as e:
+        logger.debug("Socket error: %s", e)
+    finally:
+        CONNECTIONS.dec()
+        conn.close()
+
+def metrics_method(request):
+    """
+    :params request (str): incoming HTTP request.
 
-    # Normalize variants: full header (may include port), host without port,
-    # and host combined with the proxy listen port (useful when client omits port)
-    hostname_full = host_header
-    hostname_noport = hostname_full.split(':', 1)[0].strip() if hostname_full else None
-    hostname_with_listen = f"{hostname_noport}:{port}" if hostname_noport else None
+    :rtype str: the method of a ``GET`` or ``HEAD`` request for the metrics
+                path, which the proxy answers itself; None otherwise.
+    """
+    request_line = request.split('\r\n', 1)[0].split(' ')
+    if len(request_line) == 3 and request_line[0] in ('GET', 'HEAD') \
+            and REGISTRY.serves(request_line[1]):
+        return request_line[0]
+    return None
 
-    print("[Proxy] {} at Host: {}".format(addr, host_header))
+def route_backend(route, request, addr):
+    """
+    Resolves the backend of a routed request.
 
-    # Try lookup in routes with priority: exact header, host:listen_port, host without port
-    if hostname_full and hostname_full in routes:
-        lookup_key = hostname_full
-    elif hostname_with_listen and hostname_with_listen in routes:
-        lookup_key = hostname_with_listen
-    else:
-        lookup_key = hostname_noport
+    :params route (Route): the compiled route of the requested host.
+    :params request (str): incoming HTTP request.
+    :params addr (tuple): client address (IP, port).
 
-    # Resolve the matching destination in routes and convert port to int
-    resolved_host, resolved_port = resolve_routing_policy(lookup_key, routes)
-    try:
-        resolved_port = int(resolved_port)
-    except ValueError:
-        print("Not a valid integer")
+    :rtype tuple: (host, port, append) of the selected backend, where append
+                  lists the headers to add to its response.
+    """
 
-    if resolved_host:
-        print("[Proxy] Host name {} is forwarded to {}:{}".format(lookup_key, resolved_host, resolved_port))
-        response = forward_request(resolved_host, resolved_port, request)        
-    else:
-        response = (
-            "HTTP/1.1 404 Not Found\r\n"
-            "Content-Type: text/plain\r\n"
-            "Content-Length: 13\r\n"
-            "Connection: close\r\n"
-            "\r\n"
-            "404 Not Found"
-        ).encode('utf-8')
-    conn.sendall(response)
-    conn.close()
-
-def run_proxy(ip, port, routes):
+    upstream = resolve_routing_policy(route, request, addr)
+
+    # Pin the client to its backend unless the cookie already does
+    append = ()
+    if route.sticky:
+        value = sticky_id(upstream.key)
+        if request_cookie(request, route.sticky) != value:
+            append = (("Set-Cookie", "{}={}; Path=/; HttpOnly".format(route.sticky, value)),)
+
+    return upstream.host, upstream.port, append
+
+def handle_request(port, conn, addr, request, routes, keep_alive=False):
+    """
+    Routes one request to its backend and relays the backend response.
+
+    Hosts with ``proxy_cache on`` are answered from :data:`PROXY_CACHE
+    <PROXY_CACHE>` when a fresh response is stored; otherwise the response is
+    captured while it is relayed. Requests for the metrics path are answered
+    by the proxy with its own metrics.
+
+    :params port (int): port number of the proxy server.
+    :params conn (socket.socket): client connection socket.
+    :params addr (tuple): client address (IP, port).
+    :params request (str): incoming HTTP request.
+    :params routes (RoutingTable): the compiled proxy routes.
+    :params keep_alive (bool): whether the client connection may stay open.
+
+    :rtype bool: whether the client connection may stay open afterwards.
+    """
+
+    method = metrics_method(request)
+    if method:
+        conn.sendall(REGISTRY.response(keep_alive, method))
+        return keep_alive
+
+    lookup_key, route = routes.lookup(request_header(request, 'host'), port)
+    capture = None
+    if route.cache:
+        entry = PROXY_CACHE.get(lookup_key, request)
+        if entry is not None:
+            conn.sendall(entry.response(keep_alive, request.split(' ', 1)[0]))
+            return keep_alive
+        capture = PROXY_CACHE.capture(lookup_key, request)
+
+    for attempt in range(UPSTREAM_ATTEMPTS):
+        resolved_host, resolved_port, append = route_backend(route, request, addr)
+        if not resolved_host:
+            conn.sendall(not_found(keep_alive))
+            return keep_alive
+        result = forward_request(resolved_host, resolved_port, request, conn,
+                                 keep_alive, append, capture)
+        if result is not None:
+            return result
+        # Connection refused: the request was not sent, try the next pick
+    conn.sendall(bad_gateway(keep_alive))
+    return keep_alive
+
+def run_proxy(ip, port, routes, pool_size=POOL_SIZE, queue_depth=QUEUE_DEPTH,
+              health_interval=HEALTH_CHECK_INTERVAL, health_path=None,
+              reuse_port=False):
     """
     Starts the proxy server and listens for incoming connections. 
 
     The process dinds the proxy server to the specified IP and port.
     In each incomping connection, it accepts the connections and
-    spawns a new thread for each client using `handle_client`.
+    queues them to a fixed pool of worker threads running `handle_client`.
+    When the queue is full the client is answered with 503.
  
 
     :params ip (str): IP address to bind the proxy server.
     :params port (int): port number to listen on.
     :params routes (dict): dictionary mapping hostnames and location.
+    :params pool_size (int): number of worker threads.
+    :params queue_depth (int): accepted connections allowed to wait for a worker.
+    :params health_interval (float): seconds between active health probes,
+                                     0 disables them.
+    :params health_path (str): path probed with ``GET``, None for TCP probes.
+    :params reuse_port (bool): bind with ``SO_REUSEPORT`` to share the port
+                               with sibling worker processes.
 
     """
 
-    proxy = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-
+    routes = compile_routes(routes)
     try:
-        proxy.bind((ip, port))
-        proxy.listen(50)
-        print("[Proxy] Listening on IP {} port {}".format(ip,port))
+        proxy = create_listener(ip, port, reuse_port)
+        logger.info("[Proxy] Listening on IP %s port %s", ip, port)
+        start_health_checks(routes, health_interval, health_path)
+        pool = WorkerPool(handle_client, pool_size, queue_depth, name="proxy")
         while True:
             conn, addr = proxy.accept()
-            #
-            #  TODO: implement the step of the client incomping connection
-            #        using multi-thread programming with the
-            #        provided handle_client routine
-            #
-
-            ######IMPLEMENT######################
-            thread = threading.Thread(
-                target=handle_client,
-                args=(ip, port, conn, addr, routes)
-            )
-            thread.daemon = True
-            thread.start()
-            ####################################
+            pool.submit(conn, ip, port, conn, addr, routes)
 
     except socket.error as e:
-      print("Socket error: {}".format(e))
+      logger.error("Socket error: %s", e)
+
+#: Proxy engines accepted by :func:`create_proxy`.
+PROXY_ENGINES = ('thread', 'asyncio')
+
 
-def create_proxy(ip, port, routes):
+def create_proxy(ip, port, routes, pool_size=POOL_SIZE, queue_depth=QUEUE_DEPTH,
+                 workers=1, engine='thread',
+                 health_interval=HEALTH_CHECK_INTERVAL, health_path=None):
     """
     Entry point for launching the proxy server.
 
     :params ip (str): IP address to bind the proxy server.
     :params port (int): port number to listen on.
     :params routes (dict): dictionary mapping hostnames and location.
+    :params pool_size (int): number of worker threads.
+    :params queue_depth (int): accepted connections allowed to wait for a worker.
+    :params workers (int): number of processes sharing the port; more than
+                           one starts a supervisor that forks and restarts them.
+    :params engine (str): ``thread`` for the worker pool engine, or
+                          ``asyncio`` for the single event loop engine.
+    :params health_interval (float): seconds between active health probes,
+                                     0 disables them.
+    :params health_path (str): path probed with ``GET``, None for TCP probes.
+
+    :raises ValueError: If the engine is unknown.
     """
 
-    run_proxy(ip, port, routes)
+    # Compiled once, before forking, so every worker shares the table
+    routes = compile_routes(routes)
+    register_cache('proxy', PROXY_CACHE)
+    if engine == 'thread':
+        target = run_proxy
+        args = (ip, port, routes, pool_size, queue_depth, health_interval, health_path)
+    elif engine == 'asyncio':
+        # Imported here: the asyncio engine reuses this module's routing
+        from .aioproxy import run_proxy_async
+        target = run_proxy_async
+        args = (ip, port, routes, health_interval, health_path)
+    else:
+        raise ValueError("Invalid proxy engine: {}".format(engine))
+
+    if workers > 1:
+        supervise(workers, target, *args, reuse_port=True)
+    else:
+        target(*args)
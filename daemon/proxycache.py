@@ -0,0 +1,350 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.proxycache
+~~~~~~~~~~~~~~~~~
+
+This module implements the in-memory response cache of the proxy, enabled per
+host with ``proxy_cache on;`` in ``proxy.conf``.
+
+Only ``GET`` responses with an explicit freshness lifetime are stored: the TTL
+comes from ``Cache-Control: s-maxage``/``max-age`` or ``Expires``, and
+responses marked ``no-store``, ``no-cache`` or ``private``, or setting a cookie,
+are never stored. Entries are keyed by host, path and the request headers
+named by ``Vary``. ``HEAD`` requests are answered from the stored ``GET``.
+
+The body is captured while it is streamed to the first client, so a miss costs
+no extra round trip. The cache is bounded by its total size in bytes and
+evicts the least recently used entries.
+
+Usage Example:
+--------------
+>>> entry = PROXY_CACHE.get("app1.local", request)
+>>> if entry is None:
+...     capture = PROXY_CACHE.capture("app1.local", request)
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+
+from .httpreader import HttpError, set_headers, parse_status
+
+#: Bytes of responses kept in the cache.
+PROXY_CACHE_SIZE = 64 * 1024 * 1024
+#: Largest response stored, in bytes; bigger ones are only relayed.
+PROXY_CACHE_MAX_ENTRY = 1024 * 1024
+#: Statuses whose responses may be stored.
+CACHEABLE_STATUSES = (200, 203, 301, 404, 410)
+
+
+def head_fields(head):
+    """
+    :params head (bytes): a header block.
+
+    :rtype dict: lowercase header name -> value, repeated headers joined by ``,``.
+    """
+    fields = {}
+    for line in head.split(b"\r\n")[1:]:
+        name, sep, value = line.decode('latin-1').partition(":")
+        if not sep:
+            continue
+        name = name.strip().lower()
+        value = value.strip()
+        fields[name] = "{}, {}".format(fields[name], value) if name in fields else value
+    return fields
+
+
+def request_fields(request):
+    """
+    :params request (str): incoming HTTP request.
+
+    :rtype tuple: (method, target, fields) of its head.
+    """
+    head = request.split('\r\n\r\n', 1)[0]
+    parts = head.split('\r\n', 1)[0].split(' ')
+    fields = head_fields(head.encode('latin-1'))
+    return parts[0], (parts[1] if len(parts) > 1 else '/'), fields
+
+
+def directives(cache_control):
+    """
+    :params cache_control (str): a ``Cache-Control`` value, may be None.
+
+    :rtype dict: lowercase directive -> value (None for flags).
+    """
+    parsed = {}
+    for item in (cache_control or '').split(','):
+        name, sep, value = item.strip().partition('=')
+        if name:
+            parsed[name.lower()] = value.strip('"') if sep else None
+    return parsed
+
+
+def freshness(fields):
+    """
+    Computes how long a response stays fresh.
+
+    :params fields (dict): its headers, from :func:`head_fields`.
+
+    :rtype float: seconds of freshness left, 0 if it may not be stored.
+    """
+    control = directives(fields.get('cache-control'))
+    if 'no-store' in control or 'no-cache' in control or 'private' in control:
+        return 0
+    try:
+        age = int(fields.get('age', 0))
+    except ValueError:
+        age = 0
+    for name in ('s-maxage', 'max-age'):
+        if name in control:
+            try:
+                return max(int(control[name]) - age, 0)
+            except (TypeError, ValueError):
+                return 0
+    if 'expires' in fields:
+        try:
+            expires = parsedate_to_datetime(fields['expires']).timestamp()
+            date = parsedate_to_datetime(fields['date']).timestamp() \
+                if 'date' in fields else time.time()
+        except (TypeError, ValueError, IndexError):
+            return 0
+        return max(expires - date - age, 0)
+    return 0
+
+
+class CacheEntry:
+    """
+    One stored response.
+
+    :attrs head (bytes): header block, including the blank line.
+    :attrs body (bytes): body exactly as received from the upstream.
+    :attrs stored (float): monotonic time it was stored.
+    :attrs expires (float): monotonic time it goes stale.
+    :attrs age (int): ``Age`` of the response when stored.
+    """
+
+    __attrs__ = [
+        "head",
+        "body",
+        "stored",
+        "expires",
+        "age",
+    ]
+
+    def __init__(self, head, body, ttl, age=0):
+        self.head = head
+        self.body = body
+        self.stored = time.monotonic()
+        self.expires = self.stored + ttl
+        self.age = age
+
+    @property
+    def size(self):
+        return len(self.head) + len(self.body)
+
+    def response(self, keep_alive, method='GET'):
+        """
+        :params keep_alive (bool): whether the client connection stays open.
+        :params method (str): request method, ``HEAD`` gets no body.
+
+        :rtype bytes: the response to send to the client.
+        """
+        head = set_headers(self.head, {
+            "Connection": "keep-alive" if keep_alive else "close",
+            "Keep-Alive": None,
+            "Age": str(self.age + int(time.monotonic() - self.stored)),
+        })
+        return head if method == 'HEAD' else head + self.body
+
+
+class CacheCapture:
+    """
+    Collects a response while it is relayed, and stores it once complete.
+    """
+
+    def __init__(self, cache, key, fields):
+        self.cache = cache
+        self.key = key
+        self.fields = fields
+        self.head = None
+        self.ttl = 0
+        self.age = 0
+        self.vary = ()
+        self._body = bytearray()
+
+    def start(self, head):
+        """
+        :params head (bytes): the upstream response header block.
+
+        :rtype bool: True if the response may be stored and is captured.
+        """
+        try:
+            status = parse_status(head)
+        except HttpError:
+            return False
+        fields = head_fields(head[:head.find(b"\r\n\r\n")])
+        if status not in CACHEABLE_STATUSES or 'set-cookie' in fields:
+            return False
+        vary = tuple(v.strip().lower() for v in fields.get('vary', '').split(',') if v.strip())
+        if '*' in vary:
+            return False
+        if 'content-length' not in fields \
+                and 'chunked' not in fields.get('transfer-encoding', '').lower():
+            # Ends at connection close: a keep-alive replay would never end
+            return False
+        try:
+            if int(fields.get('content-length', 0)) > self.cache.max_entry:
+                return False
+            self.age = int(fields.get('age', 0))
+        except ValueError:
+            return False
+        self.ttl = freshness(fields)
+        if self.ttl <= 0:
+            return False
+        self.head = head
+        self.vary = vary
+        return True
+
+    def write(self, data):
+        """Appends relayed body bytes, giving up past the entry size limit."""
+        if self.head is None:
+            return
+        self._body += data
+        if len(self.head) + len(self._body) > self.cache.max_entry:
+            self.head = None
+            self._body = bytearray()
+
+    def finish(self):
+        """Stores the response after its body was fully relayed."""
+        if self.head is not None:
+            self.cache.store(self, bytes(self._body))
+
+
+class ResponseCache:
+    """
+    Byte-bounded LRU cache of upstream responses.
+
+    :attrs max_size (int): bytes of responses kept.
+    :attrs max_entry (int): largest response stored.
+    :attrs hits (int): requests answered from the cache.
+    :attrs misses (int): cacheable requests sent to an upstream.
+    :attrs stores (int): responses stored.
+    :attrs evictions (int): responses evicted to make room.
+    :attrs size (int): bytes of responses currently kept.
+    """
+
+    __attrs__ = [
+        "max_size",
+        "max_entry",
+        "hits",
+        "misses",
+        "stores",
+        "evictions",
+        "size",
+    ]
+
+    def __init__(self, max_size=PROXY_CACHE_SIZE, max_entry=PROXY_CACHE_MAX_ENTRY):
+        self.max_size = max_size
+        self.max_entry = max_entry
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.size = 0
+        #: (host, target) -> (header names of its Vary, entries stored for it);
+        #: dropped with the last entry, so it stays bounded with them
+        self._vary = {}
+        #: (host, target, vary values) -> CacheEntry, least recent first
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry_key(self, key, fields, vary=None):
+        if vary is None:
+            vary = self._vary.get(key, ((), 0))[0]
+        return key + tuple(fields.get(name) for name in vary)
+
+    def get(self, host, request):
+        """
+        Looks up a fresh response for the request.
+
+        :params host (str): the routed host.
+        :params request (str): incoming HTTP request.
+
+        :rtype CacheEntry: the stored response, None on a miss or when the
+                           request may not be answered from the cache.
+        """
+        method, target, fields = request_fields(request)
+        control = directives(fields.get('cache-control'))
+        if method not in ('GET', 'HEAD') or 'authorization' in fields \
+                or 'no-cache' in control or 'no-store' in control:
+            return None
+        key = (host, target)
+        with self._lock:
+            entry_key = self._entry_key(key, fields)
+            entry = self._entries.get(entry_key)
+            if entry is not None and entry.expires > time.monotonic():
+                self._entries.move_to_end(entry_key)
+                self.hits += 1
+                return entry
+            if entry is not None:
+                self._remove(entry_key)
+            self.misses += 1
+        return None
+
+    def capture(self, host, request):
+        """
+        :params host (str): the routed host.
+        :params request (str): incoming HTTP request.
+
+        :rtype CacheCapture: collector of the upstream response, None if the
+                             request is not a cacheable ``GET``.
+        """
+        method, target, fields = request_fields(request)
+        if method != 'GET' or 'authorization' in fields \
+                or 'no-store' in directives(fields.get('cache-control')):
+            return None
+        return CacheCapture(self, (host, target), fields)
+
+    def store(self, capture, body):
+        """Stores a captured response, evicting old ones to stay in bounds."""
+        entry = CacheEntry(capture.head, body, capture.ttl, capture.age)
+        if entry.size > self.max_entry:
+            return
+        with self._lock:
+            entry_key = self._entry_key(capture.key, capture.fields, capture.vary)
+            if entry_key in self._entries:
+                self._remove(entry_key)
+            count = self._vary.get(capture.key, ((), 0))[1]
+            self._vary[capture.key] = (capture.vary, count + 1)
+            self._entries[entry_key] = entry
+            self.size += entry.size
+            self.stores += 1
+            while self.size > self.max_size:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, entry_key):
+        """Drops an entry (lock held)."""
+        self.size -= self._entries.pop(entry_key).size
+        key = entry_key[:2]
+        vary, count = self._vary[key]
+        if count > 1:
+            self._vary[key] = (vary, count - 1)
+        else:
+            del self._vary[key]
+
+
+#: Cache shared by every proxy worker thread.
+PROXY_CACHE = ResponseCache()
@@ -17,8 +17,12 @@ daemon.request
 This module provides a Request object to manage and persist 
 request settings (cookies, auth, proxies).
 """
+import logging
 from daemon.utils import get_auth_from_url
 from .dictionary import CaseInsensitiveDict
+from .router import compile_router
+
+logger = logging.getLogger(__name__)
 
 class Request():
     """The fully mutable "class" `Request <Request>` object,
@@ -47,6 +51,8 @@ class Request():
         "body",
         "routes",
         "hook",
+        "params",
+        "allowed",
     ]
 
     def __init__(self):
@@ -66,6 +72,10 @@ class Request():
         self.routes = {}
         #: Hook point for routed mapped-path
         self.hook = None
+        #: Path parameters of the matched route, e.g. ``{'id': 42}``
+        self.params = {}
+        #: Methods routed for the path when the request method is not
+        self.allowed = ()
 
     def extract_request_line(self, request):
         """
@@ -86,7 +96,7 @@ class Request():
             if path == '/':
                 path = '/index.html'
         except Exception:
-            return None, None
+            return None, None, None
 
         return method, path, version
              
@@ -152,7 +162,7 @@ class Request():
 
         # Tách request line:
         self.method, self.path, self.version = self.extract_request_line(request)
-        print("[Request] {} path {} version {}".format(self.method, self.path, self.version))
+        logger.debug("[Request] %s path %s version %s", self.method, self.path, self.version)
 
         #
         # @bksysnet Preapring the webapp hook with WeApRous instance
@@ -162,13 +172,9 @@ class Request():
         #
         
         # Xử lý routes nếu có
-        if not routes == {}:
-            self.routes = routes
-            self.hook = routes.get((self.method, self.path))
-            #
-            # self.hook manipulation goes here
-            # ...
-            #
+        if routes:
+            self.routes = compile_router(routes)
+            self.hook, self.params, self.allowed = self.routes.match(self.method, self.path)
         # Tách headers
         self.headers = self.prepare_headers(request)
         # Tách body nếu có
@@ -18,15 +18,155 @@ This module provides a :class: `Response <Response>` object to manage and persis
 response settings (cookies, auth, proxies), and to construct HTTP responses
 based on incoming requests. 
 
-The current version supports MIME type detection, content loading and header formatting
+The current version supports MIME type detection, through the extension table of
+:mod:`daemon.contenttypes`, content loading and header formatting, and byte ``Range`` requests of static files, answered with ``206 Partial Content``.
+
+Static files carry an ``ETag`` built from their size and modification time and a
+``Last-Modified`` date; ``If-None-Match`` and ``If-Modified-Since`` requests for
+an unchanged file are answered with a bodiless ``304 Not Modified``. How long a
+browser may reuse a file without asking is set per directory in
+:data:`CACHE_MAX_AGE`.
+
+Text files are compressed with ``gzip`` or ``deflate`` when the client accepts
+it; see :mod:`daemon.compression`.
 """
 import datetime
+import functools
+import http
+import logging
 import os
-import mimetypes
+import time
+import uuid
+from email.utils import formatdate, parsedate_to_datetime
 from .dictionary import CaseInsensitiveDict
+from .filecache import FILE_CACHE, FileBody
+from .compression import ENCODED_CACHE, compress, compressible, negotiate
+from .contenttypes import CONTENT_TYPES
+from .hooks import serialize
+
+logger = logging.getLogger(__name__)
 
 BASE_DIR = ""
 
+#: Ranges of one request sent as separate parts; more are coalesced into one.
+MAX_RANGES = 16
+#: Separator of the parts of ``multipart/byteranges`` bodies.
+BYTERANGES_BOUNDARY = uuid.uuid4().hex
+#: Seconds a file may be reused by browsers without revalidation, by directory;
+#: the longest matching directory wins, files elsewhere are always revalidated.
+CACHE_MAX_AGE = {
+    "static/": 3600,
+    "www/": 0,
+}
+
+
+def cache_control(filepath):
+    """
+    :params filepath (str): path of a static file.
+
+    :rtype str: its ``Cache-Control`` value, from :data:`CACHE_MAX_AGE`.
+    """
+    filepath = os.path.normpath(filepath)
+    matched, max_age = "", 0
+    for directory, seconds in CACHE_MAX_AGE.items():
+        prefix = os.path.normpath(directory) + os.sep
+        if filepath.startswith(prefix) and len(prefix) > len(matched):
+            matched, max_age = prefix, seconds
+    return "max-age={}".format(max_age) if max_age > 0 else "no-cache"
+
+
+#: Status line of every status code, e.g. ``b"HTTP/1.1 200 OK\r\n"``.
+STATUS_LINES = {
+    status.value: "HTTP/1.1 {} {}\r\n".format(status.value, status.phrase).encode('latin-1')
+    for status in http.HTTPStatus
+}
+
+#: (second, ``Date`` header line) of the last formatted date.
+_date_line = (0, b"")
+
+
+def date_header():
+    """
+    :rtype bytes: the ``Date`` header line, formatted at most once per second.
+    """
+    global _date_line
+    now = int(time.time())
+    second, line = _date_line
+    if second != now:
+        line = "Date: {}\r\n".format(formatdate(now, usegmt=True)).encode('latin-1')
+        # A tuple is swapped atomically: concurrent workers never see half of it
+        _date_line = (now, line)
+    return line
+
+
+@functools.lru_cache(maxsize=256)
+def content_type_header(content_type, ranges=True):
+    """
+    :params content_type (str): the ``Content-Type`` of a response, may be None.
+    :params ranges (bool): whether byte ranges of the response are served.
+
+    :rtype bytes: the header lines shared by every response of that type.
+    """
+    lines = "Content-Type: {}\r\n".format(content_type) if content_type else ""
+    if ranges:
+        lines += "Accept-Ranges: bytes\r\n"
+    return lines.encode('latin-1')
+
+
+@functools.lru_cache(maxsize=64)
+def docroot(base_dir):
+    """
+    :params base_dir (str): a directory files are served from.
+
+    :rtype str: its canonical path, which every served file must be inside.
+    """
+    return os.path.realpath(base_dir)
+
+
+def entity_tag(size, mtime):
+    """
+    :params size (int): bytes of the file.
+    :params mtime (int): its modification time in nanoseconds.
+
+    :rtype str: the quoted strong ``ETag`` of this version of the file.
+    """
+    return '"{:x}-{:x}"'.format(size, mtime)
+
+
+def parse_range(value, size):
+    """
+    Parses a ``Range`` header against the size of the file.
+
+    :params value (str): the header value, e.g. ``bytes=0-499,-500``.
+    :params size (int): bytes of the file.
+
+    :rtype list: (first, last) byte positions of the satisfiable ranges, empty
+                 if none is; None if the header is malformed and must be ignored.
+    """
+    unit, sep, specs = value.partition('=')
+    if unit.strip().lower() != 'bytes' or not sep:
+        return None
+    ranges = []
+    for spec in specs.split(','):
+        first, dash, last = spec.strip().partition('-')
+        if not dash or not (first or last) \
+                or (first and not first.isdigit()) or (last and not last.isdigit()):
+            return None
+        if not first:
+            # Suffix range: the last N bytes
+            suffix = int(last)
+            if suffix and size:
+                ranges.append((max(size - suffix, 0), size - 1))
+            continue
+        start = int(first)
+        end = int(last) if last else size - 1
+        if end < start and last:
+            return None
+        if start < size:
+            ranges.append((start, min(end, size - 1)))
+    return ranges
+
+
 class Response():   
     """The :class:`Response <Response>` object, which contains a
     server's response to an HTTP request.
@@ -73,6 +213,11 @@ class Response():
         "request",
         "body",
         "reason",
+        "keep_alive",
+        "file_body",
+        "mtime",
+        "filepath",
+        "extra_headers",
     ]
 
 
@@ -118,93 +263,47 @@ class Response():
         #: is a response.
         self.request = None
 
+        #: Whether the connection stays open after this response.
+        self.keep_alive = False
 
-    def get_mime_type(self, path):
-        """
-        Determines the MIME type of a file based on its path.
+        #: Idle timeout advertised in the ``Keep-Alive`` header.
+        self.keepalive_timeout = 0
 
-        "params path (str): Path to the file.
+        #: Remaining requests advertised in the ``Keep-Alive`` header.
+        self.keepalive_remaining = 0
 
-        :rtype str: MIME type string (e.g., 'text/html', 'image/png').
-        """
+        #: Large file sent with ``sendfile`` after the header, instead of
+        #: being part of the content.
+        self.file_body = None
 
-        try:
-            mime_type, _ = mimetypes.guess_type(path)
-        except Exception:
-            return 'application/octet-stream'
-        return mime_type or 'application/octet-stream'
+        #: Modification time of the static file served, in nanoseconds.
+        self.mtime = None
 
+        #: Path of the static file served.
+        self.filepath = None
 
-    def prepare_content_type(self, mime_type='text/html'):
-        """
-        Prepares the Content-Type header and determines the base directory
-        for serving the file based on its MIME type.
+        #: Headers set by a route handler, sent as they are.
+        self.extra_headers = {}
 
-        :params mime_type (str): MIME type of the requested resource.
 
-        :rtype str: Base directory path for locating the resource.
+    def get_mime_type(self, path):
+        """
+        Determines the MIME type of a file based on its path.
+
+        "params path (str): Path to the file.
 
-        :raises ValueError: If the MIME type is unsupported.
+        :rtype str: MIME type string (e.g., 'text/html', 'image/png').
         """
-        
-        base_dir = ""
-
-        # Processing mime_type based on main_type and sub_type
-        main_type, sub_type = mime_type.split('/', 1)
-        print("[Response] processing MIME main_type={} sub_type={}".format(main_type,sub_type))
-        if main_type == 'text':
-            self.headers['Content-Type']='text/{}'.format(sub_type)
-            if sub_type == 'plain' or sub_type == 'css':
-                base_dir = BASE_DIR+"static/"
-            elif sub_type == 'html':
-                base_dir = BASE_DIR+"www/"
-            else:
-                handle_text_other(sub_type)
-        elif main_type == 'image':
-            if sub_type == 'x-icon':  # favicon.ico
-                base_dir = BASE_DIR + "static/images/"
-            else:
-                base_dir = BASE_DIR + "static/"
-            self.headers['Content-Type'] = 'image/{}'.format(sub_type)
-
-        elif main_type == 'application':
-            if sub_type == 'xml':
-                base_dir = BASE_DIR + "static/xml/"
-            elif sub_type == 'zip':
-                base_dir = BASE_DIR + "static/files/"
-            elif sub_type == 'javascript':
-                base_dir = BASE_DIR + "static/js/"
-            elif sub_type == 'json':
-                base_dir = BASE_DIR + "apps/"
-            else:
-                base_dir = BASE_DIR + "apps/"
-            self.headers['Content-Type']='application/{}'.format(sub_type)
-        #
-        #  TODO: process other mime_type
-        #        application/xml       
-        #        application/zip
-        #        ...
-        #        text/csv
-        #        text/xml
-        #        ...
-        #        video/mp4 
-        #        video/mpeg
-        #        ...
-        #
-        ######IMPLEMENT######################
-        elif main_type == 'video':
-            base_dir = BASE_DIR + "static/videos/"
-            self.headers['Content-Type'] = 'video/{}'.format(sub_type)
-        
-        else:
-            raise ValueError("Invalid MEME type: main_type={} sub_type={}".format(main_type,sub_type))
 
-        return base_dir
+        entry = CONTENT_TYPES.lookup(path)
+        return entry[0] if entry else 'application/octet-stream'
 
 
     def build_content(self, path, base_dir):
         """
-        Loads the objects file from storage space.
+        Loads the objects file from storage space, through the in-memory
+        :data:`FILE_CACHE <FILE_CACHE>`. A file too large to be cached is not
+        read: it is kept open in ``file_body`` and the content is empty.
 
         :params path (str): relative path to the file.
         :params base_dir (str): base directory where the file is located.
@@ -212,110 +311,273 @@ class Response():
         :rtype tuple: (int, bytes) representing content length and content data.
         """
 
-        filepath = os.path.join(base_dir, path.lstrip('/'))
+        filepath = os.path.normpath(os.path.join(base_dir, path.lstrip('/')))
+        root = docroot(base_dir)
+        if os.path.commonpath([root, os.path.realpath(filepath)]) != root:
+            # "..", or a link leading out of the docroot: as if it did not exist
+            logger.debug("[Response] refused path outside %s: %s", base_dir, path)
+            return self.content_not_found()
 
-        print("[Response] serving the object at location {}".format(filepath))
+        logger.debug("[Response] serving the object at location %s", filepath)
             #
             #  TODO: implement the step of fetch the object file
             #        store in the return value of content
             #
         ######IMPLEMENT######################
         try:
-            with open(filepath, 'rb') as f:
-                content = f.read()
-                return len(content), content
+            content, self.mtime = FILE_CACHE.load(filepath)
+            if isinstance(content, FileBody):
+                self.file_body = content
+                size, content = content.size, b""
+            else:
+                size = len(content)
+            self.headers['ETag'] = entity_tag(size, self.mtime)
+            self.headers['Last-Modified'] = formatdate(self.mtime // 1000000000, usegmt=True)
+            self.headers['Cache-Control'] = cache_control(filepath)
+            self.filepath = filepath
+            return size, content
         except FileNotFoundError:
-            print("[Response] File not found: {}".format(filepath))
-            return 0, b"404 Not Found"
+            logger.debug("[Response] File not found: %s", filepath)
+            return self.content_not_found()
         except Exception as e:
-            print("[Response] Error reading file: {}".format(e))
+            logger.warning("[Response] Error reading file: %s", e)
+            self.status_code = 500
+            self.headers['Content-Type'] = 'text/html'
             return 0, b"500 Internal Server Error"
         ###################################3
 
 
+    def content_not_found(self):
+        """
+        :rtype tuple: (int, bytes) content length and body of a 404.
+        """
+        self.status_code = 404
+        self.headers['Content-Type'] = 'text/html'
+        return 0, b"404 Not Found"
+
+
+    def prepare_encoding(self, request, size):
+        """
+        Negotiates the ``Content-Encoding`` of a static file. An encoded
+        variant gets its own ``ETag``, so validators never mix the variants.
+        Range requests are served from the identity file.
+
+        :params request (class:`Request <Request>`): incoming request object.
+        :params size (int): bytes of the file.
+
+        :rtype str: ``gzip`` or ``deflate``; None to send the file as is.
+        """
+        if self.file_body or not compressible(self.headers['Content-Type'], size):
+            return None
+        self.headers['Vary'] = 'Accept-Encoding'
+        if 'range' in request.headers:
+            return None
+        coding = negotiate(request.headers.get('accept-encoding'))
+        if coding:
+            self.headers['Content-Encoding'] = coding
+            self.headers['ETag'] = '{}-{}"'.format(self.headers['ETag'][:-1], coding)
+        return coding
+
+
+    def not_modified(self, request):
+        """
+        Evaluates the ``If-None-Match`` and ``If-Modified-Since`` preconditions;
+        the entity tags take precedence over the date when both are sent.
+
+        :params request (class:`Request <Request>`): incoming request object.
+
+        :rtype bool: True if the client copy is current and a ``304`` is due.
+        """
+        if request.method not in ('GET', 'HEAD'):
+            return False
+        none_match = request.headers.get('if-none-match')
+        if none_match is not None:
+            etag = self.headers['ETag']
+            for tag in none_match.split(','):
+                tag = tag.strip()
+                # Weak comparison: W/ prefixes are ignored
+                if tag == '*' or (tag[2:] if tag.startswith('W/') else tag) == etag:
+                    return True
+            return False
+        since = request.headers.get('if-modified-since')
+        if not since:
+            return False
+        try:
+            since = parsedate_to_datetime(since).timestamp()
+        except (TypeError, ValueError, IndexError):
+            return False
+        return self.mtime // 1000000000 <= int(since)
+
+
+    def prepare_not_modified(self):
+        """
+        Turns the response into a bodiless ``304 Not Modified``.
+
+        :rtype bytes: the empty content.
+        """
+        if self.file_body:
+            self.file_body.close()
+            self.file_body = None
+        self.status_code, self.reason = 304, "Not Modified"
+        return b""
+
+
+    def if_range_matches(self, value):
+        """
+        Checks the ``If-Range`` validator against the file served.
+
+        :params value (str): the header value, may be None.
+
+        :rtype bool: True if the ranges may be served, False if the whole file
+                     must be sent because it changed.
+        """
+        if not value:
+            return True
+        value = value.strip()
+        if value.startswith('"') or value.startswith('W/'):
+            # Strong comparison: a weak tag never matches
+            return value == self.headers['ETag']
+        try:
+            since = parsedate_to_datetime(value).timestamp()
+        except (TypeError, ValueError, IndexError):
+            return False
+        return int(since) == self.mtime // 1000000000
+
+
+    def prepare_range(self, request, content):
+        """
+        Narrows a static file to the byte ranges of the ``Range`` header.
+
+        A single range is answered with ``206`` and a ``Content-Range``; a large
+        file stays in ``file_body``, narrowed to the range, so only that part is
+        sent. Several ranges are sent as a ``multipart/byteranges`` body, except
+        when there are more than :data:`MAX_RANGES` of them or they add up to
+        more than a cacheable file: they are then coalesced into one range.
+        Unsatisfiable ranges are answered with ``416``.
+
+        :params request (class:`Request <Request>`): incoming request object.
+        :params content (bytes): the file content, empty for a ``file_body``.
+
+        :rtype bytes: the content to send.
+        """
+        value = request.headers.get('range')
+        if not value or request.method != 'GET' \
+                or not self.if_range_matches(request.headers.get('if-range')):
+            return content
+        size = self.file_body.size if self.file_body else len(content)
+        ranges = parse_range(value, size)
+        if ranges is None:
+            return content
+
+        if not ranges:
+            if self.file_body:
+                self.file_body.close()
+                self.file_body = None
+            self.status_code, self.reason = 416, "Range Not Satisfiable"
+            self.headers['Content-Range'] = "bytes */{}".format(size)
+            return b""
+
+        self.status_code, self.reason = 206, "Partial Content"
+        total = sum(end - start + 1 for start, end in ranges)
+        if len(ranges) > MAX_RANGES or (self.file_body and total > FILE_CACHE.max_entry):
+            ranges = [(min(r[0] for r in ranges), max(r[1] for r in ranges))]
+
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            self.headers['Content-Range'] = "bytes {}-{}/{}".format(start, end, size)
+            if self.file_body:
+                self.file_body.narrow(start, end - start + 1)
+                return b""
+            return content[start:end + 1]
+
+        parts = []
+        for start, end in ranges:
+            if self.file_body:
+                self.file_body.file.seek(start)
+                data = self.file_body.file.read(end - start + 1)
+            else:
+                data = content[start:end + 1]
+            parts.append("--{}\r\nContent-Type: {}\r\nContent-Range: bytes {}-{}/{}\r\n\r\n".format(
+                BYTERANGES_BOUNDARY, self.headers['Content-Type'], start, end, size).encode('utf-8'))
+            parts.append(data)
+            parts.append(b"\r\n")
+        parts.append("--{}--\r\n".format(BYTERANGES_BOUNDARY).encode('utf-8'))
+        if self.file_body:
+            self.file_body.close()
+            self.file_body = None
+        self.headers['Content-Type'] = "multipart/byteranges; boundary={}".format(BYTERANGES_BOUNDARY)
+        return b"".join(parts)
+
 
     def build_response_header(self, request):
         """
         Constructs the HTTP response headers based on the class:`Request <Request>
         and internal attributes.
 
+        Only real response headers are sent. The status line and the lines
+        shared by a content type are precomputed bytes and the ``Date`` line
+        changes once per second, so only the per-file validators and the
+        length are formatted here. Headers set by a route handler are sent
+        after them.
+
         :params request (class:`Request <Request>`): incoming request object.
 
         :rtypes bytes: encoded HTTP response header.
         """
-        #Header from request client
-        reqhdr = request.headers
-        #Header from response server
         rsphdr = self.headers
+        status_code = self.status_code or 200
+        if self.reason:
+            status_line = "HTTP/1.1 {} {}\r\n".format(status_code, self.reason).encode('latin-1')
+        else:
+            status_line = STATUS_LINES.get(status_code) or \
+                "HTTP/1.1 {} \r\n".format(status_code).encode('latin-1')
+
+        lines = [status_line,
+                 content_type_header(rsphdr.get('Content-Type'), self.mtime is not None),
+                 date_header()]
+        if status_code != 304 and status_code != 204:
+            # A 304 describes the body that was not sent: no length of its own
+            lines.append(b"Content-Length: %d\r\n" % (
+                self.file_body.size if self.file_body else len(self._content)))
+        lines.append("Cache-Control: {}\r\n".format(
+            rsphdr.get('Cache-Control', 'no-cache')).encode('latin-1'))
+        for name in ('ETag', 'Last-Modified', 'Content-Encoding', 'Vary', 'Content-Range'):
+            value = rsphdr.get(name)
+            if value is not None:
+                lines.append("{}: {}\r\n".format(name, value).encode('latin-1'))
+        for name, value in self.extra_headers.items():
+            # A list value is sent as repeated headers, e.g. Set-Cookie
+            for item in (value if isinstance(value, list) else [value]):
+                lines.append("{}: {}\r\n".format(name, item).encode('utf-8'))
+
+        if self.keep_alive:
+            lines.append("Connection: keep-alive\r\nKeep-Alive: timeout={}, max={}\r\n".format(
+                self.keepalive_timeout, self.keepalive_remaining).encode('latin-1'))
+        else:
+            lines.append(b"Connection: close\r\n")
+        lines.append(b"\r\n")
+        return b"".join(lines)
 
-        #Build dynamic headers
-        headers = {
-                "Accept": "{}".format(reqhdr.get("Accept", "application/json")),
-                "Accept-Language": "{}".format(reqhdr.get("Accept-Language", "en-US,en;q=0.9")),
-                "Authorization": "{}".format(reqhdr.get("Authorization", "Basic <credentials>")),
-                "Cache-Control": "no-cache",
-                "Content-Type": "{}".format(self.headers['Content-Type']),
-                "Content-Length": "{}".format(len(self._content)),
-#                "Cookie": "{}".format(reqhdr.get("Cookie", "sessionid=xyz789")), #dummy cooki
-        #
-        # TODO prepare the request authentication
-        #
-	# self.auth = ...
-                "Date": "{}".format(datetime.datetime.utcnow().strftime("%a, %d %b %Y %H:%M:%S GMT")),
-                "Max-Forward": "10",
-                "Pragma": "no-cache",
-                "Proxy-Authorization": "Basic dXNlcjpwYXNz",  # example base64
-                "Warning": "199 Miscellaneous warning",
-                "User-Agent": "{}".format(reqhdr.get("User-Agent", "Chrome/123.0.0.0")),
-            }
-
-        # Header text alignment
-            #
-            #  TODO: implement the header building to create formated
-            #        header from the provied headers
-            #
-        ######IMPLEMENT######################
 
-        #Tạo fmt_header từ dictionary headers
-
-        status_code = getattr(self, 'status_code', 200) or 200
-        reason = self.reason or (
-            "OK" if status_code == 200 else
-            "Unauthorized" if status_code == 401 else
-            "Not Found" if status_code == 404 else
-            "Internal Server Error"
-        )
-        status_line = f"HTTP/1.1 {status_code} {reason}\r\n"
-
-        
-        # Lặp qua dictionary headers để tạo mỗi dòng dạng Key: Value\r\n.
-        header_lines = "".join(f"{k}: {v}\r\n" for k, v in headers.items())
-        fmt_header = status_line + header_lines + "\r\n"
-        ####################################
-        #
-        # TODO prepare the request authentication
-        #
-	# self.auth = ...
-        return str(fmt_header).encode('utf-8')
-
-
-    def build_notfound(self):
+    def build_notfound(self, head_only=False):
         """
         Constructs a standard 404 Not Found HTTP response.
 
+        :params head_only (bool): leave the body out, for a ``HEAD`` request.
+
         :rtype bytes: Encoded 404 response.
         """
 
-        return (
+        header = (
                 "HTTP/1.1 404 Not Found\r\n"
                 "Accept-Ranges: bytes\r\n"
                 "Content-Type: text/html\r\n"
                 "Content-Length: 13\r\n"
                 "Cache-Control: max-age=86000\r\n"
-                "Connection: close\r\n"
+                "Connection: {}\r\n"
                 "\r\n"
-                "404 Not Found"
-            ).encode('utf-8')
+            ).format("keep-alive" if self.keep_alive else "close").encode('utf-8')
+        return header if head_only else header + b"404 Not Found"
 
 
     def build_response(self, request):
@@ -324,32 +586,75 @@ class Response():
 
         :params request (class:`Request <Request>`): incoming request object.
 
-        :rtype bytes: complete HTTP response using prepared headers and content.
+        :rtype bytes: complete HTTP response using prepared headers and content;
+                      the header only for a ``HEAD`` request.
         """
 
         path = request.path
 
-        mime_type = self.get_mime_type(path)
-        print("[Response] {} path {} mime_type {}".format(request.method, request.path, mime_type))
-
-        base_dir = ""
-
-        #If HTML, parse and serve embedded objects
-        if path.endswith('.html') or mime_type == 'text/html':
-            base_dir = self.prepare_content_type(mime_type = 'text/html')
-        elif mime_type == 'text/css':
-            base_dir = self.prepare_content_type(mime_type = 'text/css')
-        elif mime_type == 'application/javascript':
-            base_dir = self.prepare_content_type(mime_type='application/javascript')
-        elif mime_type.startswith('image/'):
-            base_dir = self.prepare_content_type(mime_type=mime_type)
-        #
-        # TODO: add support objects
-        #
-        else:
-            return self.build_notfound()
+        # Content type and directory of the extension, from the startup table
+        entry = CONTENT_TYPES.lookup(path)
+        if entry is None:
+            return self.build_notfound(request.method == 'HEAD')
+        mime_type, directory = entry
+        self.headers['Content-Type'] = mime_type
+        base_dir = BASE_DIR + directory
 
         c_len, self._content = self.build_content(path, base_dir)
+        if self.mtime is not None:
+            coding = self.prepare_encoding(request, c_len)
+            if self.not_modified(request):
+                self._content = self.prepare_not_modified()
+            elif coding:
+                self._content = ENCODED_CACHE.get(
+                    self.filepath, (c_len, self.mtime), coding, self._content)
+            else:
+                self._content = self.prepare_range(request, self._content)
         self._header = self.build_response_header(request)
 
+        if request.method == 'HEAD':
+            # A body would be read as the start of the next response
+            if self.file_body is not None:
+                self.file_body.close()
+                self.file_body = None
+            return self._header
+        return self._header + self._content
+
+
+    def build_hook_response(self, request, result):
+        """
+        Builds the response of a route handler from what it returned; see
+        :mod:`daemon.hooks` for the accepted values. Text and JSON bodies are
+        compressed when the client accepts it.
+
+        :params request (class:`Request <Request>`): incoming request object.
+        :params result: the value returned by the handler.
+
+        :rtype bytes: complete HTTP response.
+
+        :raises TypeError: If the result cannot be serialized.
+        """
+        self.status_code, headers, content_type, body = serialize(result)
+        if content_type:
+            self.headers['Content-Type'] = content_type
+        for name, value in headers.items():
+            key = name.lower()
+            if key in ('content-type', 'cache-control'):
+                self.headers[name.title()] = value
+            elif key not in ('content-length', 'connection', 'keep-alive', 'date'):
+                # Framing headers belong to the server
+                self.extra_headers[name] = value
+
+        if compressible(self.headers.get('Content-Type'), len(body)):
+            self.headers['Vary'] = 'Accept-Encoding'
+            coding = negotiate(request.headers.get('accept-encoding'))
+            if coding:
+                self.headers['Content-Encoding'] = coding
+                body = compress(body, coding)
+
+        self._content = body
+        self._header = self.build_response_header(request)
+        if request.method == 'HEAD':
+            # Same header as a GET, with the length of the body not sent
+            return self._header
         return self._header + self._content
\ No newline at end of file
@@ -0,0 +1,274 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.router
+~~~~~~~~~~~~~~~~~
+
+This module compiles the routes of a :class:`WeApRous <daemon.weaprous.WeApRous>`
+app into a :class:`Router <Router>`, a tree with one level per path segment.
+
+A route pattern is made of ``/``-separated segments:
+
+- ``users``: a static segment, matched exactly.
+- ``<name>`` or ``<str:name>``: any one segment.
+- ``<int:name>``, ``<float:name>``: one segment, converted to a number.
+- ``<path:name>`` or ``*`` (as the last segment): the rest of the path,
+  slashes included; ``*`` is captured as ``params['*']``.
+
+When several routes match a path, the most specific one wins, segment by
+segment: static, then ``int``, ``float``, ``str``, and the wildcards last.
+Looking a path up walks the tree once per segment, so its cost depends on the
+length of the path and not on the number of routes; routes without
+parameters are found with a single dict access.
+
+A path that matches routes registered for other methods only is reported with
+the methods it allows, for a ``405 Method Not Allowed``.
+
+Usage Example:
+--------------
+>>> router = compile_router({('GET', '/users/<int:id>'): get_user})
+>>> router.match('GET', '/users/42')
+RouteMatch(handler=<function get_user>, params={'id': 42}, allowed=())
+"""
+
+import re
+from collections import namedtuple
+
+#: Result of :meth:`Router.match`: the handler, None if no route matches
+#: the method, the path parameters, and the methods the path allows.
+RouteMatch = namedtuple('RouteMatch', ['handler', 'params', 'allowed'])
+
+_NUMBER = re.compile(r'-?\d+(\.\d+)?$')
+
+
+def _to_int(segment):
+    if not segment.isdigit():
+        raise ValueError(segment)
+    return int(segment)
+
+
+def _to_float(segment):
+    if not _NUMBER.match(segment):
+        raise ValueError(segment)
+    return float(segment)
+
+
+#: Converters of the one-segment parameters, in order of precedence.
+CONVERTERS = {
+    'int': _to_int,
+    'float': _to_float,
+    'str': str,
+}
+#: Name of the parameter types matching the rest of the path.
+WILDCARD = 'path'
+
+_PARAM = re.compile(r'<(?:(\w+):)?(\w+)>$')
+
+
+def split_path(path):
+    """
+    :params path (str): a request path or a route pattern, may carry a query.
+
+    :rtype list: its non-empty segments.
+    """
+    return [segment for segment in path.split('?', 1)[0].split('/') if segment]
+
+
+class RouteNode:
+    """
+    One segment of the routing tree.
+
+    :attrs static (dict): segment -> child node.
+    :attrs params (list): (converter type, parameter name, child node), in order
+                          of precedence.
+    :attrs wildcard (tuple): (parameter name, node) of a rest-of-path parameter.
+    :attrs handlers (dict): method -> handler of the routes ending here.
+    """
+
+    __attrs__ = [
+        "static",
+        "params",
+        "wildcard",
+        "handlers",
+    ]
+
+    def __init__(self):
+        self.static = {}
+        self.params = []
+        self.wildcard = None
+        self.handlers = {}
+
+    def param_child(self, kind, name):
+        for child_kind, child_name, child in self.params:
+            if (child_kind, child_name) == (kind, name):
+                return child
+        child = RouteNode()
+        self.params.append((kind, name, child))
+        order = list(CONVERTERS)
+        self.params.sort(key=lambda param: order.index(param[0]))
+        return child
+
+
+class Router:
+    """
+    Routing tree of the handlers of an app.
+
+    :attrs routes (dict): ``(METHOD, pattern)`` -> handler, as registered.
+    """
+
+    __attrs__ = [
+        "routes",
+    ]
+
+    def __init__(self, routes=None):
+        """
+        :params routes (dict): ``(METHOD, pattern)`` -> handler.
+
+        :raises ValueError: If a pattern uses an unknown parameter type or
+                            has a wildcard before its last segment.
+        """
+        self.routes = {}
+        self._root = RouteNode()
+        #: (METHOD, path) -> handler of the routes without parameters
+        self._exact = {}
+        for (method, pattern), handler in (routes or {}).items():
+            self.add(method, pattern, handler)
+
+    def add(self, method, pattern, handler):
+        """
+        Registers a handler; a later route replaces an identical earlier one.
+
+        :params method (str): HTTP method, e.g. ``GET``.
+        :params pattern (str): route pattern, e.g. ``/users/<int:id>``.
+        :params handler (function): the route handler.
+
+        :raises ValueError: If the pattern is invalid.
+        """
+        method = method.upper()
+        segments = split_path(pattern)
+        node = self._root
+        dynamic = False
+        for index, segment in enumerate(segments):
+            param = _PARAM.match(segment)
+            if segment == '*' or (param and param.group(1) == WILDCARD):
+                if index != len(segments) - 1:
+                    raise ValueError("Wildcard before the end of route {}".format(pattern))
+                name = '*' if segment == '*' else param.group(2)
+                if node.wildcard is None or node.wildcard[0] != name:
+                    node.wildcard = (name, RouteNode())
+                node = node.wildcard[1]
+                dynamic = True
+            elif param:
+                kind = param.group(1) or 'str'
+                if kind not in CONVERTERS:
+                    raise ValueError("Unknown parameter type {} in route {}".format(kind, pattern))
+                node = node.param_child(kind, param.group(2))
+                dynamic = True
+            else:
+                node = node.static.setdefault(segment, RouteNode())
+        node.handlers[method] = handler
+        self.routes[(method, pattern)] = handler
+        if not dynamic:
+            self._exact[(method, '/' + '/'.join(segments))] = handler
+
+    def match(self, method, path):
+        """
+        Finds the handler of a request.
+
+        :params method (str): HTTP method of the request.
+        :params path (str): request path, may carry a query string.
+
+        :rtype RouteMatch: the handler and its path parameters; a None handler
+                           with the allowed methods when only other methods
+                           are routed for the path, or with none if it is not
+                           routed at all.
+        """
+        segments = split_path(path)
+        handler = self._exact.get((method, '/' + '/'.join(segments)))
+        if handler is not None:
+            return RouteMatch(handler, {}, ())
+
+        params = {}
+        allowed = set()
+        node = self._walk(self._root, segments, 0, method, params, allowed)
+        if node is not None:
+            return RouteMatch(self._handler(node, method), params, ())
+        return RouteMatch(None, {}, tuple(sorted(allowed)))
+
+    def get(self, key, default=None):
+        """
+        Dict-style lookup, as routes used to be stored.
+
+        :params key (tuple): (METHOD, path).
+
+        :rtype function: the handler, or ``default``.
+        """
+        handler = self.match(*key).handler
+        return default if handler is None else handler
+
+    def _handler(self, node, method):
+        handler = node.handlers.get(method)
+        if handler is None and method == 'HEAD':
+            handler = node.handlers.get('GET')
+        return handler
+
+    def _walk(self, node, segments, index, method, params, allowed):
+        """
+        Depth-first search in order of precedence, backtracking when a branch
+        has no route for the method. ``allowed`` collects the methods of the
+        routes matching the path.
+        """
+        if index == len(segments):
+            if self._handler(node, method) is not None:
+                return node
+            allowed.update(node.handlers)
+        else:
+            segment = segments[index]
+            child = node.static.get(segment)
+            if child is not None:
+                found = self._walk(child, segments, index + 1, method, params, allowed)
+                if found is not None:
+                    return found
+            for kind, name, child in node.params:
+                try:
+                    params[name] = CONVERTERS[kind](segment)
+                except ValueError:
+                    continue
+                found = self._walk(child, segments, index + 1, method, params, allowed)
+                if found is not None:
+                    return found
+                del params[name]
+        if node.wildcard is not None and index < len(segments):
+            name, child = node.wildcard
+            if self._handler(child, method) is not None:
+                params[name] = '/'.join(segments[index:])
+                return child
+            allowed.update(child.handlers)
+        return None
+
+    def __len__(self):
+        return len(self.routes)
+
+    def __repr__(self):
+        return "<Router {}>".format(sorted(self.routes))
+
+
+def compile_router(routes):
+    """
+    :params routes (dict or Router): ``(METHOD, pattern)`` -> handler.
+
+    :rtype Router: the compiled router; a router is returned as-is.
+    """
+    if isinstance(routes, Router):
+        return routes
+    return Router(routes)
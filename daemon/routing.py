@@ -0,0 +1,284 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.routing
+~~~~~~~~~~~~~~~~~
+
+This module compiles the routes parsed from ``proxy.conf`` into a
+:class:`RoutingTable <RoutingTable>` once at startup. Every ``proxy_pass`` is
+parsed into an immutable :class:`Upstream <Upstream>` and every host block into
+a :class:`Route <Route>` carrying what its policy needs precomputed: the
+weighted round-robin schedule, the hash ring and the sticky cookie values.
+
+Nothing in the table is mutated after compilation, except the round-robin
+position of each route, an ``itertools.count`` whose ``next()`` is atomic, so
+worker threads share the table without locks.
+
+Host names are matched exactly, then against wildcard blocks such as
+``host "*.local"``, longest suffix first.
+
+Usage Example:
+--------------
+>>> table = compile_routes(parse_virtual_hosts("config/proxy.conf"))
+>>> lookup_key, route = table.lookup("app1.local", 8080)
+>>> route.upstreams[0].port
+9001
+"""
+
+import itertools
+import logging
+from collections import namedtuple
+
+from .balancer import HashRing, sticky_id
+
+logger = logging.getLogger(__name__)
+
+#: Upstream used for hosts without a route, as in the original routing.
+DEFAULT_UPSTREAM = '127.0.0.1:9000'
+#: Routing policies understood by ``dist_policy``.
+POLICIES = ('round-robin', 'random', 'least-conn', 'ewma', 'hash')
+#: Host header values whose wildcard match is remembered.
+HOST_CACHE_SIZE = 4096
+
+
+class Upstream(namedtuple('Upstream', ['host', 'port', 'key', 'weight',
+                                       'max_fails', 'backup'])):
+    """
+    One parsed ``proxy_pass`` target.
+
+    :attrs host (str): upstream IP address or name.
+    :attrs port (int): upstream port.
+    :attrs key (str): ``host:port``, the key of the health and load registries.
+    :attrs weight (int): relative share of the traffic.
+    :attrs max_fails (int): failures that eject it, None for the default.
+    :attrs backup (bool): only used while every primary upstream is ejected.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def parse(cls, spec, params=None):
+        """
+        :params spec (str): ``host:port``.
+        :params params (dict): ``weight``, ``max_fails`` and ``backup``.
+
+        :rtype Upstream: the parsed upstream.
+
+        :raises ValueError: If the port is not an integer.
+        """
+        params = params or {}
+        host, port = spec.rsplit(":", 1)
+        return cls(host, int(port), "{}:{}".format(host, int(port)),
+                   params.get('weight', 1), params.get('max_fails'),
+                   params.get('backup', False))
+
+
+def smooth_schedule(upstreams):
+    """
+    Unrolls one cycle of smooth weighted round-robin.
+
+    :params upstreams (list): :class:`Upstream` objects.
+
+    :rtype tuple: ``sum(weights)`` picks, heavier upstreams interleaved with
+                  the others, e.g. weights 5, 1, 1 give ``a a b a c a a``.
+    """
+    total = sum(u.weight for u in upstreams)
+    current = [0] * len(upstreams)
+    schedule = []
+    for _ in range(total):
+        best = 0
+        for index, upstream in enumerate(upstreams):
+            current[index] += upstream.weight
+            if current[index] > current[best]:
+                best = index
+        current[best] -= total
+        schedule.append(upstreams[best])
+    return tuple(schedule)
+
+
+class Route:
+    """
+    Compiled routing of one host block.
+
+    :attrs hostname (str): the ``host`` of the block, may be a wildcard.
+    :attrs upstreams (tuple): every :class:`Upstream`, in config order.
+    :attrs primaries (tuple): upstreams not marked ``backup``.
+    :attrs backups (tuple): upstreams marked ``backup``.
+    :attrs policy (str): the ``dist_policy``.
+    :attrs hash_key (str): key of the ``hash`` policy.
+    :attrs sticky (str): sticky cookie name, None when disabled.
+    :attrs cache (bool): responses may be served from the proxy cache.
+    :attrs ring (HashRing): hash ring of the ``hash`` policy.
+    """
+
+    __attrs__ = [
+        "hostname",
+        "upstreams",
+        "primaries",
+        "backups",
+        "policy",
+        "hash_key",
+        "sticky",
+        "cache",
+        "ring",
+    ]
+
+    def __init__(self, hostname, upstreams, policy='round-robin', options=None):
+        options = options or {}
+        self.hostname = hostname
+        self.upstreams = tuple(upstreams)
+        self.backups = tuple(u for u in self.upstreams if u.backup)
+        # A block made only of backups still has to serve
+        self.primaries = tuple(u for u in self.upstreams if not u.backup) or self.backups
+        self.policy = policy
+        self.hash_key = options.get('hash_key', '$remote_addr')
+        self.sticky = options.get('sticky')
+        self.cache = options.get('cache', False)
+        self.ring = HashRing(self.upstreams) if policy == 'hash' else None
+        self._schedules = {
+            False: smooth_schedule(self.primaries),
+            True: smooth_schedule(self.backups),
+        }
+        self._counter = itertools.count()
+        self._sticky_ids = {sticky_id(u.key): u for u in self.upstreams}
+
+    def next_round_robin(self, candidates):
+        """
+        Advances the weighted round-robin schedule to the next candidate.
+
+        :params candidates (list): the healthy upstreams, all primaries or all
+                                   backups.
+
+        :rtype Upstream: the selected upstream.
+        """
+        schedule = self._schedules[candidates[0].backup]
+        allowed = set(candidates)
+        start = next(self._counter)
+        for step in range(len(schedule)):
+            upstream = schedule[(start + step) % len(schedule)]
+            if upstream in allowed:
+                return upstream
+        return candidates[0]
+
+    def sticky_upstream(self, value):
+        """
+        :params value (str): sticky cookie sent by the client, may be None.
+
+        :rtype Upstream: the upstream it names, None if unknown.
+        """
+        return self._sticky_ids.get(value) if value else None
+
+
+class RoutingTable:
+    """
+    Immutable host name to :class:`Route` table.
+
+    :attrs routes (dict): exact host name -> Route.
+    :attrs default (Route): route of the host names matching no block.
+    """
+
+    __attrs__ = [
+        "routes",
+        "default",
+    ]
+
+    def __init__(self, routes, default=DEFAULT_UPSTREAM):
+        """
+        :params routes (dict): hostname -> ``(proxy_pass, dist_policy, params,
+                               options)`` as built by ``parse_virtual_hosts``.
+        :params default (str): ``host:port`` of unmatched host names.
+        """
+        self.default = Route('', [Upstream.parse(default)])
+        self.routes = {}
+        #: (suffix, Route) of the wildcard blocks, longest suffix first
+        self._wildcards = []
+        self._cache = {}
+        for hostname, (proxy_map, policy, params, options) in routes.items():
+            route = self._compile(hostname, proxy_map, policy, params, options)
+            if hostname.startswith('*'):
+                self._wildcards.append((hostname[1:], route))
+            else:
+                self.routes[hostname] = route
+        self._wildcards.sort(key=lambda item: len(item[0]), reverse=True)
+
+    def _compile(self, hostname, proxy_map, policy, params, options):
+        specs = proxy_map if isinstance(proxy_map, list) else [proxy_map]
+        if not specs:
+            logger.warning("[Proxy] Empty routing of hostname %s, using default host", hostname)
+            return self.default
+        upstreams = [Upstream.parse(spec, params.get(spec)) for spec in specs]
+        if len(upstreams) >= 2 and policy not in POLICIES:
+            logger.warning("[Proxy] Unknown policy %s of hostname %s, using default host",
+                           policy, hostname)
+            return self.default
+        return Route(hostname, upstreams, policy, options)
+
+    def upstreams(self):
+        """
+        :rtype list: every distinct :class:`Upstream` of the table.
+        """
+        seen = []
+        for route in list(self.routes.values()) + [r for s, r in self._wildcards]:
+            for upstream in route.upstreams:
+                if upstream not in seen:
+                    seen.append(upstream)
+        return seen
+
+    def lookup(self, host_header, listen_port):
+        """
+        Matches a Host header against the table.
+
+        The priority is: the exact header, the host name with the listen port,
+        the host name without port, then the wildcard blocks.
+
+        :params host_header (str): Host header of the request, may be None.
+        :params listen_port (int): port the proxy listens on.
+
+        :rtype tuple: (lookup_key, Route); the default route when nothing matches.
+        """
+        routes = self.routes
+        if host_header in routes:
+            return host_header, routes[host_header]
+        hit = self._cache.get(host_header)
+        if hit is not None:
+            return hit
+
+        hostname = host_header.split(':', 1)[0].strip() if host_header else None
+        with_listen = "{}:{}".format(hostname, listen_port) if hostname else None
+        if with_listen in routes:
+            hit = with_listen, routes[with_listen]
+        elif hostname in routes:
+            hit = hostname, routes[hostname]
+        else:
+            hit = hostname, self.default
+            for suffix, route in self._wildcards:
+                if (host_header or '').endswith(suffix) or (hostname or '').endswith(suffix):
+                    hit = hostname, route
+                    break
+
+        # Bounded: unknown Host headers must not grow the cache forever
+        if len(self._cache) >= HOST_CACHE_SIZE:
+            self._cache.clear()
+        self._cache[host_header] = hit
+        return hit
+
+
+def compile_routes(routes):
+    """
+    :params routes (dict or RoutingTable): routes from ``parse_virtual_hosts``.
+
+    :rtype RoutingTable: the compiled table; a table is returned as-is.
+    """
+    if isinstance(routes, RoutingTable):
+        return routes
+    return RoutingTable(routes)
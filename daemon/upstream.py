@@ -0,0 +1,420 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.upstream
+~~~~~~~~~~~~~~~~~
+
+This module keeps persistent keep-alive connections from the proxy to its
+backends. An :class:`UpstreamPool <UpstreamPool>` holds, per ``(host, port)``,
+the idle connections ready for reuse and bounds how many connections may be
+open at once. Responses are framed by ``Content-Length`` or chunked encoding,
+so a connection is handed back to the pool as soon as its response is read.
+
+Response bodies are streamed to the client chunk by chunk through the
+connection's reusable receive buffer, so the proxy never holds a whole body
+in memory and the client starts receiving before the upstream has finished.
+
+Every upstream response is counted by status, with the time its head took to
+arrive; failures are counted by kind: ``connect``, ``response`` (no valid
+response head) and ``aborted`` (cut while relaying the body).
+
+Usage Example:
+--------------
+>>> keep_alive = UPSTREAM_POOL.relay("10.0.0.2", 9000, request, client_conn)
+"""
+
+import logging
+import socket
+import sys
+import threading
+import time
+
+from .httpreader import HttpReader, HttpError, set_headers
+from .balancer import STATS
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+#: Idle connections kept per upstream.
+POOL_MAX_IDLE = 8
+#: Open connections (idle and busy) allowed per upstream.
+POOL_MAX_PER_HOST = 64
+#: Seconds after which an idle connection is closed instead of reused.
+POOL_IDLE_EXPIRY = 30.0
+#: Seconds allowed to connect to an upstream.
+CONNECT_TIMEOUT = 5.0
+#: Seconds allowed between two reads of an upstream response.
+READ_TIMEOUT = 30.0
+#: Methods safe to send again when a pooled connection fails before answering.
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'PUT', 'DELETE', 'OPTIONS')
+
+#: Upstream responses, by upstream and status code.
+UPSTREAM_RESPONSES = REGISTRY.counter('weaprous_upstream_responses_total',
+                                      'Upstream responses, by upstream and status code.',
+                                      ('upstream', 'status'))
+#: Seconds from sending a request upstream to receiving its response head.
+UPSTREAM_LATENCY = REGISTRY.histogram('weaprous_upstream_response_seconds',
+                                      'Time until the upstream response head arrived.',
+                                      ('upstream',))
+#: Failed upstream exchanges, by upstream and kind of failure.
+UPSTREAM_ERRORS = REGISTRY.counter('weaprous_upstream_errors_total',
+                                   'Failed upstream exchanges, by upstream and kind.',
+                                   ('upstream', 'error'))
+REGISTRY.function('weaprous_upstream_inflight', 'Requests sent upstream and not yet completed.',
+                  lambda: [((upstream,), inflight) for upstream, inflight, ewma in STATS.snapshot()],
+                  ('upstream',))
+
+
+def record_response(upstream, head, latency):
+    """
+    Counts an upstream response by status and records its latency.
+
+    :params upstream (str): ``host:port`` of the upstream.
+    :params head (bytes): response header block, starting with the status line.
+    :params latency (float): seconds until the head arrived.
+    """
+    status = head.split(b" ", 2)[1:2]
+    UPSTREAM_RESPONSES.inc((upstream, status[0].decode('latin-1') if status else ''))
+    UPSTREAM_LATENCY.observe(latency, (upstream,))
+
+
+class UpstreamConnectError(OSError):
+    """
+    Raised when no connection to the upstream could be established, so the
+    request was never sent and may safely be tried on another upstream.
+    """
+
+
+class PooledConnection:
+    """
+    One connection to an upstream, with the reader framing its responses.
+
+    :attrs sock (socket.socket): the upstream socket.
+    :attrs reader (HttpReader): response reader bound to the socket.
+    :attrs released (float): monotonic time the connection became idle.
+    """
+
+    __attrs__ = [
+        "sock",
+        "reader",
+        "released",
+    ]
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.reader = HttpReader(sock, max_body_size=sys.maxsize, response=True)
+        self.released = 0.0
+
+    def close(self):
+        try:
+            self.sock.close()
+        except socket.error:
+            pass
+
+
+class UpstreamPool:
+    """
+    Per-upstream pool of persistent connections.
+
+    :attrs max_idle (int): idle connections kept per upstream.
+    :attrs max_per_host (int): open connections allowed per upstream.
+    :attrs idle_expiry (float): seconds an idle connection stays reusable.
+    """
+
+    __attrs__ = [
+        "max_idle",
+        "max_per_host",
+        "idle_expiry",
+    ]
+
+    def __init__(self, max_idle=POOL_MAX_IDLE, max_per_host=POOL_MAX_PER_HOST,
+                 idle_expiry=POOL_IDLE_EXPIRY):
+        self.max_idle = max_idle
+        self.max_per_host = max_per_host
+        self.idle_expiry = idle_expiry
+        #: (host, port) -> list of idle PooledConnection, most recent last
+        self._idle = {}
+        #: (host, port) -> number of open connections
+        self._open = {}
+        self._cond = threading.Condition()
+
+    def acquire(self, host, port):
+        """
+        Returns an idle connection to the upstream, or opens a new one.
+
+        Waits while the upstream already has ``max_per_host`` connections open.
+
+        :params host (str): upstream IP address.
+        :params port (int): upstream port.
+
+        :rtype tuple: (PooledConnection, bool) the connection and whether it
+                      was reused from the pool.
+
+        :raises socket.error: If no connection can be established.
+        """
+        key = (host, port)
+        now = time.monotonic()
+        with self._cond:
+            idle = self._idle.get(key)
+            while idle:
+                conn = idle.pop()
+                if now - conn.released < self.idle_expiry:
+                    return conn, True
+                self._forget(key, conn)
+            if not self._cond.wait_for(
+                    lambda: self._open.get(key, 0) < self.max_per_host, CONNECT_TIMEOUT):
+                raise socket.timeout("upstream {}:{} has no free connection".format(host, port))
+            self._open[key] = self._open.get(key, 0) + 1
+
+        try:
+            sock = socket.create_connection(key, timeout=CONNECT_TIMEOUT)
+            sock.settimeout(READ_TIMEOUT)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        except socket.error:
+            with self._cond:
+                self._open[key] -= 1
+                self._cond.notify()
+            raise
+        return PooledConnection(sock), False
+
+    def release(self, host, port, conn, reusable=True):
+        """
+        Hands a connection back after its response was fully read.
+
+        :params host (str): upstream IP address.
+        :params port (int): upstream port.
+        :params conn (PooledConnection): the connection.
+        :params reusable (bool): False closes the connection instead of pooling it.
+        """
+        key = (host, port)
+        with self._cond:
+            idle = self._idle.setdefault(key, [])
+            if reusable and not conn.reader.parser.buffer and len(idle) < self.max_idle:
+                conn.released = time.monotonic()
+                idle.append(conn)
+            else:
+                self._forget(key, conn)
+            self._cond.notify()
+
+    def _forget(self, key, conn):
+        """Closes a connection and drops it from the open count (lock held)."""
+        conn.close()
+        self._open[key] -= 1
+
+    def relay(self, host, port, request, client, method='GET', keep_alive=True,
+              append=(), capture=None):
+        """
+        Sends a request upstream over a pooled connection and streams its
+        response to the client as it arrives.
+
+        The body is relayed through the reusable receive buffer of the upstream
+        connection, so memory per connection stays bounded whatever the body
+        size. A reused connection may have been closed by the backend while
+        idle; when it fails before any response byte arrives, a request with
+        an idempotent method is retried on the next pooled connection and
+        finally on a fresh one. Other requests may have been processed, so
+        they are never sent twice.
+
+        :params host (str): upstream IP address.
+        :params port (int): upstream port.
+        :params request (bytes): the complete request message.
+        :params client (socket.socket): the client connection to stream to.
+        :params method (str): request method, ``HEAD`` responses carry no body.
+        :params keep_alive (bool): whether the client connection may stay open.
+        :params append (iterable): (name, value) headers added to the response.
+        :params capture (CacheCapture): collects the response for the proxy
+                                        cache, None when it is not cacheable.
+
+        :rtype bool: whether the client connection may stay open afterwards.
+
+        :raises UpstreamConnectError: If the upstream cannot be reached; the
+                                      request was not sent.
+        :raises socket.error: If the upstream fails before answering; nothing
+                              has been sent to the client yet.
+        :raises HttpError: If the upstream response head is malformed.
+        """
+        while True:
+            try:
+                conn, reused = self.acquire(host, port)
+            except socket.error as e:
+                raise UpstreamConnectError(str(e)) from e
+            reader = conn.reader
+            reader.parser.request_method = method
+            retry = reused and method in IDEMPOTENT_METHODS
+            started = time.monotonic()
+            try:
+                conn.sock.sendall(request)
+                framing = reader.read_head()
+            except (socket.error, HttpError) as e:
+                # A timeout means the backend got the request: never replay it
+                stale = retry and not reader.parser.buffer and not isinstance(e, socket.timeout)
+                self.release(host, port, conn, reusable=False)
+                if stale:
+                    continue
+                raise
+            if framing is None:
+                # Closed before answering: stale if it was a pooled connection
+                self.release(host, port, conn, reusable=False)
+                if retry:
+                    continue
+                raise HttpError(502, "Bad Gateway")
+            break
+
+        head, length, chunked = framing
+        latency = time.monotonic() - started
+        STATS.observe("{}:{}".format(host, port), latency)
+        record_response("{}:{}".format(host, port), head, latency)
+        if capture is not None and not capture.start(head):
+            capture = None
+        upstream_alive = keeps_alive(head)
+        if length is None and not chunked:
+            # The body ends with the upstream connection; so must the client's
+            keep_alive = upstream_alive = False
+        head = set_headers(head, {
+            "Connection": "keep-alive" if keep_alive else "close",
+            "Keep-Alive": None,
+        }, append)
+
+        try:
+            client.sendall(head)
+            relay_body(reader, client, length, chunked, capture)
+        except (socket.error, HttpError) as e:
+            # Headers already went out: the client can only see a cut response
+            logger.warning("[Upstream] relay from %s:%s aborted: %s", host, port, e)
+            UPSTREAM_ERRORS.inc(("{}:{}".format(host, port), 'aborted'))
+            self.release(host, port, conn, reusable=False)
+            return False
+        self.release(host, port, conn, reusable=upstream_alive and not reader.eof)
+        if capture is not None:
+            capture.finish()
+        return keep_alive
+
+
+class ChunkTracker:
+    """
+    Follows the framing of a chunked body relayed as-is, to find where it ends.
+
+    :attrs done (bool): the last chunk and trailers were seen.
+    """
+
+    __attrs__ = [
+        "done",
+    ]
+
+    #: Longest accepted chunk-size or trailer line.
+    MAX_LINE = 4096
+
+    def __init__(self):
+        self.done = False
+        self._line = bytearray()
+        self._remaining = 0
+        self._trailers = False
+
+    def feed(self, data):
+        """
+        Consumes relayed bytes up to the end of the body.
+
+        :params data (memoryview): bytes received from the upstream.
+
+        :rtype int: number of bytes belonging to the body.
+
+        :raises HttpError: If the chunk framing is malformed.
+        """
+        pos = 0
+        end = len(data)
+        while pos < end and not self.done:
+            if self._remaining:
+                take = min(self._remaining, end - pos)
+                self._remaining -= take
+                pos += take
+                continue
+            newline = bytes(data[pos:min(end, pos + self.MAX_LINE)]).find(b"\n")
+            if newline < 0:
+                self._line += data[pos:end]
+                if len(self._line) > self.MAX_LINE:
+                    raise HttpError(502, "Bad Gateway")
+                return end
+            self._line += data[pos:pos + newline]
+            pos += newline + 1
+            line = bytes(self._line).strip()
+            self._line.clear()
+            if self._trailers:
+                self.done = not line
+                continue
+            try:
+                size = int(line.split(b";", 1)[0], 16)
+            except ValueError:
+                raise HttpError(502, "Bad Gateway")
+            if size == 0:
+                self._trailers = True
+            else:
+                # Chunk data followed by its CRLF
+                self._remaining = size + 2
+        return pos
+
+
+def relay_body(reader, client, length, chunked, capture=None):
+    """
+    Streams a response body from an upstream reader to the client.
+
+    :params reader (HttpReader): reader of the upstream connection, positioned
+                                 after the response head.
+    :params client (socket.socket): the client connection.
+    :params length (int): body length, None if framed by the end of the connection.
+    :params chunked (bool): the body uses chunked encoding and is relayed as-is.
+    :params capture (CacheCapture): also receives the relayed body, may be None.
+
+    :raises HttpError: If the upstream closes before the end of the body.
+    """
+    tracker = ChunkTracker() if chunked else None
+    remaining = length
+    if not chunked and remaining == 0:
+        return
+    while True:
+        data = reader.read_some()
+        if not data:
+            if remaining is None and not chunked:
+                return
+            raise HttpError(502, "Bad Gateway")
+        if chunked:
+            used = tracker.feed(data)
+        elif remaining is None:
+            used = len(data)
+        else:
+            used = min(remaining, len(data))
+            remaining -= used
+        client.sendall(data[:used])
+        if capture is not None:
+            capture.write(data[:used])
+        if (chunked and tracker.done) or remaining == 0:
+            reader.unread(data[used:])
+            return
+
+
+def keeps_alive(response):
+    """
+    Tells whether the upstream keeps the connection open after a response.
+
+    :params response (bytes): the response, or at least its header block.
+
+    :rtype bool: False if the response asked to close the connection.
+    """
+    head = response[:response.find(b"\r\n\r\n")].lower()
+    for line in head.split(b"\r\n")[1:]:
+        if line.startswith(b"connection:"):
+            return b"close" not in line
+    return not head.startswith(b"http/1.0")
+
+
+#: Pool shared by every proxy worker thread.
+UPSTREAM_POOL = UpstreamPool()
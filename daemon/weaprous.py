@@ -17,8 +17,11 @@ deamon.weaproute
 This module provides a WeApRous object to deploy RESTful url web app with routing
 """
 
+import logging
 from .backend import create_backend
 
+logger = logging.getLogger(__name__)
+
 class WeApRous:
     """The fully mutable :class:`WeApRous <WeApRous>` object, which is a lightweight,
     mutable web application router for deploying RESTful URL endpoints.
@@ -68,7 +71,9 @@ class WeApRous:
         """
         Decorator to register a route handler for a specific path and HTTP methods.
 
-        :param path (str): The URL path to route.
+        :param path (str): The URL path to route; it may hold typed parameters
+                           and wildcards such as ``/users/<int:id>``, see
+                           :mod:`daemon.router`.
         :param methods (list): A list of HTTP methods (e.g., ['GET', 'POST']) to bind.
 
         :rtype: function - A decorator that registers the handler function.
@@ -84,18 +89,19 @@ class WeApRous:
             return func
         return decorator
 
-    def run(self):
+    def run(self, workers=1):
         """
         Start the backend server and begin handling requests.
 
         This method launches the TCP server using the configured IP and port,
         and dispatches incoming requests to the registered route handlers.
 
+        :param workers (int): Number of worker processes sharing the port.
+
         :raise: Error if IP or port has not been configured.
         """
         if not self.ip or not self.port:
-            print("Rous app need to preapre address"
-                  "by calling app.prepare_address(ip,port)")
+            logger.error("Rous app need to preapre address by calling app.prepare_address(ip,port)")
 
-        create_backend(self.ip, self.port, self.routes)
+        create_backend(self.ip, self.port, self.routes, workers=workers)
         
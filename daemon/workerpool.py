@@ -0,0 +1,158 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+daemon.workerpool
+~~~~~~~~~~~~~~~~~
+
+This module provides a fixed-size pool of worker threads fed by a bounded
+queue of accepted connections. When the queue is full the accept loop answers
+``503 Service Unavailable`` right away instead of creating more threads, so a
+traffic spike degrades service rather than exhausting memory.
+
+The size, queue depth and counters of every pool are exported as metrics,
+labelled with the pool name.
+
+Usage Example:
+--------------
+>>> pool = WorkerPool(handle_client, size=32, queue_depth=128)
+>>> if not pool.submit(conn, ip, port, conn, addr, routes):
+...     pass  # conn was answered with 503 and closed
+"""
+
+import logging
+import queue
+import socket
+import threading
+import weakref
+
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+#: Default number of worker threads.
+POOL_SIZE = 64
+#: Default number of accepted connections waiting for a worker.
+QUEUE_DEPTH = 256
+
+#: Reply sent to connections rejected because the queue is full.
+SERVICE_UNAVAILABLE = (
+    "HTTP/1.1 503 Service Unavailable\r\n"
+    "Content-Type: text/plain\r\n"
+    "Content-Length: 23\r\n"
+    "Retry-After: 1\r\n"
+    "Connection: close\r\n"
+    "\r\n"
+    "503 Service Unavailable"
+).encode('utf-8')
+
+
+class WorkerPool:
+    """
+    A fixed set of daemon threads running ``handler`` for queued jobs.
+
+    :attrs name (str): prefix of the worker thread names.
+    :attrs size (int): number of worker threads.
+    :attrs accepted (int): connections queued since start.
+    :attrs rejected (int): connections answered with 503 since start.
+    """
+
+    __attrs__ = [
+        "name",
+        "size",
+        "accepted",
+        "rejected",
+    ]
+
+    def __init__(self, handler, size=POOL_SIZE, queue_depth=QUEUE_DEPTH, name="worker"):
+        """
+        Starts the worker threads.
+
+        :param handler (callable): function called with the submitted arguments.
+        :param size (int): number of worker threads.
+        :param queue_depth (int): capacity of the pending queue.
+        :param name (str): prefix of the worker thread names.
+        """
+        self.handler = handler
+        self.name = name
+        self.size = size
+        self.accepted = 0
+        self.rejected = 0
+        self._queue = queue.Queue(maxsize=queue_depth)
+        for i in range(size):
+            worker = threading.Thread(target=self._run, name="{}-{}".format(name, i))
+            worker.daemon = True
+            worker.start()
+        POOLS.add(self)
+
+    @property
+    def queue_depth(self):
+        """Number of connections waiting for a free worker."""
+        return self._queue.qsize()
+
+    def submit(self, conn, *args):
+        """
+        Queues a connection for the next free worker.
+
+        Called from the accept loop only, so the counters need no lock.
+
+        :param conn (socket.socket): the accepted connection.
+        :param args: arguments passed to ``handler``.
+
+        :rtype bool: False if the queue was full and ``conn`` was rejected.
+        """
+        try:
+            self._queue.put_nowait(args)
+        except queue.Full:
+            self.rejected += 1
+            reject(conn)
+            return False
+        self.accepted += 1
+        return True
+
+    def _run(self):
+        while True:
+            args = self._queue.get()
+            try:
+                self.handler(*args)
+            except Exception as e:
+                logger.exception("[WorkerPool] Unhandled error: %s", e)
+
+
+#: Pools of the process, read when the metrics are scraped.
+POOLS = weakref.WeakSet()
+
+REGISTRY.function('weaprous_pool_threads', 'Worker threads of a pool.',
+                  lambda: [((pool.name,), pool.size) for pool in list(POOLS)], ('pool',))
+REGISTRY.function('weaprous_pool_queued', 'Connections waiting for a free worker.',
+                  lambda: [((pool.name,), pool.queue_depth) for pool in list(POOLS)], ('pool',))
+REGISTRY.function('weaprous_pool_accepted_total', 'Connections queued for a worker.',
+                  lambda: [((pool.name,), pool.accepted) for pool in list(POOLS)], ('pool',),
+                  kind='counter')
+REGISTRY.function('weaprous_pool_rejected_total', 'Connections answered with 503.',
+                  lambda: [((pool.name,), pool.rejected) for pool in list(POOLS)], ('pool',),
+                  kind='counter')
+
+
+def reject(conn):
+    """
+    Answers a connection with 503 without blocking the accept loop.
+
+    :param conn (socket.socket): the rejected connection.
+    """
+    try:
+        conn.setblocking(False)
+        conn.send(SERVICE_UNAVAILABLE)
+    except socket.error:
+        pass
+    finally:
+        conn.close()
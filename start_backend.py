@@ -26,10 +26,30 @@ import socket
 import argparse
 
 from daemon import create_backend
+from daemon.backend import BACKEND_MODES
+from daemon.workerpool import POOL_SIZE, QUEUE_DEPTH
+from daemon.httpadapter import KEEPALIVE_TIMEOUT, KEEPALIVE_MAX_REQUESTS
+from daemon.response import CACHE_MAX_AGE
+from daemon.contenttypes import MIME_CONFIG
+from daemon.log import LOG_LEVELS, configure_logging
+from daemon.metrics import REGISTRY, METRICS_PATH
 
 # Default port number used if none is specified via command-line arguments.
 PORT = 9000 
 
+
+def parse_max_age(value):
+    """
+    :params value (str): ``DIRECTORY=SECONDS``, e.g. ``static/images=86400``.
+
+    :rtype tuple: (directory, seconds).
+    """
+    directory, sep, seconds = value.rpartition('=')
+    if not sep or not directory or not seconds.isdigit():
+        raise argparse.ArgumentTypeError(
+            "expected DIRECTORY=SECONDS, got {!r}".format(value))
+    return directory, int(seconds)
+
 if __name__ == "__main__":
     """
     Entry point for launching the backend server.
@@ -40,6 +60,19 @@ if __name__ == "__main__":
 
     :arg --server-ip (str): IP address to bind the server (default: 127.0.0.1).
     :arg --server-port (int): Port number to bind the server (default: 9000).
+    :arg --keepalive-timeout (float): Idle timeout of persistent connections.
+    :arg --max-requests (int): Requests served per persistent connection.
+    :arg --mode (str): Serving mode, ``thread`` or ``event`` (default: thread).
+    :arg --pool-size (int): Worker threads of the thread mode.
+    :arg --queue-depth (int): Connections waiting for a worker before 503.
+    :arg --workers (int): Worker processes sharing the port (default: 1).
+    :arg --cache-max-age (str): ``DIRECTORY=SECONDS`` browser caching of the
+                                static files of a directory, repeatable.
+    :arg --mime-config (str): Content types and directories of the static files
+                              (default: config/mime.conf when present).
+    :arg --log-level (str): Lowest level logged (default: info).
+    :arg --metrics-path (str): Path serving the Prometheus metrics, empty to
+                               disable (default: /metrics).
     """
 
     parser = argparse.ArgumentParser(
@@ -58,9 +91,84 @@ if __name__ == "__main__":
         default=PORT,
         help='Port number to bind the server. Default is {}.'.format(PORT)
     )
+    parser.add_argument(
+        '--keepalive-timeout',
+        type=float,
+        default=KEEPALIVE_TIMEOUT,
+        help='Idle timeout of persistent connections in seconds. Default is {}.'.format(KEEPALIVE_TIMEOUT)
+    )
+    parser.add_argument(
+        '--max-requests',
+        type=int,
+        default=KEEPALIVE_MAX_REQUESTS,
+        help='Requests served per persistent connection. Default is {}.'.format(KEEPALIVE_MAX_REQUESTS)
+    )
+    parser.add_argument(
+        '--mode',
+        choices=BACKEND_MODES,
+        default='thread',
+        help='Serving mode: a pool of worker threads or a selectors event loop. Default is thread.'
+    )
+    parser.add_argument(
+        '--pool-size',
+        type=int,
+        default=POOL_SIZE,
+        help='Worker threads of the thread mode. Default is {}.'.format(POOL_SIZE)
+    )
+    parser.add_argument(
+        '--queue-depth',
+        type=int,
+        default=QUEUE_DEPTH,
+        help='Connections waiting for a worker before answering 503. Default is {}.'.format(QUEUE_DEPTH)
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Worker processes sharing the port with SO_REUSEPORT. Default is 1.'
+    )
+    parser.add_argument(
+        '--cache-max-age',
+        type=parse_max_age,
+        action='append',
+        default=[],
+        metavar='DIRECTORY=SECONDS',
+        help='Cache-Control max-age of the static files of a directory, '
+             '0 to always revalidate. Repeatable. Defaults: {}.'.format(
+                 ', '.join('{}={}'.format(d, s) for d, s in CACHE_MAX_AGE.items()))
+    )
+    parser.add_argument(
+        '--mime-config',
+        type=str,
+        default=None,
+        help='Content types and directories of the static files. '
+             'Default is {} when present.'.format(MIME_CONFIG)
+    )
+    parser.add_argument(
+        '--log-level',
+        choices=LOG_LEVELS,
+        default='info',
+        help='Lowest level logged; debug traces every request. Default is info.'
+    )
+    parser.add_argument(
+        '--metrics-path',
+        default=METRICS_PATH,
+        help='Path serving the metrics in Prometheus text format, empty to disable. '
+             'Default is {}.'.format(METRICS_PATH)
+    )
  
     args = parser.parse_args()
     ip = args.server_ip
     port = args.server_port
+    configure_logging(args.log_level)
+    REGISTRY.path = args.metrics_path or None
+    CACHE_MAX_AGE.update(args.cache_max_age)
 
-    create_backend(ip, port)
+    create_backend(ip, port,
+                   keepalive_timeout=args.keepalive_timeout,
+                   max_requests=args.max_requests,
+                   mode=args.mode,
+                   pool_size=args.pool_size,
+                   queue_depth=args.queue_depth,
+                   workers=args.workers,
+                   mime_config=args.mime_config)
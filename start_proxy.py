@@ -35,6 +35,7 @@ Requirements:
 
 """
 
+import logging
 import socket
 import threading
 import argparse
@@ -43,16 +44,59 @@ from urllib.parse import urlparse
 from collections import defaultdict
 
 from daemon import create_proxy
+from daemon.proxy import PROXY_ENGINES
+from daemon.health import HEALTH_CHECK_INTERVAL
+from daemon.workerpool import POOL_SIZE, QUEUE_DEPTH
+from daemon.log import LOG_LEVELS, configure_logging
+from daemon.metrics import REGISTRY, METRICS_PATH
 
 PROXY_PORT = 8080
 
+logger = logging.getLogger('daemon.proxy')
+
+
+def parse_upstream_params(options):
+    """
+    Parses the parameters following the URL of a ``proxy_pass``.
+
+    :options (str): e.g. ``" weight=3 max_fails=2 backup"``.
+    :rtype dict: ``weight`` (int), ``max_fails`` (int or None) and ``backup`` (bool).
+    """
+
+    params = {'weight': 1, 'max_fails': None, 'backup': False}
+    for option in options.split():
+        name, _, value = option.partition('=')
+        if name in ('weight', 'max_fails') and value.isdigit():
+            params[name] = int(value)
+        elif name == 'backup' and not value:
+            params['backup'] = True
+        else:
+            logger.warning("[Proxy] Ignoring unknown proxy_pass parameter %s", option)
+    # A zero weight would never be picked
+    params['weight'] = max(params['weight'], 1)
+    return params
+
 
 def parse_virtual_hosts(config_file):
     """
     Parses virtual host blocks from a config file.
 
+    A ``proxy_pass`` may carry parameters after its URL:
+
+    - ``weight=N``: relative share of the traffic (default 1).
+    - ``max_fails=N``: consecutive failures that eject the upstream.
+    - ``backup``: only used while every other upstream is ejected.
+
+    A host block may also set ``hash_key`` (``$remote_addr``, ``$http_<name>``
+    or ``$cookie_<name>``) for ``dist_policy hash``, and ``sticky cookie <name>``
+    to pin clients to the upstream that served them first. ``proxy_cache on``
+    serves cacheable responses of the host from the proxy memory.
+
     :config_file (str): Path to the NGINX config file.
-    :rtype list of dict: Each dict contains 'listen'and 'server_name'.
+    :rtype dict: hostname -> ``(proxy_pass, dist_policy, params, options)``
+                 where ``params`` maps an upstream ``host:port`` to its
+                 parameters and ``options`` holds ``hash_key``, ``sticky``
+                 and ``cache``.
     """
 
     with open(config_file, 'r') as f:
@@ -67,18 +111,34 @@ def parse_virtual_hosts(config_file):
     for host, block in host_blocks:
         proxy_map = {}
 
-        # Find all proxy_pass entries
-        proxy_passes = re.findall(r'proxy_pass\s+http://([^\s;]+);', block)
+        # Find all proxy_pass entries and their parameters
+        proxy_passes = []
+        params = {}
+        for upstream, options in re.findall(r'proxy_pass\s+http://([^\s;]+)([^;]*);', block):
+            proxy_passes.append(upstream)
+            params[upstream] = parse_upstream_params(options)
         map = proxy_map.get(host,[])
         map = map + proxy_passes
         proxy_map[host] = map
 
         # Find dist_policy if present
-        policy_match = re.search(r'dist_policy\s+(\w+)', block)
+        policy_match = re.search(r'dist_policy\s+([\w-]+)', block)
         if policy_match:
             dist_policy_map = policy_match.group(1)
         else: #default policy is round_robin
             dist_policy_map = 'round-robin'
+
+        # Host level options of the hash and sticky policies
+        options = {}
+        hash_match = re.search(r'hash_key\s+(\$[\w-]+)\s*;', block)
+        if hash_match:
+            options['hash_key'] = hash_match.group(1)
+        sticky_match = re.search(r'sticky\s+cookie\s+([\w-]+)\s*;', block)
+        if sticky_match:
+            options['sticky'] = sticky_match.group(1)
+        cache_match = re.search(r'proxy_cache\s+(on|off)\s*;', block)
+        if cache_match:
+            options['cache'] = cache_match.group(1) == 'on'
             
         #
         # @bksysnet: Build the mapping and policy
@@ -89,15 +149,15 @@ def parse_virtual_hosts(config_file):
         #       proxy_pass
         #
         if len(proxy_map.get(host,[])) == 1:
-            routes[host] = (proxy_map.get(host,[])[0], dist_policy_map)
+            routes[host] = (proxy_map.get(host,[])[0], dist_policy_map, params, options)
         # esle if:
         #         TODO:  apply further policy matching here
         #
         else:
-            routes[host] = (proxy_map.get(host,[]), dist_policy_map)
+            routes[host] = (proxy_map.get(host,[]), dist_policy_map, params, options)
 
     for key, value in routes.items():
-        print((key, value))
+        logger.info("[Proxy] route %s -> %s", key, value)
     return routes
 
 
@@ -111,16 +171,47 @@ if __name__ == "__main__":
 
     :arg --server-ip (str): IP address to bind the server (default: 127.0.0.1).
     :arg --server-port (int): Port number to bind the server (default: 9000).
+    :arg --log-level (str): Lowest level logged (default: info).
+    :arg --metrics-path (str): Path serving the Prometheus metrics, empty to
+                               disable (default: /metrics).
     """
 
     parser = argparse.ArgumentParser(prog='Proxy', description='', epilog='Proxy daemon')
     parser.add_argument('--server-ip', default='0.0.0.0')
     parser.add_argument('--server-port', type=int, default=PROXY_PORT)
+    parser.add_argument('--pool-size', type=int, default=POOL_SIZE,
+                        help='Worker threads. Default is {}.'.format(POOL_SIZE))
+    parser.add_argument('--queue-depth', type=int, default=QUEUE_DEPTH,
+                        help='Connections waiting for a worker before answering 503. '
+                             'Default is {}.'.format(QUEUE_DEPTH))
+    parser.add_argument('--engine', choices=PROXY_ENGINES, default='thread',
+                        help='Proxy engine: a pool of worker threads or an asyncio event loop. '
+                             'Default is thread.')
+    parser.add_argument('--health-interval', type=float, default=HEALTH_CHECK_INTERVAL,
+                        help='Seconds between active health probes of the backends, 0 disables them. '
+                             'Default is {}.'.format(HEALTH_CHECK_INTERVAL))
+    parser.add_argument('--health-path', default=None,
+                        help='Path probed with GET; by default probes only open a TCP connection.')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Worker processes sharing the port with SO_REUSEPORT. Default is 1.')
+    parser.add_argument('--log-level', choices=LOG_LEVELS, default='info',
+                        help='Lowest level logged; debug traces every request. Default is info.')
+    parser.add_argument('--metrics-path', default=METRICS_PATH,
+                        help='Path serving the metrics in Prometheus text format, empty to disable. '
+                             'Default is {}.'.format(METRICS_PATH))
  
     args = parser.parse_args()
     ip = args.server_ip
     port = args.server_port
+    configure_logging(args.log_level)
+    REGISTRY.path = args.metrics_path or None
 
     routes = parse_virtual_hosts("config/proxy.conf")
 
-    create_proxy(ip, port, routes)
+    create_proxy(ip, port, routes,
+                 pool_size=args.pool_size,
+                 queue_depth=args.queue_depth,
+                 workers=args.workers,
+                 engine=args.engine,
+                 health_interval=args.health_interval,
+                 health_path=args.health_path)
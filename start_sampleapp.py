@@ -29,6 +29,8 @@ import socket
 import argparse
 
 from daemon.weaprous import WeApRous
+from daemon.log import LOG_LEVELS, configure_logging
+from daemon.metrics import REGISTRY, METRICS_PATH
 
 PORT = 8000  # Default port
 
@@ -65,11 +67,20 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(prog='Backend', description='', epilog='Beckend daemon')
     parser.add_argument('--server-ip', default='0.0.0.0')
     parser.add_argument('--server-port', type=int, default=PORT)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='Worker processes sharing the port with SO_REUSEPORT. Default is 1.')
+    parser.add_argument('--log-level', choices=LOG_LEVELS, default='info',
+                        help='Lowest level logged; debug traces every request. Default is info.')
+    parser.add_argument('--metrics-path', default=METRICS_PATH,
+                        help='Path serving the metrics in Prometheus text format, empty to disable. '
+                             'Default is {}.'.format(METRICS_PATH))
  
     args = parser.parse_args()
     ip = args.server_ip
     port = args.server_port
+    configure_logging(args.log_level)
+    REGISTRY.path = args.metrics_path or None
 
     # Prepare and launch the RESTful application
     app.prepare_address(ip, port)
-    app.run()
\ No newline at end of file
+    app.run(workers=args.workers)
\ No newline at end of file
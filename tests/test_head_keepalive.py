@@ -0,0 +1,96 @@
+#
+# Copyright (C) 2025 pdnguyen of HCMC University of Technology VNU-HCM.
+# All rights reserved.
+# This file is part of the CO3093/CO3094 course.
+#
+# WeApRous release
+#
+# The authors hereby grant to Licensee personal permission to use
+# and modify the Licensed Source Code for the sole purpose of studying
+# while attending the course
+#
+
+"""
+A ``HEAD`` request on a persistent connection must leave the connection ready
+for the next response: no body may follow its header.
+"""
+
+import os
+import socket
+import threading
+import time
+import unittest
+
+from daemon.backend import run_backend
+from daemon.eventloop import run_event_loop
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def read_response(sock, head_only=False):
+    """Reads one response; returns (header, body)."""
+    data = b""
+    while b"\r\n\r\n" not in data:
+        chunk = sock.recv(65536)
+        if not chunk:
+            raise ConnectionError("closed before the header")
+        data += chunk
+    header, body = data.split(b"\r\n\r\n", 1)
+    if head_only:
+        return header, body
+    length = 0
+    for line in header.split(b"\r\n")[1:]:
+        name, _, value = line.partition(b":")
+        if name.strip().lower() == b"content-length":
+            length = int(value)
+    while len(body) < length:
+        body += sock.recv(65536)
+    return header, body
+
+
+class HeadKeepAliveTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        os.chdir(ROOT)
+        cls.ports = {}
+        for mode, target in (('thread', run_backend), ('event', run_event_loop)):
+            port = free_port()
+            threading.Thread(target=target, args=('127.0.0.1', port, {}),
+                             daemon=True).start()
+            cls.ports[mode] = port
+        time.sleep(0.3)
+
+    def check_head_then_get(self, port, path):
+        with socket.create_connection(('127.0.0.1', port), timeout=5) as sock:
+            sock.sendall("HEAD {} HTTP/1.1\r\nHost: test\r\n\r\n".format(path).encode())
+            header, extra = read_response(sock, head_only=True)
+            self.assertTrue(header.startswith(b"HTTP/1.1 "), header)
+            self.assertEqual(extra, b"")
+
+            sock.sendall("GET {} HTTP/1.1\r\nHost: test\r\n\r\n".format(path).encode())
+            get_header, body = read_response(sock)
+            self.assertEqual(get_header.split(b"\r\n", 1)[0], header.split(b"\r\n", 1)[0])
+            # Nothing of the HEAD response was left in front of this one
+            self.assertTrue(get_header.startswith(b"HTTP/1.1 "), get_header)
+
+    def test_head_static_file(self):
+        for mode, port in self.ports.items():
+            with self.subTest(mode=mode):
+                self.check_head_then_get(port, '/images/welcome.png')
+
+    def test_head_not_found(self):
+        for mode, port in self.ports.items():
+            with self.subTest(mode=mode):
+                self.check_head_then_get(port, '/missing.png')
+                self.check_head_then_get(port, '/missing.unknown')
+
+
+if __name__ == '__main__':
+    unittest.main()